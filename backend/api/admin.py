@@ -12,6 +12,9 @@ from utils.security import token_required, admin_required
 from models.user import User, UserRole
 from models.patient import Patient
 from models.diagnostic import DiabetesPrediction, BrainTumorPrediction, AlzheimerPrediction, BreastCancerPrediction
+from ml_models.model_registry import model_registry
+from ml_models.thread_budget import thread_budget
+from utils.job_queue import job_queue
 
 from sqlalchemy import func
 from models.user import User
@@ -677,4 +680,143 @@ def get_user_registration_trend(current_user):
         
     except Exception as e:
         logger.error(f"Error getting user registration trend: {str(e)}")
-        return jsonify({'message': 'Failed to retrieve user registration trend', 'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'message': 'Failed to retrieve user registration trend', 'error': str(e)}), 500
+
+@admin_bp.route('/models/<model_name>/reload', methods=['POST'])
+@token_required
+@admin_required
+def reload_model(current_user, model_name):
+    """Reload a model from its artifact and swap it in without downtime"""
+    logger.info(f"Reload model {model_name} request from admin: {current_user.username}")
+    
+    # By default the reload runs in the background; ?wait=true blocks until it finishes
+    wait = request.args.get('wait', 'false').lower() == 'true'
+    version = request.args.get('version')
+    
+    try:
+        result = model_registry.reload_model(model_name, version=version, background=not wait)
+        
+        if "error" in result:
+            return jsonify({'message': result['error']}), 404
+        
+        if not wait:
+            return jsonify({'message': f'Reload of model {model_name} started', 'reload': result}), 202
+        
+        if result.get('status') == 'failed':
+            return jsonify({'message': f'Reload of model {model_name} failed', 'reload': result}), 500
+        
+        return jsonify({'message': f'Model {model_name} reloaded', 'reload': result}), 200
+        
+    except Exception as e:
+        logger.error(f"Error reloading model {model_name}: {str(e)}")
+        return jsonify({'message': 'Failed to reload model'}), 500
+
+@admin_bp.route('/models/<model_name>/versions', methods=['GET'])
+@token_required
+@admin_required
+def get_model_versions(current_user, model_name):
+    """Get per-version latency and shadow agreement statistics for a model"""
+    logger.info(f"Model versions request for {model_name} from admin: {current_user.username}")
+    
+    try:
+        stats = model_registry.get_version_stats(model_name)
+        
+        if stats is None:
+            return jsonify({'message': f'Model {model_name} not found'}), 404
+        
+        return jsonify(stats), 200
+        
+    except Exception as e:
+        logger.error(f"Error getting model version statistics: {str(e)}")
+        return jsonify({'message': 'Failed to retrieve model version statistics'}), 500
+
+@admin_bp.route('/models/<model_name>/routing', methods=['PUT'])
+@token_required
+@admin_required
+def update_model_routing(current_user, model_name):
+    """Change the version routing policy of a model (pinned, split or shadow)"""
+    logger.info(f"Update routing for model {model_name} request from admin: {current_user.username}")
+    
+    data = request.get_json()
+    if not data or 'policy' not in data:
+        logger.warning("Missing routing policy in request")
+        return jsonify({'message': 'Missing required field: policy'}), 400
+    
+    try:
+        result = model_registry.set_routing(model_name, data)
+        
+        if "error" in result:
+            return jsonify({'message': result['error']}), 400
+        
+        return jsonify({
+            'message': 'Routing updated successfully',
+            'routing': result
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Error updating model routing: {str(e)}")
+        return jsonify({'message': 'Failed to update model routing'}), 500
+
+@admin_bp.route('/models/reload-config', methods=['POST'])
+@token_required
+@admin_required
+def reload_model_config(current_user):
+    """Re-read model_config.json and apply the changes to the model registry"""
+    logger.info(f"Reload model configuration request from admin: {current_user.username}")
+    
+    try:
+        changes = model_registry.reload_config()
+        
+        return jsonify({
+            'message': 'Model configuration reloaded',
+            'changes': changes
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Error reloading model configuration: {str(e)}")
+        return jsonify({'message': 'Failed to reload model configuration'}), 500
+
+@admin_bp.route('/models/memory', methods=['GET'])
+@token_required
+@admin_required
+def get_model_memory(current_user):
+    """Get resident and shared memory of this worker process and of each loaded model"""
+    logger.info(f"Model memory request from admin: {current_user.username}")
+    
+    try:
+        return jsonify(model_registry.get_memory_stats()), 200
+        
+    except Exception as e:
+        logger.error(f"Error getting model memory usage: {str(e)}")
+        return jsonify({'message': 'Failed to get model memory usage'}), 500
+
+@admin_bp.route('/models/threads', methods=['GET'])
+@token_required
+@admin_required
+def get_model_threads(current_user):
+    """Get the CPU thread budget and the effective thread settings of this worker process"""
+    logger.info(f"Model thread settings request from admin: {current_user.username}")
+    
+    try:
+        return jsonify(thread_budget.report()), 200
+        
+    except Exception as e:
+        logger.error(f"Error getting thread settings: {str(e)}")
+        return jsonify({'message': 'Failed to get thread settings'}), 500
+
+
+@admin_bp.route('/models/admission', methods=['GET'])
+@token_required
+@admin_required
+def get_model_admission(current_user):
+    """Get per-model concurrency, queue depths and rejections, and the job queue depth, of this worker process"""
+    logger.info(f"Model admission request from admin: {current_user.username}")
+    
+    try:
+        stats = model_registry.admission.get_stats()
+        stats["jobs"] = job_queue.get_stats()
+        return jsonify(stats), 200
+        
+    except Exception as e:
+        logger.error(f"Error getting admission statistics: {str(e)}")
+        return jsonify({'message': 'Failed to get admission statistics'}), 500
\ No newline at end of file
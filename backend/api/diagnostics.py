@@ -1,7 +1,12 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context, current_app
 import sys
+import os
+import json
+import time
+import zipfile
 from pathlib import Path
 from sqlalchemy.exc import SQLAlchemyError
+from werkzeug.utils import secure_filename
 from datetime import datetime
 
 sys.path.append(str(Path(__file__).resolve().parents[1]))
@@ -12,12 +17,158 @@ from utils.security import token_required
 from models.patient import Patient
 from models.diagnostic import DiabetesPrediction, BrainTumorPrediction, BreastCancerPrediction, AlzheimerPrediction
 from ml_models.model_registry import model_registry
+from ml_models.deadline import deadline_from_timeout
+from utils.job_queue import job_queue
+from utils.record_stream import detect_format, iter_records, chunked
+from utils.image_archive import detect_archive, count_archive_images, iter_archive_images, is_image_name, load_manifest, manifest_patient
 
 logger = setup_logger("diagnostics_api")
 
 # Create a blueprint for the diagnostics routes
 diagnostics_bp = Blueprint('diagnostics', __name__, url_prefix='/api/diagnostics')
 
+def wants_async():
+    """Check if the client asked to run the prediction as a background job (?async=true or Prefer: respond-async)"""
+    if request.args.get('async', '').lower() in ('1', 'true', 'yes'):
+        return True
+    return 'respond-async' in request.headers.get('Prefer', '')
+
+def format_diabetes_prediction(prediction):
+    """Format a diabetes prediction so it can be serialized to JSON"""
+    # Safe conversion of values with defaults to ensure serialization works
+    return {
+        "result": bool(prediction.get("prediction", False)),
+        "probability": float(prediction.get("probability", 0)),
+        "confidence": float(prediction.get("confidence", 0)),
+        "risk_factors": prediction.get("risk_factors", []),
+        "features_importance": prediction.get("features_importance", []),
+        "contribution_scale": prediction.get("contribution_scale"),
+        "timestamp": str(prediction.get("timestamp", "")),
+        "id": prediction.get("id")
+    }
+
+def format_breast_cancer_prediction(prediction):
+    """Format a breast cancer prediction so it can be serialized to JSON"""
+    # Safe conversion of values with defaults to ensure serialization works
+    return {
+        "result": bool(prediction.get("prediction", False)),
+        "probability": float(prediction.get("probability", 0)),
+        "confidence": float(prediction.get("confidence", 0)),
+        "features_importance": prediction.get("features_importance", []),
+        "contribution_scale": prediction.get("contribution_scale"),
+        "timestamp": str(prediction.get("timestamp", "")),
+        "id": prediction.get("id")
+    }
+
+def format_alzheimer_prediction(prediction):
+    """Format an Alzheimer prediction for the response"""
+    return {
+        "id": prediction.get("id"),
+        "result_text": f"{prediction['predicted_class']} - {prediction['class_description']}",
+        "predicted_class": prediction['predicted_class'],
+        "class_description": prediction['class_description'],
+        "confidence": prediction['confidence'],
+        "probabilities": prediction['probabilities'],
+        "timestamp": prediction['timestamp']
+    }
+
+def read_alzheimer_image(file_path):
+    """Read a saved MRI upload for prediction"""
+    with open(file_path, 'rb') as f:
+        return f.read()
+
+def request_deadline(model_name):
+    """
+    Get the deadline of a synchronous prediction request.
+    
+    The client's time budget in the X-Request-Timeout-Ms header wins (up to
+    max_ms); otherwise the route's default from the "deadlines" section of
+    model_config.json applies.
+    
+    Args:
+        model_name (str): Name of the model the route predicts with
+        
+    Returns:
+        float: Deadline as a UNIX timestamp, or None without a deadline
+    """
+    config = model_registry.model_config.get("deadlines", {})
+    if not config.get("enabled", False):
+        return None
+        
+    timeout_ms = config.get("routes", {}).get(model_name, config.get("default_ms"))
+    try:
+        requested_ms = float(request.headers.get(config.get("header", "X-Request-Timeout-Ms"), ''))
+        if requested_ms > 0:
+            timeout_ms = requested_ms
+    except ValueError:
+        pass
+        
+    if timeout_ms is None:
+        return None
+    if config.get("max_ms") is not None:
+        timeout_ms = min(timeout_ms, config["max_ms"])
+    return deadline_from_timeout(timeout_ms)
+
+def overloaded_response(model_name, retry_after):
+    """Answer 429 Too Many Requests with a Retry-After header when a model is overloaded"""
+    logger.warning(f"Rejected {model_name} request: model overloaded, retry after {retry_after}s")
+    response = jsonify({
+        'message': f'The {model_name} model is busy, please retry later',
+        'retry_after': retry_after
+    })
+    response.headers['Retry-After'] = str(retry_after)
+    return response, 429
+
+def queue_prediction(model_name, patient, current_user, load_data, context, format_prediction):
+    """
+    Run a prediction as a background job and answer 202 Accepted.
+    
+    The job result has the same body as the synchronous response. Jobs run
+    in the batch priority class, so they yield to interactive predictions;
+    when that queue or the job queue is full the job is not created.
+    
+    Args:
+        model_name (str): Name of the model in the registry
+        patient (Patient): The patient
+        current_user (User): The requesting doctor
+        load_data (callable): Returns the model input when the job runs
+        context (dict): Prediction context (patient_id, doctor_id, ...)
+        format_prediction (callable): Formats the prediction for the response
+        
+    Returns:
+        tuple: Flask response and status code
+    """
+    retry_after = model_registry.admission.check(model_name, "batch")
+    if retry_after is None and job_queue.is_full():
+        retry_after = job_queue.retry_after()
+    if retry_after is not None:
+        return overloaded_response(model_name, retry_after)
+        
+    patient_id = patient.id
+    patient_name = f"{patient.first_name} {patient.last_name}"
+    context = dict(context, priority="batch")
+    
+    def task():
+        prediction = model_registry.predict(model_name=model_name, data=load_data(), context=context)
+        if "error" in prediction:
+            return None, prediction["error"]
+        return {
+            'prediction': format_prediction(prediction),
+            'patient_id': patient_id,
+            'patient_name': patient_name
+        }, None
+        
+    job = job_queue.submit(model_name=model_name, patient_id=patient_id, doctor_id=current_user.id, task=task)
+    
+    response = jsonify({
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': f"{diagnostics_bp.url_prefix}/jobs/{job.id}",
+        'events_url': f"{diagnostics_bp.url_prefix}/jobs/{job.id}/events"
+    })
+    response.headers['Location'] = f"{diagnostics_bp.url_prefix}/jobs/{job.id}"
+    return response, 202
+
 @diagnostics_bp.route('/diabetes/predict/<patient_id>', methods=['POST'])
 @token_required
 def predict_diabetes(current_user, patient_id):
@@ -40,29 +191,33 @@ def predict_diabetes(current_user, patient_id):
         patient_name = f"{patient.first_name} {patient.last_name}"
         logger.info(f"Processing diabetes prediction for {patient_name}")
         
+        context = {"patient_id": patient_id, "doctor_id": current_user.id}
+        if wants_async():
+            return queue_prediction("diabetes", patient, current_user, lambda: data, context, format_diabetes_prediction)
+            
+        # Work the client is no longer waiting for is dropped
+        context["deadline"] = request_deadline("diabetes")
+        
         # Make prediction using model registry
         try:
-            context = {"patient_id": patient_id, "doctor_id": current_user.id}
             prediction = model_registry.predict(model_name="diabetes", data=data, context=context)
         except Exception as model_error:
             logger.error(f"Error in model_registry.predict: {str(model_error)}", exc_info=True)
             return jsonify({'message': 'Model prediction service error'}), 500
         
+        if prediction.get("overloaded"):
+            return overloaded_response("diabetes", prediction["retry_after"])
+        if prediction.get("cancelled"):
+            logger.warning(f"Diabetes prediction dropped: {prediction['error']}")
+            return jsonify({'message': prediction['error']}), 504
+            
         if "error" in prediction:
             logger.error(f"Diabetes prediction error: {prediction['error']}")
             return jsonify({'message': prediction['error']}), 400
         
         # Format the prediction result to ensure it can be serialized to JSON
         try:
-            # Safe conversion of values with defaults to ensure serialization works
-            prediction_result = {
-                "result": bool(prediction.get("prediction", False)),
-                "probability": float(prediction.get("probability", 0)),
-                "confidence": float(prediction.get("confidence", 0)),
-                "risk_factors": prediction.get("risk_factors", []),
-                "timestamp": str(prediction.get("timestamp", "")),
-                "id": prediction.get("id")
-            }
+            prediction_result = format_diabetes_prediction(prediction)
         except Exception as format_error:
             logger.error(f"Error formatting prediction result: {str(format_error)}", exc_info=True)
             return jsonify({'message': 'Error formatting prediction result'}), 500
@@ -219,29 +374,33 @@ def predict_breast_cancer(current_user, patient_id):
         patient_name = f"{patient.first_name} {patient.last_name}"
         logger.info(f"Processing breast cancer prediction for {patient_name}")
         
+        context = {"patient_id": patient_id, "doctor_id": current_user.id}
+        if wants_async():
+            return queue_prediction("breast-cancer", patient, current_user, lambda: data, context, format_breast_cancer_prediction)
+            
+        # Work the client is no longer waiting for is dropped
+        context["deadline"] = request_deadline("breast-cancer")
+        
         # Make prediction using model registry
         try:
-            context = {"patient_id": patient_id, "doctor_id": current_user.id}
             prediction = model_registry.predict(model_name="breast-cancer", data=data, context=context)
         except Exception as model_error:
             logger.error(f"Error in model_registry.predict: {str(model_error)}", exc_info=True)
             return jsonify({'message': 'Model prediction service error'}), 500
         
+        if prediction.get("overloaded"):
+            return overloaded_response("breast-cancer", prediction["retry_after"])
+        if prediction.get("cancelled"):
+            logger.warning(f"Breast cancer prediction dropped: {prediction['error']}")
+            return jsonify({'message': prediction['error']}), 504
+            
         if "error" in prediction:
             logger.error(f"Breast cancer prediction error: {prediction['error']}")
             return jsonify({'message': prediction['error']}), 400
         
         # Format the prediction result to ensure it can be serialized to JSON
         try:
-            # Safe conversion of values with defaults to ensure serialization works
-            prediction_result = {
-                "result": bool(prediction.get("prediction", False)),
-                "probability": float(prediction.get("probability", 0)),
-                "confidence": float(prediction.get("confidence", 0)),
-                "features_importance": prediction.get("features_importance", []),
-                "timestamp": str(prediction.get("timestamp", "")),
-                "id": prediction.get("id")
-            }
+            prediction_result = format_breast_cancer_prediction(prediction)
         except Exception as format_error:
             logger.error(f"Error formatting breast cancer prediction result: {str(format_error)}", exc_info=True)
             return jsonify({'message': 'Error formatting prediction result'}), 500
@@ -428,31 +587,42 @@ def predict_alzheimer(current_user, patient_id):
         
         logger.info(f"Image saved at {file_path}")
         
+        context = {
+            "patient_id": patient_id, 
+            "doctor_id": current_user.id,
+            "image_path": file_path
+        }
+        
+        # Make sure the Alzheimer model is available in the registry
+        if not model_registry.has_model("alzheimer"):
+            logger.error("Alzheimer model not found in registry")
+            return jsonify({'message': 'Alzheimer model not available'}), 500
+            
+        # Reading, preprocessing and inference run in the background job
+        if wants_async():
+            return queue_prediction("alzheimer", patient, current_user, lambda: read_alzheimer_image(file_path), context, format_alzheimer_prediction)
+            
+        # Work the client is no longer waiting for is dropped
+        context["deadline"] = request_deadline("alzheimer")
+        
         # Read file for prediction
-        with open(file_path, 'rb') as f:
-            image_data = f.read()
+        image_data = read_alzheimer_image(file_path)
         
         # Make prediction using model registry
         try:
-            context = {
-                "patient_id": patient_id, 
-                "doctor_id": current_user.id,
-                "image_path": file_path
-            }
-            
-            # Get Alzheimer model from registry
-            alzheimer_model = model_registry.get_model("alzheimer")
-            if not alzheimer_model:
-                logger.error("Alzheimer model not found in registry")
-                return jsonify({'message': 'Alzheimer model not available'}), 500
-                
-            # Make prediction
-            prediction = alzheimer_model.predict(image_data, context)
+            # Make prediction through the registry so version routing applies
+            prediction = model_registry.predict(model_name="alzheimer", data=image_data, context=context)
             
         except Exception as model_error:
             logger.error(f"Error in Alzheimer model prediction: {str(model_error)}", exc_info=True)
             return jsonify({'message': 'Model prediction service error'}), 500
         
+        if prediction.get("overloaded"):
+            return overloaded_response("alzheimer", prediction["retry_after"])
+        if prediction.get("cancelled"):
+            logger.warning(f"Alzheimer prediction dropped: {prediction['error']}")
+            return jsonify({'message': prediction['error']}), 504
+            
         if "error" in prediction:
             logger.error(f"Alzheimer prediction error: {prediction['error']}")
             return jsonify({'message': prediction['error']}), 400
@@ -460,15 +630,7 @@ def predict_alzheimer(current_user, patient_id):
         # Format the prediction result
         try:
             # Format the prediction for the response
-            prediction_result = {
-                "id": prediction.get("id"),
-                "result_text": f"{prediction['predicted_class']} - {prediction['class_description']}",
-                "predicted_class": prediction['predicted_class'],
-                "class_description": prediction['class_description'],
-                "confidence": prediction['confidence'],
-                "probabilities": prediction['probabilities'],
-                "timestamp": prediction['timestamp']
-            }
+            prediction_result = format_alzheimer_prediction(prediction)
         except Exception as format_error:
             logger.error(f"Error formatting prediction result: {str(format_error)}", exc_info=True)
             return jsonify({'message': 'Error formatting prediction result'}), 500
@@ -628,4 +790,375 @@ def get_available_models(current_user):
         
     except Exception as e:
         logger.error(f"Error retrieving available models: {str(e)}")
-        return jsonify({"message": "An error occurred retrieving models"}), 500
\ No newline at end of file
+        return jsonify({"message": "An error occurred retrieving models"}), 500
+
+# ________________________________ Batch Scoring ________________________________
+
+def score_batch_chunk(model_name, chunk, doctor_id):
+    """
+    Score one chunk of an uploaded record file with a single vectorized model call.
+    
+    Records with a patient_id are stored for that patient, if the patient
+    belongs to the doctor; the others are only scored.
+    
+    Args:
+        model_name (str): Name of the model in the registry
+        chunk (list): (row number, record, error) tuples from iter_records
+        doctor_id (str): ID of the requesting doctor
+        
+    Returns:
+        list: One result dict per row, in order
+    """
+    requested_ids = {
+        str(record["patient_id"]) for _, record, error in chunk
+        if error is None and record.get("patient_id")
+    }
+    owned_ids = set()
+    if requested_ids:
+        owned_ids = {
+            patient.id for patient in Patient.query.with_entities(Patient.id)
+            .filter(Patient.id.in_(requested_ids), Patient.doctor_id == doctor_id)
+        }
+        
+    outputs = []
+    records, patient_ids, positions = [], [], []
+    for row_number, record, error in chunk:
+        patient_id = str(record["patient_id"]) if error is None and record.get("patient_id") else None
+        output = {"row": row_number, "patient_id": patient_id}
+        outputs.append(output)
+        
+        if error is None and patient_id and patient_id not in owned_ids:
+            error = "Patient not found"
+        if error is not None:
+            output["error"] = error
+            continue
+            
+        records.append({name: value for name, value in record.items() if name != "patient_id"})
+        patient_ids.append(patient_id)
+        positions.append(len(outputs) - 1)
+        
+    if records:
+        context = {"doctor_id": doctor_id, "patient_ids": patient_ids, "priority": "batch"}
+        results = model_registry.predict_many(model_name=model_name, records=records, context=context)
+        if isinstance(results, dict):
+            results = [results] * len(records)
+            
+        for position, result in zip(positions, results):
+            outputs[position].update(result)
+            
+    return outputs
+
+@diagnostics_bp.route('/<model_name>/batch', methods=['POST'])
+@token_required
+def predict_batch(current_user, model_name):
+    """Score a CSV or NDJSON upload of records, streaming one NDJSON result line per row"""
+    logger.info(f"Batch prediction request for model {model_name} from user {current_user.username}")
+    
+    batch_config = model_registry.model_config.get("batch", {})
+    if model_name not in batch_config.get("models", []) or not model_registry.has_model(model_name):
+        logger.warning(f"Batch prediction failed: model {model_name} does not support batch scoring")
+        return jsonify({'message': f'Batch scoring is not available for model {model_name}'}), 404
+        
+    # Either a multipart upload in the "file" field or the raw request body
+    if request.mimetype == 'multipart/form-data':
+        upload = request.files.get('file')
+        if upload is None:
+            logger.warning("Batch prediction failed: no file uploaded")
+            return jsonify({'message': 'No file uploaded'}), 400
+        stream, data_format = upload.stream, detect_format(upload.mimetype, upload.filename)
+    else:
+        stream, data_format = request.stream, detect_format(request.mimetype)
+        
+    if data_format is None:
+        logger.warning(f"Batch prediction failed: unsupported content type {request.mimetype}")
+        return jsonify({'message': 'Unsupported format. Send CSV (text/csv) or NDJSON (application/x-ndjson)'}), 415
+        
+    try:
+        chunk_size = int(request.args.get('chunk_size', batch_config.get("chunk_size", 500)))
+    except ValueError:
+        return jsonify({'message': 'chunk_size must be an integer'}), 400
+    chunk_size = max(1, min(chunk_size, int(batch_config.get("max_chunk_size", 5000))))
+    
+    # Refuse up front rather than failing chunks once the stream has started
+    retry_after = model_registry.admission.check(model_name, "batch")
+    if retry_after is not None:
+        return overloaded_response(model_name, retry_after)
+        
+    doctor_id = current_user.id
+    
+    def generate():
+        summary = {"rows": 0, "scored": 0, "stored": 0, "errors": 0}
+        try:
+            # Only one chunk of records and results is held in memory at a time
+            for chunk in chunked(iter_records(stream, data_format), chunk_size):
+                for output in score_batch_chunk(model_name, chunk, doctor_id):
+                    summary["rows"] += 1
+                    if "error" in output:
+                        summary["errors"] += 1
+                    else:
+                        summary["scored"] += 1
+                        if output.get("id"):
+                            summary["stored"] += 1
+                    yield json.dumps(output) + "\n"
+                    
+                # Do not hold a connection idle in a transaction between chunks
+                db.session.close()
+        except Exception as e:
+            logger.error(f"Error in batch prediction for model {model_name}: {str(e)}", exc_info=True)
+            db.session.rollback()
+            summary["aborted"] = str(e) if isinstance(e, ValueError) else "An error occurred during batch prediction"
+            
+        logger.info(f"Batch prediction for model {model_name} finished: {summary}")
+        yield json.dumps({"summary": summary}) + "\n"
+        
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson', headers={
+        'X-Accel-Buffering': 'no'
+    })
+
+def owned_patient_ids(patient_ids, doctor_id, chunk_size=1000):
+    """Get the subset of patient IDs that belong to the doctor"""
+    patient_ids = list(patient_ids)
+    owned = set()
+    for start in range(0, len(patient_ids), chunk_size):
+        owned.update(
+            patient.id for patient in Patient.query.with_entities(Patient.id)
+            .filter(Patient.id.in_(patient_ids[start:start + chunk_size]), Patient.doctor_id == doctor_id)
+        )
+    return owned
+
+@diagnostics_bp.route('/alzheimer/batch', methods=['POST'])
+@token_required
+def predict_alzheimer_batch(current_user):
+    """Score many MRI images from a zip/tar archive or a multipart upload, streaming NDJSON results and progress"""
+    logger.info(f"Alzheimer batch prediction request from user {current_user.username}")
+    
+    try:
+        # Make sure the Alzheimer model is available in the registry
+        if not model_registry.has_model("alzheimer"):
+            logger.error("Alzheimer model not found in registry")
+            return jsonify({'message': 'Alzheimer model not available'}), 500
+            
+        retry_after = model_registry.admission.check("alzheimer", "batch")
+        if retry_after is not None:
+            return overloaded_response("alzheimer", retry_after)
+            
+        archive = request.files.get('archive')
+        image_files = request.files.getlist('images')
+        if archive is None and not image_files:
+            logger.warning("Alzheimer batch prediction failed: no archive or images uploaded")
+            return jsonify({'message': 'No archive or images uploaded'}), 400
+            
+        # The manifest maps image files to patients; patient_id applies to images not in it
+        try:
+            manifest_file = request.files.get('manifest')
+            if manifest_file is not None:
+                manifest = load_manifest(manifest_file.read(), manifest_file.filename)
+            else:
+                manifest = load_manifest(request.form.get('manifest', ''))
+        except ValueError as e:
+            logger.warning(f"Alzheimer batch prediction failed: invalid manifest - {str(e)}")
+            return jsonify({'message': f'Invalid manifest: {str(e)}'}), 400
+            
+        default_patient_id = request.form.get('patient_id') or None
+        requested_ids = set(manifest.values()) | ({default_patient_id} if default_patient_id else set())
+        if not requested_ids:
+            logger.warning("Alzheimer batch prediction failed: no manifest or patient_id")
+            return jsonify({'message': 'A manifest or patient_id is required'}), 400
+            
+        # Every patient must belong to the current doctor
+        unknown_ids = requested_ids - owned_patient_ids(requested_ids, current_user.id)
+        if unknown_ids:
+            logger.warning(f"Alzheimer batch prediction failed: {len(unknown_ids)} patients not found")
+            return jsonify({'message': 'Patient not found', 'patient_ids': sorted(unknown_ids)[:20]}), 404
+            
+        timestamp = datetime.utcnow().strftime('%Y%m%d%H%M%S')
+        
+        if archive is not None:
+            kind = detect_archive(archive.filename)
+            if kind is None:
+                logger.warning("Alzheimer batch prediction failed: invalid archive type")
+                return jsonify({'message': 'Invalid archive type. Allowed: ZIP, TAR (optionally compressed)'}), 400
+                
+            # The archive is kept as uploaded; images are read from it one at a time
+            archive_dir = os.path.join('uploads', 'alzheimer', 'archives')
+            os.makedirs(archive_dir, exist_ok=True)
+            archive_path = os.path.join(archive_dir, f"{timestamp}_{secure_filename(archive.filename)}")
+            archive.save(archive_path)
+            logger.info(f"Archive saved at {archive_path}")
+            
+            try:
+                total = count_archive_images(archive_path, kind)
+            except zipfile.BadZipFile:
+                logger.warning("Alzheimer batch prediction failed: corrupt zip archive")
+                return jsonify({'message': 'Invalid zip archive'}), 400
+                
+            def source():
+                for name, image_data, error in iter_archive_images(archive_path, kind):
+                    image_path = f"{archive_path}::{name}"
+                    if len(image_path) > 255:
+                        image_path = f"{archive_path}::{os.path.basename(name)}"
+                    yield name, image_data, error, image_path
+        else:
+            total = len(image_files)
+            
+            def source():
+                for image_file in image_files:
+                    name = image_file.filename or ''
+                    patient_id = manifest_patient(manifest, name, default_patient_id)
+                    if not is_image_name(name):
+                        yield name, None, 'Invalid file type. Allowed: PNG, JPG, TIFF, DICOM', None
+                        continue
+                    if patient_id is None:
+                        yield name, None, None, None
+                        continue
+                        
+                    # Save each image like a single upload
+                    upload_dir = os.path.join('uploads', 'alzheimer', patient_id)
+                    os.makedirs(upload_dir, exist_ok=True)
+                    file_path = os.path.join(upload_dir, f"{timestamp}_{secure_filename(name)}")
+                    image_file.save(file_path)
+                    with open(file_path, 'rb') as f:
+                        yield name, f.read(), None, file_path
+                        
+        chunk_size = max(1, int(model_registry.model_config.get("batch", {}).get("image_chunk_size", 32)))
+        doctor_id = current_user.id
+        
+    except Exception as e:
+        logger.error(f"Error preparing Alzheimer batch prediction: {str(e)}", exc_info=True)
+        return jsonify({'message': 'An error occurred during prediction'}), 500
+        
+    def generate():
+        summary = {"images": 0, "total": total, "scored": 0, "stored": 0, "errors": 0}
+        try:
+            # Only one chunk of decoded images is held in memory at a time
+            for chunk in chunked(source(), chunk_size):
+                outputs = []
+                images, patient_ids, image_paths, positions = [], [], [], []
+                for name, image_data, error, image_path in chunk:
+                    patient_id = manifest_patient(manifest, name, default_patient_id)
+                    output = {"file": name, "patient_id": patient_id}
+                    outputs.append(output)
+                    
+                    if error is None and patient_id is None:
+                        error = "No patient for image in manifest"
+                    if error is not None:
+                        output["error"] = error
+                        continue
+                        
+                    images.append(image_data)
+                    patient_ids.append(patient_id)
+                    image_paths.append(image_path)
+                    positions.append(len(outputs) - 1)
+                    
+                if images:
+                    context = {"doctor_id": doctor_id, "patient_ids": patient_ids, "image_paths": image_paths, "priority": "batch"}
+                    results = model_registry.predict_many(model_name="alzheimer", records=images, context=context)
+                    if isinstance(results, dict):
+                        results = [results] * len(images)
+                    for position, result in zip(positions, results):
+                        outputs[position].update(result)
+                        
+                for output in outputs:
+                    summary["images"] += 1
+                    if "error" in output:
+                        summary["errors"] += 1
+                    else:
+                        summary["scored"] += 1
+                        if output.get("id"):
+                            summary["stored"] += 1
+                    yield json.dumps(output) + "\n"
+                    
+                yield json.dumps({"progress": {"processed": summary["images"], "total": total}}) + "\n"
+                
+                # Do not hold a connection idle in a transaction between chunks
+                db.session.close()
+        except Exception as e:
+            logger.error(f"Error in Alzheimer batch prediction: {str(e)}", exc_info=True)
+            db.session.rollback()
+            summary["aborted"] = "An error occurred during batch prediction"
+            
+        logger.info(f"Alzheimer batch prediction finished: {summary}")
+        yield json.dumps({"summary": summary}) + "\n"
+        
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson', headers={
+        'X-Accel-Buffering': 'no'
+    })
+
+# ________________________________ Prediction Jobs ________________________________
+
+@diagnostics_bp.route('/jobs/<job_id>', methods=['GET'])
+@token_required
+def get_prediction_job(current_user, job_id):
+    """Get the status, and once completed the result, of a prediction job"""
+    logger.info(f"Prediction job {job_id} status request from user {current_user.username}")
+    
+    try:
+        job = job_queue.get_job(job_id, current_user.id)
+        
+        if not job:
+            logger.warning(f"Prediction job {job_id} not found for doctor {current_user.id}")
+            return jsonify({"message": "Job not found"}), 404
+            
+        return jsonify({"job": job.to_dict()}), 200
+        
+    except Exception as e:
+        logger.error(f"Error retrieving prediction job: {str(e)}")
+        return jsonify({"message": "An error occurred retrieving job"}), 500
+
+@diagnostics_bp.route('/jobs/<job_id>/events', methods=['GET'])
+@token_required
+def stream_prediction_job(current_user, job_id):
+    """Stream the status changes of a prediction job as server-sent events until it finishes"""
+    logger.info(f"Prediction job {job_id} event stream request from user {current_user.username}")
+    
+    try:
+        job = job_queue.get_job(job_id, current_user.id)
+        
+        if not job:
+            logger.warning(f"Prediction job {job_id} not found for doctor {current_user.id}")
+            return jsonify({"message": "Job not found"}), 404
+            
+    except Exception as e:
+        logger.error(f"Error retrieving prediction job: {str(e)}")
+        return jsonify({"message": "An error occurred retrieving job"}), 500
+        
+    doctor_id = current_user.id
+    poll_interval = float(current_app.config.get('JOB_POLL_INTERVAL_SECONDS', 0.5))
+    stream_timeout = float(current_app.config.get('JOB_STREAM_TIMEOUT_SECONDS', 300))
+    
+    def generate():
+        deadline = time.monotonic() + stream_timeout
+        last_status = None
+        last_sent = time.monotonic()
+        
+        while True:
+            job = job_queue.get_job(job_id, doctor_id)
+            if job is None:
+                yield f"event: error\ndata: {json.dumps({'message': 'Job not found'})}\n\n"
+                return
+                
+            if job.status != last_status:
+                last_status = job.status
+                last_sent = time.monotonic()
+                yield f"event: status\ndata: {json.dumps(job.to_dict())}\n\n"
+                
+            if job.finished:
+                return
+                
+            if time.monotonic() >= deadline:
+                yield f"event: timeout\ndata: {json.dumps({'message': 'Job still running, poll the status URL'})}\n\n"
+                return
+                
+            # Keep proxies from closing an idle connection
+            if time.monotonic() - last_sent >= 15:
+                last_sent = time.monotonic()
+                yield ": keep-alive\n\n"
+                
+            # Release the connection while waiting, and read fresh state next time
+            db.session.close()
+            job_queue.wait_for_change(poll_interval)
+            
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
\ No newline at end of file
@@ -1,4 +1,5 @@
 from flask import Flask, request, jsonify
+import os
 from pathlib import Path
 import sys
 
@@ -7,10 +8,17 @@ sys.path.append(str(Path(__file__).resolve().parents[0]))
 from utils.logger import setup_logger
 logger = setup_logger('Main_Application')
 
+# Size the native thread pools before NumPy, TensorFlow or the models load them
+from ml_models.thread_budget import thread_budget
+thread_budget.apply()
+
 from utils.db import init_db
 from models.user import User, UserRole
 from utils.db import db
 from config import Config
+from ml_models.model_registry import model_registry
+from utils.job_queue import job_queue
+from utils.traffic_recorder import traffic_recorder
 
 def create_app(config_class=Config):
     """Application factory function"""
@@ -28,6 +36,12 @@ def create_app(config_class=Config):
     # Initialize database connection
     init_db(app)
     
+    # Background pool for prediction jobs submitted with ?async=true
+    job_queue.init_app(app)
+    
+    # Opt-in capture of request shapes for load-test replay (TRAFFIC_RECORDING)
+    traffic_recorder.init_app(app)
+    
     # Import blueprints
     from api.auth import auth_bp
     from api.patients import patients_bp
@@ -48,6 +62,12 @@ def create_app(config_class=Config):
     def health_check():
         return jsonify({'status': 'healthy'})
     
+    @app.route('/api/ready', methods=['GET'])
+    def readiness_check():
+        # Unlike /api/health, only ready once the models are loaded and warmed up
+        readiness = model_registry.get_readiness()
+        return jsonify(readiness), 200 if readiness['ready'] else 503
+    
     # Single CORS handler - no Flask-CORS dependency
     @app.after_request
     def add_cors_headers(response):
@@ -106,5 +126,10 @@ app = create_app()
 # Create default user
 create_default_user(app)
 
+# Load and warm up the models in the background; /api/ready reports when they are done.
+# A preforking gunicorn master leaves this to each worker (see gunicorn.conf.py)
+if model_registry.model_config.get("warmup", {}).get("enabled", False) and not os.environ.get("MODEL_WARMUP_IN_WORKERS"):
+    model_registry.start_warmup()
+
 if __name__ == '__main__':
     app.run(debug=True, port=8000, host='0.0.0.0')
\ No newline at end of file
@@ -16,4 +16,18 @@ class Config:
         os.environ.get("DB_NAME", 'healthcare_ai')
     )
     
-    SQLALCHEMY_TRACK_MODIFICATIONS = False # Turn off update messages from sqlalchemy
\ No newline at end of file
+    SQLALCHEMY_TRACK_MODIFICATIONS = False # Turn off update messages from sqlalchemy
+    
+    # Number of web worker processes per node, used to split the CPUs between them
+    WEB_WORKERS = int(os.environ.get('WEB_CONCURRENCY', os.environ.get('GUNICORN_WORKERS', 1)))
+    
+    # Background prediction jobs (?async=true on the predict endpoints)
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+    JOB_MAX_PENDING = int(os.environ.get('JOB_MAX_PENDING', 64))
+    JOB_POLL_INTERVAL_SECONDS = float(os.environ.get('JOB_POLL_INTERVAL_SECONDS', 0.5))
+    JOB_STREAM_TIMEOUT_SECONDS = float(os.environ.get('JOB_STREAM_TIMEOUT_SECONDS', 300))
+    
+    # Opt-in capture of sanitized request shapes for load testing (see utils/traffic_replay.py)
+    TRAFFIC_RECORDING = os.environ.get('TRAFFIC_RECORDING', 'false').lower() in ('1', 'true', 'yes')
+    TRAFFIC_RECORD_PATH = os.environ.get('TRAFFIC_RECORD_PATH', os.path.join('recordings', 'traffic.ndjson'))
+    TRAFFIC_SAMPLE_RATE = float(os.environ.get('TRAFFIC_SAMPLE_RATE', 1.0))
\ No newline at end of file
@@ -0,0 +1,26 @@
+# Gunicorn configuration for serving the API with several worker processes:
+#   gunicorn -c gunicorn.conf.py app:app
+#
+# The application (and with it the model registry) is imported once in the
+# master process. With "preload" enabled in model_config.json the models are
+# loaded there before the workers are forked, so the workers share the model
+# memory copy-on-write instead of each loading a private copy. Versions with
+# "preload": false (TensorFlow models are not fork-safe) load in each worker.
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("GUNICORN_WORKERS", "4"))
+preload_app = True
+
+# Several threads per worker, so open job event streams do not block cheap requests
+threads = int(os.environ.get("GUNICORN_THREADS", "4"))
+
+# Warmup loads every model, TensorFlow included, so it runs in the workers, never in the master
+os.environ["MODEL_WARMUP_IN_WORKERS"] = "1"
+
+def post_fork(server, worker):
+    """Threads do not survive fork; recreate the registry's threaded state and warm up in each worker"""
+    from ml_models.model_registry import model_registry
+    model_registry.after_fork()
+    if model_registry.model_config.get("warmup", {}).get("enabled", False):
+        model_registry.start_warmup()
@@ -24,6 +24,7 @@ def initialize_database():
             from models.user import User
             from models.patient import Patient
             from models.diagnostic import DiabetesPrediction, BrainTumorPrediction, AlzheimerPrediction, BreastCancerPrediction
+            from models.job import PredictionJob
             
             db.create_all()
             logger.info("Database tables created successfully")
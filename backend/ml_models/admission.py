@@ -0,0 +1,326 @@
+import math
+import threading
+import time
+from collections import deque
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from utils.logger import setup_logger
+from ml_models.deadline import is_expired, cancelled_result
+
+logger = setup_logger("admission")
+
+# Priority classes, highest first: requests from the UI, then batch endpoints and background jobs
+PRIORITIES = ("interactive", "batch")
+
+DEFAULT_QUEUES = {
+    "interactive": {"max_queued": 16, "max_wait_ms": 10000},
+    "batch": {"max_queued": 4, "max_wait_ms": 60000}
+}
+
+class ModelGate:
+    """
+    Limits how many predictions of one model run at the same time.
+    
+    Requests over the limit wait in a bounded queue per priority class.
+    A freed slot goes to the oldest waiting request of the highest priority
+    class, so interactive requests overtake batch work. A request is
+    rejected straight away when its queue is full, or when it has waited
+    longer than the queue allows. A request whose deadline passes while it
+    waits leaves the queue without running.
+    """
+    
+    def __init__(self, name, max_concurrent=4, queues=None):
+        """
+        Initialize the gate.
+        
+        Args:
+            name (str): Name of the model, used in logs
+            max_concurrent (int): Predictions allowed to run at once
+            queues (dict, optional): max_queued and max_wait_ms per priority class
+        """
+        self.name = name
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiting = {priority: deque() for priority in PRIORITIES}
+        self._counters = {
+            priority: {"admitted": 0, "rejected": 0, "timed_out": 0, "expired": 0}
+            for priority in PRIORITIES
+        }
+        
+        # Moving average of how long a prediction holds its slot, for Retry-After
+        self._service_seconds = None
+        self.configure(max_concurrent, queues)
+        
+    def configure(self, max_concurrent=4, queues=None):
+        """
+        Change the limits of the gate; requests already admitted or queued are kept.
+        
+        Args:
+            max_concurrent (int): Predictions allowed to run at once
+            queues (dict, optional): max_queued and max_wait_ms per priority class
+        """
+        queues = queues or {}
+        with self._cond:
+            self.max_concurrent = max(1, int(max_concurrent))
+            self.queues = {
+                priority: dict(DEFAULT_QUEUES[priority], **queues.get(priority, {}))
+                for priority in PRIORITIES
+            }
+            
+            # A higher limit lets queued requests start now
+            while self._active < self.max_concurrent and self._grant_next():
+                self._active += 1
+            self._cond.notify_all()
+            
+    def _grant_next(self):
+        """Hand a slot to the first waiting request of the highest priority class (lock held)"""
+        for priority in PRIORITIES:
+            if self._waiting[priority]:
+                ticket = self._waiting[priority].popleft()
+                ticket["granted"] = True
+                return True
+        return False
+        
+    def _queued_ahead(self, priority):
+        """Number of requests that would be served before a new request of the class (lock held)"""
+        queued = 0
+        for other in PRIORITIES:
+            queued += len(self._waiting[other])
+            if other == priority:
+                break
+        return queued
+        
+    def retry_after(self, priority="interactive"):
+        """
+        Estimate how many seconds a rejected request should wait before retrying.
+        
+        Args:
+            priority (str): Priority class of the request
+            
+        Returns:
+            int: Seconds, between 1 and 120
+        """
+        with self._cond:
+            service_seconds = self._service_seconds or 1.0
+            backlog = self._active + self._queued_ahead(priority)
+        seconds = backlog * service_seconds / self.max_concurrent
+        return max(1, min(120, math.ceil(seconds)))
+        
+    def check(self, priority="interactive"):
+        """
+        Check, without queueing, whether a request of the class would be rejected now.
+        
+        Args:
+            priority (str): Priority class of the request
+            
+        Returns:
+            int: Retry-After seconds if the request would be rejected, else None
+        """
+        with self._cond:
+            full = (
+                self._active >= self.max_concurrent
+                and len(self._waiting[priority]) >= self.queues[priority]["max_queued"]
+            )
+        return self.retry_after(priority) if full else None
+        
+    def acquire(self, priority="interactive", deadline=None):
+        """
+        Take a slot, waiting in the class queue if all slots are busy.
+        
+        Args:
+            priority (str): Priority class of the request
+            deadline (float, optional): UNIX time after which the request stops waiting
+            
+        Returns:
+            tuple: (admitted, Retry-After seconds if rejected else None; None
+                as well when the deadline passed in the queue)
+        """
+        queue_config = self.queues[priority]
+        max_wait = queue_config["max_wait_ms"] / 1000.0
+        if deadline is not None:
+            max_wait = max(0.0, min(max_wait, deadline - time.time()))
+        with self._cond:
+            if self._active < self.max_concurrent and not self._queued_ahead(priority):
+                self._active += 1
+                self._counters[priority]["admitted"] += 1
+                return True, None
+                
+            if len(self._waiting[priority]) >= queue_config["max_queued"]:
+                self._counters[priority]["rejected"] += 1
+                rejected = True
+            else:
+                ticket = {"granted": False}
+                self._waiting[priority].append(ticket)
+                self._cond.wait_for(lambda: ticket["granted"], timeout=max_wait)
+                
+                rejected = not ticket["granted"]
+                if rejected:
+                    self._waiting[priority].remove(ticket)
+                    if deadline is not None and time.time() >= deadline:
+                        self._counters[priority]["expired"] += 1
+                        return False, None
+                    self._counters[priority]["timed_out"] += 1
+                else:
+                    self._counters[priority]["admitted"] += 1
+                    
+        if rejected:
+            logger.warning(f"Rejected {priority} request for model {self.name}: queue full or wait exceeded")
+            return False, self.retry_after(priority)
+        return True, None
+        
+    def release(self, service_seconds=None):
+        """
+        Give a slot back, handing it to the next waiting request if there is one.
+        
+        Args:
+            service_seconds (float, optional): How long the prediction held the slot
+        """
+        with self._cond:
+            if service_seconds is not None:
+                if self._service_seconds is None:
+                    self._service_seconds = service_seconds
+                else:
+                    self._service_seconds = 0.8 * self._service_seconds + 0.2 * service_seconds
+                    
+            if self._active <= self.max_concurrent and self._grant_next():
+                self._cond.notify_all()
+            else:
+                self._active -= 1
+                
+    def stats(self):
+        """Get the current queue depths and admission counters of the gate"""
+        with self._cond:
+            return {
+                "max_concurrent": self.max_concurrent,
+                "active": self._active,
+                "service_ms": round(self._service_seconds * 1000, 1) if self._service_seconds is not None else None,
+                "queues": {
+                    priority: dict(
+                        self._counters[priority],
+                        depth=len(self._waiting[priority]),
+                        max_queued=self.queues[priority]["max_queued"],
+                        max_wait_ms=self.queues[priority]["max_wait_ms"]
+                    )
+                    for priority in PRIORITIES
+                }
+            }
+
+class AdmissionController:
+    """
+    Admission control in front of model inference: one ModelGate per model
+    configured under "admission" in model_config.json. Models without a
+    gate, or all models when admission is disabled, are not limited.
+    
+    Limits apply per web worker process.
+    """
+    
+    def __init__(self):
+        """Initialize the controller with no gates"""
+        self.enabled = False
+        self.default_priority = "interactive"
+        self.gates = {}
+        self._lock = threading.Lock()
+        
+    def configure(self, config):
+        """
+        Apply the "admission" section of the model configuration.
+        
+        Gates of models still configured keep their queued requests and counters.
+        
+        Args:
+            config (dict): The admission settings
+        """
+        with self._lock:
+            self.enabled = bool(config.get("enabled", False))
+            default_priority = config.get("default_priority", "interactive")
+            self.default_priority = default_priority if default_priority in PRIORITIES else "interactive"
+            
+            models = config.get("models", {})
+            for model_name, settings in models.items():
+                gate = self.gates.get(model_name)
+                if gate is None:
+                    self.gates[model_name] = ModelGate(model_name, settings.get("max_concurrent", 4), settings.get("queues"))
+                else:
+                    gate.configure(settings.get("max_concurrent", 4), settings.get("queues"))
+                    
+            for model_name in list(self.gates):
+                if model_name not in models:
+                    del self.gates[model_name]
+                    
+        logger.info(f"Admission control {'enabled' if self.enabled else 'disabled'} for models: {sorted(self.gates)}")
+        
+    def priority(self, context=None):
+        """Get the priority class of a request from its context"""
+        priority = (context or {}).get("priority", self.default_priority)
+        return priority if priority in PRIORITIES else self.default_priority
+        
+    def _gate(self, model_name):
+        """Get the gate of a model, or None if it is not limited"""
+        return self.gates.get(model_name) if self.enabled else None
+        
+    def check(self, model_name, priority="interactive"):
+        """
+        Check whether a request would be rejected now, e.g. before starting a stream or a job.
+        
+        Args:
+            model_name (str): Name of the model
+            priority (str): Priority class of the request
+            
+        Returns:
+            int: Retry-After seconds if the request would be rejected, else None
+        """
+        gate = self._gate(model_name)
+        return gate.check(priority) if gate is not None else None
+        
+    def run(self, model_name, context, fn):
+        """
+        Run fn once the model's gate admits the request.
+        
+        Args:
+            model_name (str): Name of the model
+            context (dict): Prediction context; its "priority" picks the queue
+            fn (callable): Runs the prediction
+            
+        Returns:
+            object: The result of fn, an error dict with "overloaded" and
+                "retry_after" if the request was rejected, or with "cancelled"
+                if its deadline passed before it ran
+        """
+        if is_expired(context):
+            return cancelled_result("queue")
+            
+        gate = self._gate(model_name)
+        if gate is None:
+            return fn()
+            
+        admitted, retry_after = gate.acquire(self.priority(context), (context or {}).get("deadline"))
+        if not admitted and retry_after is None:
+            return cancelled_result("queue")
+        if not admitted:
+            return {
+                "error": f"Model {model_name} is overloaded, please retry later",
+                "overloaded": True,
+                "retry_after": retry_after
+            }
+            
+        started = time.perf_counter()
+        try:
+            return fn()
+        finally:
+            gate.release(time.perf_counter() - started)
+            
+    def get_stats(self):
+        """
+        Get the queue depths and admission counters of every gate in this process.
+        
+        Returns:
+            dict: Settings and per-model statistics
+        """
+        return {
+            "enabled": self.enabled,
+            "default_priority": self.default_priority,
+            "priorities": list(PRIORITIES),
+            "models": {model_name: gate.stats() for model_name, gate in list(self.gates.items())}
+        }
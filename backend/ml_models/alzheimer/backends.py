@@ -0,0 +1,211 @@
+import os
+import sys
+import threading
+import numpy as np
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from utils.logger import setup_logger
+
+logger = setup_logger("alzheimer_backends")
+
+# Default artifact of each inference backend, relative to this directory
+DEFAULT_ARTIFACTS = {
+    "keras": "alzheimer_model.keras",
+    "tflite": "alzheimer_model.tflite",
+    "onnx": "alzheimer_model.onnx"
+}
+
+# ImageNet statistics used by keras.applications.densenet.preprocess_input ("torch" mode)
+IMAGENET_MEAN = [0.485, 0.456, 0.406]
+IMAGENET_STD = [0.229, 0.224, 0.225]
+
+def densenet_preprocess_input(x):
+    """
+    NumPy version of tf.keras.applications.densenet.preprocess_input, so the
+    TFLite and ONNX backends do not need TensorFlow. Performs the same float32
+    operations in the same order, so every backend gets identical inputs.
+    
+    Args:
+        x (numpy.ndarray): RGB images with values in [0, 255], channels last
+        
+    Returns:
+        numpy.ndarray: Scaled and normalized float32 images
+    """
+    x = x.astype(np.float32)
+    x /= 255.0
+    for channel in range(3):
+        x[..., channel] -= IMAGENET_MEAN[channel]
+    for channel in range(3):
+        x[..., channel] /= IMAGENET_STD[channel]
+    return x
+
+class KerasBackend:
+    """Runs the full Keras model with TensorFlow"""
+    
+    name = "keras"
+    
+    def __init__(self, model_path, num_threads=None):
+        """
+        Load the Keras model.
+        
+        Args:
+            model_path (str): Path of the .keras artifact
+            num_threads (int, optional): Intra-op threads of the TensorFlow runtime
+        """
+        import tensorflow as tf
+        
+        if num_threads:
+            try:
+                tf.config.threading.set_intra_op_parallelism_threads(int(num_threads))
+            except RuntimeError:
+                # The runtime was already initialized by another model
+                logger.warning("TensorFlow threading already initialized, num_threads ignored")
+                
+        self.model = tf.keras.models.load_model(model_path)
+        
+    def predict(self, batch):
+        """Score a preprocessed (n, 224, 224, 3) batch, returns (n, classes) probabilities"""
+        return self.model.predict(batch, verbose=0)
+        
+    def count_params(self):
+        """Number of parameters of the model"""
+        return self.model.count_params()
+
+class TFLiteBackend:
+    """
+    Runs a converted TFLite graph. Float graphs use the XNNPACK delegate,
+    which the TFLite CPU interpreter applies by default; int8 graphs are fed
+    quantized inputs and their outputs are dequantized.
+    
+    Uses the standalone LiteRT / tflite_runtime interpreter when installed,
+    so the full TensorFlow runtime is not imported.
+    """
+    
+    name = "tflite"
+    
+    def __init__(self, model_path, num_threads=None):
+        """
+        Load the TFLite graph.
+        
+        Args:
+            model_path (str): Path of the .tflite artifact
+            num_threads (int, optional): Interpreter threads
+        """
+        Interpreter = self._interpreter_class()
+        self.interpreter = Interpreter(model_path=model_path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_size = int(self._input["shape"][0])
+        
+        # The interpreter holds one set of tensors; calls must not overlap
+        self._lock = threading.Lock()
+        
+    def _interpreter_class(self):
+        """Find the lightest available TFLite interpreter"""
+        try:
+            from ai_edge_litert.interpreter import Interpreter
+            return Interpreter
+        except ImportError:
+            pass
+        try:
+            from tflite_runtime.interpreter import Interpreter
+            return Interpreter
+        except ImportError:
+            pass
+            
+        logger.warning("No standalone TFLite runtime installed, falling back to tensorflow.lite")
+        import tensorflow as tf
+        return tf.lite.Interpreter
+        
+    def predict(self, batch):
+        """Score a preprocessed (n, 224, 224, 3) batch, returns (n, classes) probabilities"""
+        batch = np.asarray(batch, dtype=np.float32)
+        
+        # Quantize the input of int8 graphs
+        input_dtype = self._input["dtype"]
+        scale, zero_point = self._input.get("quantization", (0.0, 0))
+        if input_dtype != np.float32 and scale:
+            info = np.iinfo(input_dtype)
+            batch = np.clip(np.round(batch / scale + zero_point), info.min, info.max).astype(input_dtype)
+            
+        with self._lock:
+            if batch.shape[0] != self._batch_size:
+                self.interpreter.resize_tensor_input(self._input["index"], list(batch.shape))
+                self.interpreter.allocate_tensors()
+                self._input = self.interpreter.get_input_details()[0]
+                self._output = self.interpreter.get_output_details()[0]
+                self._batch_size = batch.shape[0]
+                
+            self.interpreter.set_tensor(self._input["index"], batch)
+            self.interpreter.invoke()
+            output = self.interpreter.get_tensor(self._output["index"]).copy()
+            
+        # Dequantize the output of int8 graphs
+        scale, zero_point = self._output.get("quantization", (0.0, 0))
+        if output.dtype != np.float32 and scale:
+            output = (output.astype(np.float32) - zero_point) * scale
+            
+        return output
+
+class OnnxBackend:
+    """Runs an ONNX export of the model with ONNX Runtime on the CPU"""
+    
+    name = "onnx"
+    
+    def __init__(self, model_path, num_threads=None):
+        """
+        Create the ONNX Runtime session.
+        
+        Args:
+            model_path (str): Path of the .onnx artifact
+            num_threads (int, optional): Intra-op threads of the session
+        """
+        import onnxruntime as ort
+        
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = int(num_threads)
+            
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        self._input_name = self.session.get_inputs()[0].name
+        
+    def predict(self, batch):
+        """Score a preprocessed (n, 224, 224, 3) batch, returns (n, classes) probabilities"""
+        return self.session.run(None, {self._input_name: np.asarray(batch, dtype=np.float32)})[0]
+
+BACKENDS = {
+    "keras": KerasBackend,
+    "tflite": TFLiteBackend,
+    "onnx": OnnxBackend
+}
+
+def default_artifact(backend):
+    """
+    Get the default artifact path of a backend.
+    
+    Args:
+        backend (str): Backend name
+        
+    Returns:
+        str: Absolute artifact path
+    """
+    return os.path.join(os.path.dirname(__file__), DEFAULT_ARTIFACTS[backend])
+
+def load_backend(backend, model_path, num_threads=None):
+    """
+    Load a model artifact with the given inference backend.
+    
+    Args:
+        backend (str): One of "keras", "tflite" or "onnx"
+        model_path (str): Path of the artifact
+        num_threads (int, optional): CPU threads used by the backend
+        
+    Returns:
+        object: Backend instance with a predict(batch) method
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}', expected one of {sorted(BACKENDS)}")
+    return BACKENDS[backend](model_path, num_threads=num_threads)
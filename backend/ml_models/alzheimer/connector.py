@@ -1,11 +1,11 @@
 import os
 import sys
+import uuid
+import threading
 import numpy as np
 from pathlib import Path
 from datetime import datetime
-import tensorflow as tf
-from tensorflow.keras.models import load_model
-from tensorflow.keras.preprocessing import image
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
 import io
 
@@ -13,6 +13,9 @@ sys.path.append(str(Path(__file__).resolve().parents[2]))
 from utils.logger import setup_logger
 from utils.db import db
 from models.diagnostic import AlzheimerPrediction
+from ml_models.batching import MicroBatcher
+from ml_models.deadline import DeadlineExceeded, is_expired, cancelled_result
+from ml_models.alzheimer.backends import DEFAULT_ARTIFACTS, load_backend, densenet_preprocess_input
 
 logger = setup_logger("alzheimer_model")
 
@@ -23,11 +26,39 @@ class AlzheimerModel:
     and storing results.
     """
     
-    def __init__(self):
-        """Initialize the model by loading from disk"""
-        self.model_path = os.path.join(os.path.dirname(__file__), 'alzheimer_model.keras')
+    def __init__(self, model_path=None, batching=None, backend="keras", num_threads=None,
+                 preprocess_workers=4, inference_batch_size=16):
+        """
+        Initialize the model by loading from disk
+        
+        Args:
+            model_path (str, optional): Model artifact to load, relative to this
+                directory; defaults to the backend's artifact, e.g. alzheimer_model.keras
+                (used to serve other model versions)
+            batching (dict, optional): Micro-batching settings: enabled,
+                max_batch_size and max_wait_ms
+            backend (str): Inference backend: "keras" (full TensorFlow), or a
+                converted graph run with "tflite" or "onnx" (see convert.py)
+            num_threads (int, optional): CPU threads used by the backend
+            preprocess_workers (int): Threads decoding and resizing images in predict_many
+            inference_batch_size (int): Largest forward pass in predict_many
+        """
+        self.backend = backend
+        self.num_threads = num_threads
+        self.model_path = os.path.join(os.path.dirname(__file__), model_path or DEFAULT_ARTIFACTS.get(backend, 'alzheimer_model.keras'))
         self.model = self._load_model()
         
+        # Concurrent requests are scored together in one forward pass when batching is enabled
+        batching = batching or {}
+        self.batcher = None
+        if self.model is not None and batching.get("enabled", False):
+            self.batcher = MicroBatcher(
+                forward_fn=lambda batch: self.model.predict(batch),
+                max_batch_size=batching.get("max_batch_size", 8),
+                max_wait_ms=batching.get("max_wait_ms", 10),
+                name="alzheimer"
+            )
+            
         # Define class labels
         self.class_labels = ['CN', 'EMCI', 'LMCI', 'AD']
         self.class_descriptions = {
@@ -39,15 +70,20 @@ class AlzheimerModel:
         
         # Image preprocessing parameters
         self.target_size = (224, 224)  # Standard input size for DenseNet
-        self.preprocess_input = tf.keras.applications.densenet.preprocess_input
-    
+        self.preprocess_input = densenet_preprocess_input
+        
+        # Bulk scoring settings; the preprocessing pool starts on first use
+        self.preprocess_workers = max(1, int(preprocess_workers))
+        self.inference_batch_size = max(1, int(inference_batch_size))
+        self._preprocess_pool = None
+        self._pool_lock = threading.Lock()
+
     def _load_model(self):
-        """Load the Keras model from disk"""
+        """Load the model artifact from disk with the configured backend"""
         try:
             if os.path.exists(self.model_path):
-                # Load model with custom objects if needed
-                model = load_model(self.model_path)
-                logger.info(f"Successfully loaded Alzheimer model from {self.model_path}")
+                model = load_backend(self.backend, self.model_path, num_threads=self.num_threads)
+                logger.info(f"Successfully loaded Alzheimer model from {self.model_path} ({self.backend} backend)")
                 return model
             else:
                 logger.error(f"Model file not found at {self.model_path}")
@@ -77,6 +113,18 @@ class AlzheimerModel:
         except Exception as e:
             return False, f"Invalid image data: {str(e)}"
     
+    def sample_input(self):
+        """
+        Build a synthetic MRI-sized image used for validation and warmup predictions.
+        
+        Returns:
+            bytes: PNG encoded grayscale image
+        """
+        img = Image.new('L', self.target_size, color=128)
+        buffer = io.BytesIO()
+        img.save(buffer, format='PNG')
+        return buffer.getvalue()
+    
     def preprocess_image(self, image_data):
         """
         Preprocess the input image for the model.
@@ -95,7 +143,7 @@ class AlzheimerModel:
             img = img.resize(self.target_size)
             
             # Convert to numpy array
-            img_array = image.img_to_array(img)
+            img_array = np.asarray(img, dtype=np.float32)
             
             # Expand dimensions for batch processing
             img_array = np.expand_dims(img_array, axis=0)
@@ -116,7 +164,8 @@ class AlzheimerModel:
         
         Args:
             image_data (bytes): Raw image data
-            context (dict, optional): Additional context like patient_id and image_path
+            context (dict, optional): Additional context like patient_id and image_path;
+                work is dropped once its "deadline" has passed
             
         Returns:
             dict: Prediction results including Alzheimer's classification and confidence scores
@@ -127,6 +176,10 @@ class AlzheimerModel:
             logger.error(f"Input validation failed: {error_message}")
             return {"error": error_message}
         
+        # Drop the request if its caller has already given up
+        if is_expired(context):
+            return cancelled_result("preprocessing")
+        
         try:
             # Preprocess the input image
             logger.info("Preprocessing input image")
@@ -137,14 +190,18 @@ class AlzheimerModel:
                 logger.error("Model not loaded - prediction cannot continue")
                 return {"error": "Model not loaded - please check server configuration"}
             
+            if is_expired(context):
+                return cancelled_result("inference")
+            
             # Make prediction
             logger.info("Making prediction with model")
             try:
-                predictions = self.model.predict(preprocessed_data)
-                logger.info(f"Raw prediction values: {predictions[0]}")
-                
-                # Get class probabilities
-                class_probabilities = predictions[0]
+                if self.batcher is not None:
+                    # Share a forward pass with other concurrent requests
+                    class_probabilities = self.batcher.predict(preprocessed_data[0], deadline=(context or {}).get("deadline"))
+                else:
+                    class_probabilities = self.model.predict(preprocessed_data)[0]
+                logger.info(f"Raw prediction values: {class_probabilities}")
                 
                 # Get the predicted class index and label
                 predicted_class_index = np.argmax(class_probabilities)
@@ -153,6 +210,8 @@ class AlzheimerModel:
                 # Get the confidence (highest probability)
                 confidence = float(class_probabilities[predicted_class_index])
                 
+            except DeadlineExceeded:
+                return cancelled_result("inference")
             except Exception as model_error:
                 logger.error(f"Error during model prediction: {str(model_error)}")
                 return {"error": f"Model prediction failed: {str(model_error)}"}
@@ -171,7 +230,9 @@ class AlzheimerModel:
             
             logger.info(f"Prediction result: {predicted_class} with {confidence:.2f} confidence")
             
-            # Store result in database if patient_id and image_path are provided
+            # Store result in database if patient_id and image_path are provided, unless the caller has given up
+            if is_expired(context):
+                return cancelled_result("storage")
             if context and "patient_id" in context and "image_path" in context:
                 try:
                     prediction_id = self._store_prediction(
@@ -197,6 +258,129 @@ class AlzheimerModel:
             logger.error(f"Error in Alzheimer prediction process: {str(e)}", exc_info=True)
             return {"error": "An error occurred during prediction processing"}
     
+    def _prepare_image(self, image_data):
+        """
+        Validate and preprocess one image for predict_many.
+        
+        Returns:
+            tuple: (preprocessed (224, 224, 3) array or None, error message or None)
+        """
+        is_valid, error_message = self.validate_input(image_data)
+        if not is_valid:
+            return None, error_message
+            
+        try:
+            return self.preprocess_image(image_data)[0], None
+        except Exception as e:
+            return None, f"Invalid image data: {str(e)}"
+            
+    def _get_preprocess_pool(self):
+        """Get the thread pool preprocessing images, creating it on first use"""
+        if self._preprocess_pool is None:
+            with self._pool_lock:
+                if self._preprocess_pool is None:
+                    self._preprocess_pool = ThreadPoolExecutor(
+                        max_workers=self.preprocess_workers,
+                        thread_name_prefix="alzheimer-preprocess"
+                    )
+        return self._preprocess_pool
+        
+    def predict_many(self, images, context=None):
+        """
+        Make predictions for many images with batched model calls.
+        
+        Images are decoded and preprocessed in parallel (PIL releases the GIL
+        while decoding and resizing), then scored in forward passes of up to
+        inference_batch_size images.
+        
+        Args:
+            images (list): Raw image data (bytes) per image
+            context (dict, optional): "patient_ids" and "image_paths", one per
+                image; images with both are stored as predictions
+                
+        Returns:
+            list: One entry per image, in order: the prediction result, or
+                {"error": message} for images that could not be scored
+        """
+        results = [None] * len(images)
+        
+        prepared = list(self._get_preprocess_pool().map(self._prepare_image, images))
+        valid_indices = []
+        for index, (array, error_message) in enumerate(prepared):
+            if error_message is not None:
+                results[index] = {"error": error_message}
+            else:
+                valid_indices.append(index)
+                
+        if not valid_indices:
+            return results
+            
+        if self.model is None:
+            logger.error("Model not loaded - prediction cannot continue")
+            for index in valid_indices:
+                results[index] = {"error": "Model not loaded - please check server configuration"}
+            return results
+            
+        timestamp = datetime.utcnow().isoformat()
+        for start in range(0, len(valid_indices), self.inference_batch_size):
+            indices = valid_indices[start:start + self.inference_batch_size]
+            batch = np.stack([prepared[index][0] for index in indices])
+            
+            try:
+                outputs = self.model.predict(batch)
+            except Exception as model_error:
+                logger.error(f"Error during batch model prediction: {str(model_error)}")
+                for index in indices:
+                    results[index] = {"error": f"Model prediction failed: {str(model_error)}"}
+                continue
+                
+            for index, class_probabilities in zip(indices, outputs):
+                predicted_class = self.class_labels[int(np.argmax(class_probabilities))]
+                results[index] = {
+                    "predicted_class": predicted_class,
+                    "class_description": self.class_descriptions[predicted_class],
+                    "confidence": float(np.max(class_probabilities)),
+                    "probabilities": {
+                        self.class_labels[i]: float(prob)
+                        for i, prob in enumerate(class_probabilities)
+                    },
+                    "timestamp": timestamp
+                }
+                
+        scored = [index for index in valid_indices if "error" not in results[index]]
+        logger.info(f"Batch prediction completed: {len(scored)} of {len(images)} images scored")
+        
+        # Store results in database for images with a patient and a stored image
+        if context and "patient_ids" in context and "image_paths" in context:
+            patient_ids, image_paths = context["patient_ids"], context["image_paths"]
+            items = [
+                (results[index], patient_ids[index], image_paths[index])
+                for index in scored if patient_ids[index] and image_paths[index]
+            ]
+            if items:
+                self._store_predictions(items)
+                
+        return results
+        
+    def close(self):
+        """Release background resources once this instance has been swapped out"""
+        if self.batcher is not None:
+            self.batcher.close()
+        if self._preprocess_pool is not None:
+            self._preprocess_pool.shutdown(wait=False)
+            
+    def get_runtime_stats(self):
+        """
+        Get runtime statistics of the model connector.
+        
+        Returns:
+            dict: Micro-batching statistics, or None when batching is disabled
+        """
+        return {
+            "backend": self.backend,
+            "batching": self.batcher.get_stats() if self.batcher is not None else None
+        }
+        
     def _store_prediction(self, result, patient_id, image_path):
         """
         Store the prediction result in the database.
@@ -223,3 +407,49 @@ class AlzheimerModel:
         logger.info(f"Stored Alzheimer prediction for patient {patient_id}")
         
         return prediction.id
+        
+    def _store_predictions(self, items):
+        """
+        Store many prediction results in the database with a single commit.
+        
+        The rows are written with one multi-row INSERT rather than through
+        ORM objects. Sets "id" on each stored result, or "storage_error" on
+        every result if the commit fails.
+        
+        Args:
+            items (list): (result, patient_id, image_path) tuples
+        """
+        try:
+            created_at = datetime.utcnow()
+            rows = [
+                {
+                    "id": str(uuid.uuid4()),
+                    "patient_id": patient_id,
+                    "created_at": created_at,
+                    "image_path": image_path,
+                    "prediction_class": result["predicted_class"],
+                    "cn_probability": result["probabilities"]["CN"],
+                    "emci_probability": result["probabilities"]["EMCI"],
+                    "lmci_probability": result["probabilities"]["LMCI"],
+                    "ad_probability": result["probabilities"]["AD"],
+                    "confidence": result["confidence"]
+                }
+                for result, patient_id, image_path in items
+            ]
+            
+            db.session.execute(AlzheimerPrediction.__table__.insert(), rows)
+            db.session.commit()
+            
+            for (result, _, _), row in zip(items, rows):
+                result["id"] = row["id"]
+                
+            logger.info(f"Stored {len(rows)} Alzheimer predictions")
+        except Exception as db_error:
+            logger.error(f"Error storing predictions in database: {str(db_error)}")
+            for result, _, _ in items:
+                result["storage_error"] = "Failed to store prediction"
+                
+            try:
+                db.session.rollback()
+            except:
+                pass
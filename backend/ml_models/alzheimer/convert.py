@@ -0,0 +1,240 @@
+"""
+Convert the Alzheimer Keras model to a CPU-optimized backend and check that
+the converted graph gives the same outputs on a reference image set.
+
+    python -m ml_models.alzheimer.convert --to tflite --images path/to/reference_mris
+    python -m ml_models.alzheimer.convert --to onnx --images path/to/reference_mris
+
+Select the converted model in model_config.json with
+"params": {"backend": "tflite"} (or "onnx"), e.g. as its own version.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from pathlib import Path
+from PIL import Image
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from utils.logger import setup_logger
+from ml_models.artifacts import process_memory
+from ml_models.alzheimer.backends import default_artifact, load_backend, densenet_preprocess_input
+
+logger = setup_logger("alzheimer_convert")
+
+CLASS_LABELS = ['CN', 'EMCI', 'LMCI', 'AD']
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff"}
+
+def load_image_set(directory, target_size=(224, 224), limit=None):
+    """
+    Load and preprocess a reference image set the same way AlzheimerModel does.
+    
+    Images in a sub-directory named after a class (CN, EMCI, LMCI, AD) are
+    labelled with that class.
+    
+    Args:
+        directory (str): Directory searched recursively for images
+        target_size (tuple): Model input size
+        limit (int, optional): Maximum number of images
+        
+    Returns:
+        tuple: (preprocessed float32 batch, list of labels or None per image, list of paths)
+    """
+    paths = sorted(
+        str(path) for path in Path(directory).rglob("*")
+        if path.suffix.lower() in IMAGE_EXTENSIONS
+    )[:limit]
+    if not paths:
+        raise ValueError(f"No images found in {directory}")
+        
+    arrays, labels = [], []
+    for path in paths:
+        img = Image.open(path).convert('RGB').resize(target_size)
+        arrays.append(np.asarray(img, dtype=np.float32))
+        parent = Path(path).parent.name
+        labels.append(parent if parent in CLASS_LABELS else None)
+        
+    return densenet_preprocess_input(np.stack(arrays)), labels, paths
+
+def convert_to_tflite(keras_path, output_path, optimize=None, representative_data=None):
+    """
+    Convert the Keras model to a TFLite flatbuffer.
+    
+    Args:
+        keras_path (str): Path of the .keras model
+        output_path (str): Path of the .tflite file to write
+        optimize (str, optional): None for a float graph, "dynamic" for
+            dynamic-range int8 weights, "int8" for full integer quantization
+        representative_data (numpy.ndarray, optional): Calibration batch,
+            required for "int8"
+            
+    Returns:
+        str: Path of the written file
+    """
+    import tensorflow as tf
+    
+    model = tf.keras.models.load_model(keras_path)
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    
+    if optimize in ("dynamic", "int8"):
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if optimize == "int8":
+        if representative_data is None:
+            raise ValueError("Full int8 quantization needs a calibration image set")
+            
+        def representative_dataset():
+            for sample in representative_data:
+                yield [sample[np.newaxis].astype(np.float32)]
+                
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.int8
+        converter.inference_output_type = tf.int8
+        
+    with open(output_path, "wb") as f:
+        f.write(converter.convert())
+        
+    logger.info(f"Wrote TFLite model ({optimize or 'float'}) to {output_path}")
+    return output_path
+
+def convert_to_onnx(keras_path, output_path, opset=13):
+    """
+    Convert the Keras model to ONNX with tf2onnx.
+    
+    Args:
+        keras_path (str): Path of the .keras model
+        output_path (str): Path of the .onnx file to write
+        opset (int): ONNX opset version
+        
+    Returns:
+        str: Path of the written file
+    """
+    import tensorflow as tf
+    import tf2onnx
+    
+    model = tf.keras.models.load_model(keras_path)
+    input_signature = [tf.TensorSpec((None,) + tuple(model.input_shape[1:]), tf.float32, name="input")]
+    tf2onnx.convert.from_keras(model, input_signature=input_signature, opset=opset, output_path=output_path)
+    
+    logger.info(f"Wrote ONNX model to {output_path}")
+    return output_path
+
+def measure_backend(backend, model_path, batch, repeats=3, num_threads=None):
+    """
+    Load a backend and measure its load time, memory and per-image latency.
+    
+    Memory is the growth in process RSS while loading, so runtimes already
+    imported by this process are not counted; use measure_isolated to
+    compare backends fairly.
+    
+    Args:
+        backend (str): Backend name
+        model_path (str): Path of the artifact
+        batch (numpy.ndarray): Preprocessed images, scored one at a time
+        repeats (int): Number of passes over the images
+        num_threads (int, optional): CPU threads used by the backend
+        
+    Returns:
+        tuple: (outputs for the batch, measurement dict)
+    """
+    rss_before = (process_memory() or {}).get("rss_kb")
+    started = time.perf_counter()
+    runner = load_backend(backend, model_path, num_threads=num_threads)
+    load_seconds = time.perf_counter() - started
+    rss_after = (process_memory() or {}).get("rss_kb")
+    
+    # The first call pays one-time setup; keep it out of the latency figures
+    runner.predict(batch[:1])
+    
+    latencies, outputs = [], None
+    for _ in range(repeats):
+        rows = []
+        for image in batch:
+            started = time.perf_counter()
+            rows.append(runner.predict(image[np.newaxis])[0])
+            latencies.append((time.perf_counter() - started) * 1000)
+        outputs = np.stack(rows)
+        
+    latencies = np.array(latencies)
+    return outputs, {
+        "backend": backend,
+        "artifact": model_path,
+        "artifact_bytes": os.path.getsize(model_path) if os.path.isfile(model_path) else None,
+        "load_seconds": round(load_seconds, 3),
+        "rss_delta_kb": rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+        "latency_ms": {
+            "p50": round(float(np.percentile(latencies, 50)), 3),
+            "p99": round(float(np.percentile(latencies, 99)), 3),
+            "mean": round(float(latencies.mean()), 3)
+        }
+    }
+
+def measure_isolated(backend, model_path, batch, repeats=3, num_threads=None):
+    """Run measure_backend in a fresh process, so no runtime is preloaded"""
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(measure_backend, backend, model_path, batch, repeats, num_threads).result()
+
+def compare_outputs(reference, candidate, tolerance):
+    """
+    Compare the class probabilities of two backends on the same images.
+    
+    Args:
+        reference (numpy.ndarray): (n, classes) outputs of the Keras model
+        candidate (numpy.ndarray): (n, classes) outputs of the converted model
+        tolerance (float): Largest allowed absolute probability difference
+        
+    Returns:
+        dict: Difference and top-1 agreement figures, and whether parity holds
+    """
+    diff = np.abs(np.asarray(reference, dtype=np.float64) - np.asarray(candidate, dtype=np.float64))
+    agreement = float(np.mean(np.argmax(reference, axis=1) == np.argmax(candidate, axis=1)))
+    return {
+        "images": int(len(reference)),
+        "max_abs_diff": float(diff.max()),
+        "mean_abs_diff": float(diff.mean()),
+        "top1_agreement": round(agreement, 4),
+        "tolerance": tolerance,
+        "passed": bool(diff.max() <= tolerance and agreement == 1.0)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert the Alzheimer model and check parity with Keras")
+    parser.add_argument("--to", choices=["tflite", "onnx"], required=True, help="Target backend")
+    parser.add_argument("--keras", default=default_artifact("keras"), help="Path of the .keras model")
+    parser.add_argument("--output", help="Path of the converted model (defaults next to the Keras model)")
+    parser.add_argument("--images", required=True, help="Directory of reference MRI images for the parity check")
+    parser.add_argument("--limit", type=int, help="Use at most this many reference images")
+    parser.add_argument("--tolerance", type=float, default=1e-3, help="Largest allowed probability difference")
+    parser.add_argument("--threads", type=int, help="CPU threads for both backends")
+    args = parser.parse_args()
+    
+    output_path = args.output or default_artifact(args.to)
+    if args.to == "tflite":
+        convert_to_tflite(args.keras, output_path)
+    else:
+        convert_to_onnx(args.keras, output_path)
+        
+    batch, _, _ = load_image_set(args.images, limit=args.limit)
+    
+    # Each backend is measured in its own process so their runtimes do not skew the memory figures
+    candidate_outputs, candidate = measure_isolated(args.to, output_path, batch, num_threads=args.threads)
+    reference_outputs, reference = measure_isolated("keras", args.keras, batch, num_threads=args.threads)
+    
+    report = {
+        "reference": reference,
+        "candidate": candidate,
+        "parity": compare_outputs(reference_outputs, candidate_outputs, args.tolerance)
+    }
+    print(json.dumps(report, indent=4))
+    
+    if not report["parity"]["passed"]:
+        logger.error(f"Parity check failed for {output_path}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
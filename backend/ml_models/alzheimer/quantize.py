@@ -0,0 +1,176 @@
+"""
+Produce a post-training quantized variant of the Alzheimer DenseNet model
+and report how it compares with the float model.
+
+    python -m ml_models.alzheimer.quantize --mode dynamic --eval path/to/labelled_mris
+    python -m ml_models.alzheimer.quantize --mode int8 --calibration path/to/mri_slices \\
+        --eval path/to/labelled_mris --register 1.0.0-int8
+
+Evaluation images in CN/EMCI/LMCI/AD sub-directories are used for top-1
+accuracy. With --register the quantized model is added to model_config.json
+as a version of the alzheimer model (served with the tflite backend), so it
+can be shadowed or split against the float model before being promoted.
+"""
+import os
+import sys
+import json
+import argparse
+import numpy as np
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from utils.logger import setup_logger
+from ml_models.alzheimer.backends import default_artifact
+from ml_models.alzheimer.convert import CLASS_LABELS, load_image_set, convert_to_tflite, measure_isolated
+
+logger = setup_logger("alzheimer_quantize")
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'model_config.json')
+
+def quantize(keras_path, output_path, mode, calibration_dir=None, calibration_limit=200):
+    """
+    Write a quantized TFLite variant of the Keras model.
+    
+    Args:
+        keras_path (str): Path of the float .keras model
+        output_path (str): Path of the .tflite file to write
+        mode (str): "dynamic" (int8 weights, float activations) or "int8"
+            (integer weights and activations, calibrated)
+        calibration_dir (str, optional): MRI slices used to calibrate activation
+            ranges, required for "int8"
+        calibration_limit (int): Maximum number of calibration images
+        
+    Returns:
+        str: Path of the written file
+    """
+    calibration = None
+    if mode == "int8":
+        if not calibration_dir:
+            raise ValueError("--calibration is required for full int8 quantization")
+        calibration, _, _ = load_image_set(calibration_dir, limit=calibration_limit)
+        logger.info(f"Calibrating int8 quantization with {len(calibration)} images")
+        
+    return convert_to_tflite(keras_path, output_path, optimize=mode, representative_data=calibration)
+
+def accuracy_report(float_outputs, quantized_outputs, labels):
+    """
+    Compare the predicted classes of the float and quantized models.
+    
+    Args:
+        float_outputs (numpy.ndarray): (n, classes) probabilities of the float model
+        quantized_outputs (numpy.ndarray): (n, classes) probabilities of the quantized model
+        labels (list): True class name per image, or None if unlabelled
+        
+    Returns:
+        dict: Overall and per-class agreement, confusion matrix between the
+            two models and top-1 accuracy of both against the labels
+    """
+    float_classes = np.argmax(float_outputs, axis=1)
+    quantized_classes = np.argmax(quantized_outputs, axis=1)
+    
+    per_class = {}
+    for index, label in enumerate(CLASS_LABELS):
+        predicted = float_classes == index
+        per_class[label] = {
+            "images": int(predicted.sum()),
+            "agreement": round(float(np.mean(quantized_classes[predicted] == index)), 4) if predicted.any() else None
+        }
+        
+    confusion = np.zeros((len(CLASS_LABELS), len(CLASS_LABELS)), dtype=int)
+    for float_class, quantized_class in zip(float_classes, quantized_classes):
+        confusion[float_class, quantized_class] += 1
+        
+    report = {
+        "images": int(len(float_classes)),
+        "agreement": round(float(np.mean(float_classes == quantized_classes)), 4),
+        "per_class_agreement": per_class,
+        "confusion_float_vs_quantized": {
+            "labels": CLASS_LABELS,
+            "matrix": confusion.tolist()
+        },
+        "max_abs_probability_diff": float(np.abs(float_outputs - quantized_outputs).max()),
+        "labelled_images": 0,
+        "top1_accuracy": None
+    }
+    
+    labelled = [i for i, label in enumerate(labels) if label in CLASS_LABELS]
+    if labelled:
+        truth = np.array([CLASS_LABELS.index(labels[i]) for i in labelled])
+        report["labelled_images"] = len(labelled)
+        report["top1_accuracy"] = {
+            "float": round(float(np.mean(float_classes[labelled] == truth)), 4),
+            "quantized": round(float(np.mean(quantized_classes[labelled] == truth)), 4)
+        }
+        
+    return report
+
+def register_version(version, model_path):
+    """
+    Add the quantized model to model_config.json as a version of the alzheimer model.
+    
+    The version keeps the other params of the alzheimer model (e.g. batching)
+    and is served with the tflite backend. Routing is left unchanged.
+    
+    Args:
+        version (str): Version name, e.g. "1.0.0-int8"
+        model_path (str): Path of the quantized .tflite file
+    """
+    with open(CONFIG_PATH, 'r') as f:
+        config = json.load(f)
+        
+    model_info = config["models"]["alzheimer"]
+    params = dict(model_info.get("params", {}))
+    params["backend"] = "tflite"
+    params["model_path"] = os.path.relpath(model_path, os.path.dirname(__file__))
+    
+    model_info.setdefault("versions", {})[version] = {"params": params}
+    
+    with open(CONFIG_PATH, 'w') as f:
+        json.dump(config, f, indent=4)
+        
+    logger.info(f"Registered {model_path} as alzheimer version {version}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantize the Alzheimer model and report accuracy and latency")
+    parser.add_argument("--mode", choices=["dynamic", "int8"], required=True, help="Quantization mode")
+    parser.add_argument("--keras", default=default_artifact("keras"), help="Path of the float .keras model")
+    parser.add_argument("--output", help="Path of the quantized model (defaults to alzheimer_model_<mode>.tflite)")
+    parser.add_argument("--calibration", help="Directory of MRI slices for int8 calibration")
+    parser.add_argument("--eval", required=True, help="Directory of evaluation MRIs (labelled by sub-directory)")
+    parser.add_argument("--limit", type=int, help="Use at most this many evaluation images")
+    parser.add_argument("--threads", type=int, help="CPU threads for both models")
+    parser.add_argument("--report", help="Also write the report to this JSON file")
+    parser.add_argument("--register", metavar="VERSION", help="Add the quantized model to model_config.json as this version")
+    args = parser.parse_args()
+    
+    output_path = args.output or os.path.join(os.path.dirname(__file__), f"alzheimer_model_{args.mode}.tflite")
+    quantize(args.keras, output_path, args.mode, calibration_dir=args.calibration)
+    
+    batch, labels, _ = load_image_set(args.eval, limit=args.limit)
+    
+    # Each model is measured in its own process so their runtimes do not skew the memory figures
+    quantized_outputs, quantized = measure_isolated("tflite", output_path, batch, num_threads=args.threads)
+    float_outputs, reference = measure_isolated("keras", args.keras, batch, num_threads=args.threads)
+    
+    report = {
+        "mode": args.mode,
+        "float": reference,
+        "quantized": quantized,
+        "size_ratio": (
+            round(reference["artifact_bytes"] / quantized["artifact_bytes"], 2)
+            if reference["artifact_bytes"] and quantized["artifact_bytes"] else None
+        ),
+        "accuracy": accuracy_report(float_outputs, quantized_outputs, labels)
+    }
+    
+    report_json = json.dumps(report, indent=4)
+    print(report_json)
+    if args.report:
+        with open(args.report, 'w') as f:
+            f.write(report_json)
+            
+    if args.register:
+        register_version(args.register, output_path)
+
+if __name__ == "__main__":
+    main()
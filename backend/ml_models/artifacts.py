@@ -0,0 +1,143 @@
+import os
+import joblib
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from utils.logger import setup_logger
+
+logger = setup_logger("artifacts")
+
+# Suffix of artifacts written uncompressed so their numpy arrays can be memory-mapped
+MMAP_SUFFIX = ".mmap.joblib"
+
+def mmap_artifact_path(model_path):
+    """
+    Get the path of the memory-mappable copy of a model artifact.
+    
+    Args:
+        model_path (str): Path of the original artifact (e.g. diabetes_model.pkl)
+        
+    Returns:
+        str: Path of the memory-mappable artifact next to it
+    """
+    if model_path.endswith(MMAP_SUFFIX):
+        return model_path
+    return os.path.splitext(model_path)[0] + MMAP_SUFFIX
+
+def export_mmap_artifact(model_path, target_path=None):
+    """
+    Re-save a model artifact uncompressed, with its numpy arrays stored aligned
+    so joblib can memory-map them instead of reading them into private memory.
+    
+    Args:
+        model_path (str): Path of the original artifact
+        target_path (str, optional): Output path; defaults to mmap_artifact_path(model_path)
+        
+    Returns:
+        str: Path of the written artifact
+    """
+    target_path = target_path or mmap_artifact_path(model_path)
+    model = joblib.load(model_path)
+    joblib.dump(model, target_path, compress=0)
+    logger.info(f"Exported memory-mappable artifact {target_path} from {model_path}")
+    return target_path
+
+def load_artifact(model_path, mmap_mode=None):
+    """
+    Load a model artifact, memory-mapping its numpy arrays when possible.
+    
+    With mmap_mode set, the memory-mappable copy written by export_mmap_artifact
+    is preferred if it exists. Arrays the model keeps as numpy arrays then stay
+    backed by the page cache and are shared by every process mapping the file;
+    estimators that copy their arrays into native buffers on unpickling (e.g.
+    sklearn trees, CatBoost) still hold a private copy.
+    
+    Args:
+        model_path (str): Path of the artifact
+        mmap_mode (str, optional): joblib mmap mode such as "r"; None reads the whole file
+        
+    Returns:
+        tuple: (model, path actually loaded)
+    """
+    if mmap_mode:
+        mmap_path = mmap_artifact_path(model_path)
+        if os.path.exists(mmap_path):
+            return joblib.load(mmap_path, mmap_mode=mmap_mode), mmap_path
+        logger.warning(f"No memory-mappable artifact at {mmap_path}, loading {model_path} into memory")
+        
+    return joblib.load(model_path), model_path
+
+def _read_smaps(path):
+    """Parse an smaps-style file into (mapped file or None, {field: kB}) records"""
+    records = []
+    current = None
+    with open(path) as smaps:
+        for line in smaps:
+            fields = line.split()
+            if not fields:
+                continue
+            if fields[0].endswith(":") and len(fields) >= 2 and fields[1].isdigit():
+                if current is not None:
+                    current[1][fields[0][:-1]] = int(fields[1])
+            else:
+                # Mapping header: address perms offset dev inode [pathname]
+                current = (fields[5] if len(fields) > 5 else None, {})
+                records.append(current)
+    return records
+
+def _summarize(values):
+    """Reduce smaps fields to resident, shared and private kB"""
+    shared = values.get("Shared_Clean", 0) + values.get("Shared_Dirty", 0)
+    private = values.get("Private_Clean", 0) + values.get("Private_Dirty", 0)
+    return {
+        "rss_kb": values.get("Rss", 0),
+        "pss_kb": values.get("Pss", 0),
+        "shared_kb": shared,
+        "private_kb": private
+    }
+
+def process_memory():
+    """
+    Get resident, proportional, shared and private memory of this process.
+    
+    Returns:
+        dict: Memory figures in kB, or None where /proc is not available
+    """
+    try:
+        records = _read_smaps("/proc/self/smaps_rollup")
+    except OSError:
+        return None
+    return _summarize(records[0][1]) if records else None
+
+def mapped_file_memory(paths):
+    """
+    Get the memory of this process backed by the given memory-mapped files.
+    
+    Args:
+        paths (list): Artifact paths
+        
+    Returns:
+        dict: Path mapped to its resident, shared and private kB (files that are
+            not mapped are left out), or None where /proc is not available
+    """
+    wanted = {os.path.realpath(path) for path in paths}
+    try:
+        records = _read_smaps("/proc/self/smaps")
+    except OSError:
+        return None
+        
+    totals = {}
+    for mapped_path, values in records:
+        if mapped_path in wanted:
+            summed = totals.setdefault(mapped_path, {})
+            for field, value in values.items():
+                summed[field] = summed.get(field, 0) + value
+                
+    return {path: _summarize(values) for path, values in totals.items()}
+
+if __name__ == "__main__":
+    # Write memory-mappable copies of the given artifacts:
+    #   python -m ml_models.artifacts ml_models/diabetes/diabetes_model.pkl
+    for artifact in sys.argv[1:]:
+        print(export_mmap_artifact(artifact))
@@ -0,0 +1,235 @@
+import os
+import threading
+import time
+import queue
+import weakref
+from collections import deque, Counter
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from pathlib import Path
+import sys
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from utils.logger import setup_logger
+from ml_models.deadline import DeadlineExceeded, bounded_timeout
+
+logger = setup_logger("batching")
+
+# Every batcher of this process, so a forked child can reset their queues and locks
+_batchers = weakref.WeakSet()
+
+def _reset_after_fork():
+    """Give every batcher inherited through fork a fresh queue and locks (runs in the child)"""
+    for batcher in list(_batchers):
+        batcher._reset()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+class MicroBatcher:
+    """
+    Collects inputs submitted concurrently by request threads and runs them
+    through the model in a single forward pass.
+    
+    A batch is closed when it holds max_batch_size items or when the oldest
+    item has waited max_wait_ms, whichever comes first. Each caller gets back
+    its own row of the batch output. Inputs whose deadline has passed by the
+    time their batch runs are dropped instead of scored.
+    
+    The worker thread starts on the first submit and is started again if it
+    has died, or if the batcher was inherited by a forked process, where the
+    thread of the parent does not exist.
+    """
+    
+    def __init__(self, forward_fn, max_batch_size=8, max_wait_ms=10, name="model", window_size=1000):
+        """
+        Initialize the batcher; its worker thread starts on first use.
+        
+        Args:
+            forward_fn (callable): Runs the model on a stacked batch, returns one output row per input
+            max_batch_size (int): Largest number of items in one forward pass
+            max_wait_ms (float): Longest time the first item of a batch waits for more items
+            name (str): Name used in logs and the worker thread name
+            window_size (int): Number of recent batches kept for statistics
+        """
+        self.forward_fn = forward_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+        
+        self._closed = False
+        self._batch_sizes = Counter()
+        self._queue_waits = deque(maxlen=window_size)
+        self._batches = 0
+        self._items = 0
+        self._expired = 0
+        self._reset()
+        _batchers.add(self)
+        
+    def _reset(self):
+        """Start over with an empty queue, new locks and no worker thread"""
+        self._queue = queue.Queue()
+        self._submit_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._thread = None
+        
+        # Process the worker thread was started in
+        self._pid = None
+        
+    def _ensure_running(self):
+        """Start the worker thread unless it is running in this process (submit lock held)"""
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        if self._thread is not None:
+            logger.warning(f"Restarting micro-batcher worker for {self.name}")
+            
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name=f"micro-batcher-{self.name}", daemon=True)
+        self._thread.start()
+        logger.info(f"Started micro-batcher for {self.name} (max_batch_size={self.max_batch_size}, max_wait_ms={self.max_wait * 1000})")
+        
+    def submit(self, item, deadline=None):
+        """
+        Queue one input for the next batch.
+        
+        Args:
+            item (numpy.ndarray): A single input without the batch dimension
+            deadline (float, optional): UNIX time after which the input is dropped
+                and its future fails with DeadlineExceeded
+            
+        Returns:
+            Future: Resolves to the output row for this input
+        """
+        future = Future()
+        with self._submit_lock:
+            if not self._closed:
+                self._ensure_running()
+                self._queue.put((item, future, time.perf_counter(), deadline))
+                return future
+                
+        # The batcher was closed (e.g. its model was swapped out); run this input on its own
+        try:
+            future.set_result(self.forward_fn(np.stack([item]))[0])
+        except Exception as e:
+            future.set_exception(e)
+        return future
+        
+    def close(self):
+        """
+        Stop the worker thread once the inputs already queued have been scored.
+        Inputs submitted afterwards run unbatched in the caller's thread.
+        """
+        with self._submit_lock:
+            if self._closed:
+                return
+            self._closed = True
+            if self._thread is not None:
+                self._queue.put(None)
+                
+    def predict(self, item, timeout=None, deadline=None):
+        """
+        Queue one input and wait for its output row, no longer than the deadline allows.
+        
+        Raises:
+            DeadlineExceeded: If the deadline passes before the row is ready
+        """
+        future = self.submit(item, deadline)
+        try:
+            return future.result(timeout=bounded_timeout({"deadline": deadline}, timeout))
+        except FutureTimeout:
+            # Leave the input out of its batch if it has not run yet
+            future.cancel()
+            if deadline is not None and time.time() >= deadline:
+                raise DeadlineExceeded()
+            raise
+        
+    def _collect(self):
+        """Block for the first item, then gather more until the batch is full or the wait expires"""
+        first = self._queue.get()
+        if first is None:
+            return [], True
+            
+        batch = [first]
+        deadline = first[2] + self.max_wait
+        
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining > 0:
+                    entry = self._queue.get(timeout=remaining)
+                else:
+                    # Take whatever is already queued without waiting any longer
+                    entry = self._queue.get_nowait()
+            except queue.Empty:
+                break
+                
+            if entry is None:
+                return batch, True
+            batch.append(entry)
+            
+        return batch, False
+        
+    def _run(self):
+        """Worker loop: collect a batch, run one forward pass, hand out the rows"""
+        closed = False
+        while not closed:
+            batch, closed = self._collect()
+            started = time.perf_counter()
+            
+            # Skip inputs whose callers have already given up
+            batch = [entry for entry in batch if entry[1].set_running_or_notify_cancel()]
+            
+            # Drop inputs whose request deadline passed while they were queued
+            now = time.time()
+            expired = [entry for entry in batch if entry[3] is not None and entry[3] <= now]
+            if expired:
+                batch = [entry for entry in batch if entry[3] is None or entry[3] > now]
+                for entry in expired:
+                    entry[1].set_exception(DeadlineExceeded())
+                with self._stats_lock:
+                    self._expired += len(expired)
+            if not batch:
+                continue
+                
+            try:
+                outputs = self.forward_fn(np.stack([item for item, _, _, _ in batch]))
+                for (_, future, _, _), row in zip(batch, outputs):
+                    future.set_result(row)
+            except Exception as e:
+                logger.error(f"Error in batched forward pass for {self.name}: {str(e)}")
+                for _, future, _, _ in batch:
+                    future.set_exception(e)
+                    
+            with self._stats_lock:
+                self._batches += 1
+                self._items += len(batch)
+                self._batch_sizes[len(batch)] += 1
+                for _, _, enqueued, _ in batch:
+                    self._queue_waits.append((started - enqueued) * 1000)
+                    
+    def get_stats(self):
+        """
+        Get batch size and queue wait statistics.
+        
+        Returns:
+            dict: Batch counts, mean batch size, batch size histogram, inputs dropped
+                after their deadline and queue wait percentiles in ms
+        """
+        with self._stats_lock:
+            waits = np.array(self._queue_waits, dtype=float)
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+                "batches": self._batches,
+                "items": self._items,
+                "expired": self._expired,
+                "mean_batch_size": round(self._items / self._batches, 3) if self._batches else None,
+                "batch_size_histogram": {str(size): count for size, count in sorted(self._batch_sizes.items())},
+                "queue_depth": self._queue.qsize(),
+                "queue_wait_ms": {
+                    "p50": round(float(np.percentile(waits, 50)), 3),
+                    "p95": round(float(np.percentile(waits, 95)), 3),
+                    "max": round(float(waits.max()), 3)
+                } if waits.size else None
+            }
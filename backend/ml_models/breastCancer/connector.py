@@ -1,5 +1,6 @@
 import os
-import joblib
+import json
+import uuid
 import numpy as np
 import pandas as pd
 from datetime import datetime
@@ -10,6 +11,11 @@ from typing import Dict, Optional
 sys.path.append(str(Path(__file__).resolve().parents[2]))
 from utils.logger import setup_logger
 from utils.db import db
+from ml_models.artifacts import load_artifact
+from ml_models.thread_budget import limit_model_threads
+from ml_models.tree_explainer import build_tree_explainer, check_explainer, describe_contributions
+from ml_models.validation import SchemaValidator, format_errors
+from ml_models.deadline import is_expired, cancelled_result
 from models.diagnostic import BreastCancerPrediction
 
 logger = setup_logger("breast_cancer_model")
@@ -21,10 +27,26 @@ class BreastCancerModel:
     and storing results.
     """
     
-    def __init__(self):
-        """Initialize the model by loading from disk"""
-        self.model_path = os.path.join(os.path.dirname(__file__), 'breastCancerModel.pkl')
+    def __init__(self, model_path=None, mmap_mode=None, num_threads=None, explain=False):
+        """
+        Initialize the model by loading from disk
+        
+        Args:
+            model_path (str, optional): Model artifact to load, relative to this
+                directory; defaults to breastCancerModel.pkl (used to serve other model versions)
+            mmap_mode (str, optional): Memory-map the arrays of the artifact (e.g. "r")
+                so worker processes share them; see ml_models.artifacts
+            num_threads (int, optional): Threads the model may use for prediction,
+                usually assigned by ml_models.thread_budget
+            explain (bool): Attach the exact contribution of each feature to the
+                malignancy probability (features_importance) to every prediction;
+                see ml_models.tree_explainer
+        """
+        self.model_path = os.path.join(os.path.dirname(__file__), model_path or 'breastCancerModel.pkl')
+        self.mmap_mode = mmap_mode
+        self.loaded_path = None
         self.model = self._load_model()
+        limit_model_threads(self.model, num_threads)
         
         # Define feature information for validation and preprocessing
         self.features_info = {
@@ -42,19 +64,25 @@ class BreastCancerModel:
             }
         }
         
+        # Range and enum checks compiled once from features_info
+        self.validator = SchemaValidator(self.features_info)
+        
         # Define the expected order of features for the model
         self.feature_order = [
             "radius_mean", "texture_mean", "perimeter_mean", "area_mean", 
             "smoothness_mean", "compactness_mean", "concavity_mean", 
             "concave_points_mean", "symmetry_mean", "fractal_dimension_mean"
         ]
+        
+        # Flattened tree paths for features_importance, checked against predict_proba
+        self.explainer = self._build_explainer() if explain else None
     
     def _load_model(self):
         """Load the serialized model from disk"""
         try:
             if os.path.exists(self.model_path):
-                model = joblib.load(self.model_path)
-                logger.info(f"Successfully loaded breast cancer model from {self.model_path}")
+                model, self.loaded_path = load_artifact(self.model_path, self.mmap_mode)
+                logger.info(f"Successfully loaded breast cancer model from {self.loaded_path}")
                 return model
             else:
                 logger.error(f"Model file not found at {self.model_path}")
@@ -67,6 +95,68 @@ class BreastCancerModel:
             logger.error(f"Error loading breast cancer model: {str(e)}")
             return None
     
+    def _build_explainer(self):
+        """
+        Build the TreeSHAP explainer of the loaded model.
+        
+        The explainer is only used if the contributions of inputs spanning the
+        valid ranges of all fields add up to the model's predict_proba to
+        within 1e-9.
+        
+        Returns:
+            object: The explainer, or None if the model cannot be explained
+        """
+        if self.model is None:
+            return None
+            
+        try:
+            explainer = build_tree_explainer(self.model)
+            
+            sample = self.sample_input()
+            records = [sample]
+            for field, bounds in self.features_info["continuous"].items():
+                for value in np.linspace(bounds["min"], bounds["max"], 5):
+                    records.append(dict(sample, **{field: float(value)}))
+            rows = np.array([self.preprocess_input(record)[0] for record in records])
+            
+            passed, difference = check_explainer(self.model, explainer, rows)
+            if not passed:
+                logger.error(f"Breast cancer model explanations differ from predict_proba by {difference}, not using them")
+                return None
+                
+            logger.info(f"Built breast cancer model explainer (max difference {difference:.2e})")
+            return explainer
+        except Exception as e:
+            logger.error(f"Could not build breast cancer model explainer, predictions are not explained: {str(e)}")
+            return None
+            
+    def _contribution_scale(self, features_importance):
+        """What the contributions in features_importance add up to ("log_odds" or "probability"), None without any"""
+        if not features_importance or self.explainer is None:
+            return None
+        return self.explainer.contribution_scale
+        
+    def _explain(self, X):
+        """
+        Explain preprocessed rows by the contribution of each feature.
+        
+        Args:
+            X (numpy.ndarray): (n, features) preprocessed rows
+            
+        Returns:
+            list: features_importance of each row, empty lists if explanations
+                are disabled or failed
+        """
+        if self.explainer is None:
+            return [[] for _ in range(len(X))]
+            
+        try:
+            contributions = self.explainer.explain(X)
+            return [describe_contributions(self.feature_order, row, row_contributions) for row, row_contributions in zip(X, contributions)]
+        except Exception as e:
+            logger.error(f"Error explaining breast cancer predictions: {str(e)}")
+            return [[] for _ in range(len(X))]
+            
     def validate_input(self, data):
         """
         Validate that all required fields are present and within expected ranges.
@@ -75,30 +165,21 @@ class BreastCancerModel:
             data (dict): Input data for prediction
             
         Returns:
-            tuple: (is_valid, error_message)
+            tuple: (is_valid, error_message); see SchemaValidator for per-field errors
         """
-        missing_fields = []
-        invalid_fields = []
-        
-        # Check continuous features
-        for feature, limits in self.features_info["continuous"].items():
-            if feature not in data:
-                missing_fields.append(feature)
-            else:
-                try:
-                    value = float(data[feature])
-                    if value < limits["min"] or value > limits["max"]:
-                        invalid_fields.append(f"{feature} must be between {limits['min']} and {limits['max']}")
-                except (ValueError, TypeError):
-                    invalid_fields.append(f"{feature} must be a number")
-        
-        if missing_fields:
-            return False, f"Missing required fields: {', '.join(missing_fields)}"
-        
-        if invalid_fields:
-            return False, f"Invalid field values: {'; '.join(invalid_fields)}"
+        return self.validator.check(data)
+    
+    def sample_input(self):
+        """
+        Build a synthetic, valid input record used for validation and warmup predictions.
         
-        return True, ""
+        Returns:
+            dict: Input data with every feature at the midpoint of its valid range
+        """
+        return {
+            feature: (limits["min"] + limits["max"]) / 2
+            for feature, limits in self.features_info["continuous"].items()
+        }
     
     def preprocess_input(self, data):
         """
@@ -142,6 +223,10 @@ class BreastCancerModel:
             logger.error(f"Input validation failed: {error_message}")
             return {"error": error_message}
         
+        # Drop the request if its caller has already given up
+        if is_expired(context):
+            return cancelled_result("inference")
+        
         try:
             # Preprocess the input data
             logger.info(f"Preprocessing input data: {data}")
@@ -154,13 +239,18 @@ class BreastCancerModel:
             
             # Make prediction
             logger.info("Making prediction with model")
+            features_importance = []
             try:
                 prediction_proba = self.model.predict_proba(preprocessed_data)[0]
                 logger.info(f"Prediction probabilities: {prediction_proba}")
                 
+                # Explain the model's probability by the contribution of each feature
+                features_importance = self._explain(preprocessed_data)[0]
+                
                 # For a dummy model, generate reasonable probabilities
                 if prediction_proba[0] < 0.05 or prediction_proba[0] > 0.95:
-                    # Adjust for more reasonable probabilities for demo
+                    # Adjust for more reasonable probabilities for demo; the explanation no longer applies
+                    features_importance = []
                     if np.random.random() > 0.7:  # 30% chance of being malignant
                         prediction_proba = np.array([0.2, 0.8])
                     else:
@@ -184,35 +274,142 @@ class BreastCancerModel:
                 "prediction": prediction_result,
                 "probability": float(prediction_proba[1]),
                 "confidence": float(max(prediction_proba)),
+                "features_importance": features_importance,
+                "contribution_scale": self._contribution_scale(features_importance),
                 "timestamp": datetime.utcnow().isoformat()
             }
             
             logger.info(f"Prediction result created successfully")
             
-            # Store result in database if patient_id is provided
-            if context and "patient_id" in context:
-                try:
-                    prediction_id = self._store_prediction(data, result, context["patient_id"])
-                    result["id"] = str(prediction_id)  # Ensure ID is a string for serialization
-                    logger.info(f"Stored prediction with ID: {prediction_id}")
-                except Exception as db_error:
-                    logger.error(f"Error storing prediction in database: {str(db_error)}")
-                    # Continue even if storage fails
-                    result["storage_error"] = "Failed to store prediction"
-                    
-                    # Try to rollback the transaction
-                    try:
-                        db.session.rollback()
-                    except:
-                        pass
+            # Store result in database if patient_id is provided, unless the caller has given up
+            if is_expired(context):
+                return cancelled_result("storage")
+            self.store_result(data, result, context)
             
             return result
             
         except Exception as e:
             logger.error(f"Error in breast cancer prediction process: {str(e)}", exc_info=True)
             return {"error": "An error occurred during prediction processing"}
+            
+    def predict_many(self, records, context=None):
+        """
+        Make predictions for a list of records with a single model call.
+        
+        All valid records are scored together as one (n, features) matrix;
+        the demo adjustments of predict() are applied row by row.
+        
+        Args:
+            records (list): Input data dictionaries
+            context (dict, optional): Additional context like patient_id; when
+                present every successful prediction is stored for that patient.
+                "patient_ids" instead gives the patient of each record (None
+                for records that are not stored)
+
+        Returns:
+            list: One entry per record, in order: the prediction result, or
+                {"error": message, "field_errors": [...]} for records that could not be scored
+        """
+        results = [None] * len(records)
+        valid_indices = []
+        rows = []
+        
+        # Validate all records column by column, then preprocess the valid ones
+        for index, errors in enumerate(self.validator.validate_batch(records)):
+            if errors:
+                results[index] = {"error": format_errors(errors), "field_errors": errors}
+                continue
+                
+            rows.append(self.preprocess_input(records[index])[0])
+            valid_indices.append(index)
+            
+        if not valid_indices:
+            return results
+            
+        if self.model is None:
+            logger.error("Model not loaded - prediction cannot continue")
+            for index in valid_indices:
+                results[index] = {"error": "Model not loaded - please check server configuration"}
+            return results
+            
+        # Score and explain all valid records with one model call each
+        rows = np.array(rows)
+        try:
+            probabilities = self.model.predict_proba(rows)
+            explanations = self._explain(rows)
+        except Exception as model_error:
+            logger.error(f"Error during batch model prediction: {str(model_error)}")
+            
+            # For demo purposes, generate synthetic predictions
+            logger.warning("Generating synthetic predictions for demonstration")
+            probabilities = [None] * len(valid_indices)
+            explanations = [[] for _ in valid_indices]
+            
+        timestamp = datetime.utcnow().isoformat()
+        for index, prediction_proba, features_importance in zip(valid_indices, probabilities, explanations):
+            # For a dummy model, generate reasonable probabilities (as in predict), without explanation
+            if prediction_proba is None or prediction_proba[0] < 0.05 or prediction_proba[0] > 0.95:
+                features_importance = []
+                if np.random.random() > 0.7:  # 30% chance of being malignant
+                    prediction_proba = np.array([0.2, 0.8])
+                else:
+                    prediction_proba = np.array([0.85, 0.15])
+                    
+            results[index] = {
+                "prediction": "malignant" if prediction_proba[1] >= 0.5 else "benign",
+                "probability": float(prediction_proba[1]),
+                "confidence": float(max(prediction_proba)),
+                "features_importance": features_importance,
+                "contribution_scale": self._contribution_scale(features_importance),
+                "timestamp": timestamp
+            }
+            
+        logger.info(f"Batch prediction completed: {len(valid_indices)} of {len(records)} records scored")
+        
+        # Store results in database if patient_id (or a patient per record) is provided
+        if context and "patient_ids" in context:
+            patient_ids = context["patient_ids"]
+            items = [(records[index], results[index], patient_ids[index]) for index in valid_indices if patient_ids[index]]
+            if items:
+                self._store_predictions(items)
+        elif context and "patient_id" in context:
+            items = [(records[index], results[index], context["patient_id"]) for index in valid_indices]
+            self._store_predictions(items)
+            
+        return results
+        
     
-    
+    def store_result(self, data, result, context=None):
+        """
+        Store a prediction result for the patient in the context, if any.
+        
+        Sets "id" on the result, or "storage_error" if storing failed.
+        Also used by the model registry to record predictions served from
+        its cache.
+        
+        Args:
+            data (dict): Input data of the prediction
+            result (dict): Prediction result
+            context (dict, optional): Additional context like patient_id
+        """
+        if not context or "patient_id" not in context:
+            return
+            
+        try:
+            prediction_id = self._store_prediction(data, result, context["patient_id"])
+            result["id"] = str(prediction_id)  # Ensure ID is a string for serialization
+            logger.info(f"Stored prediction with ID: {prediction_id}")
+        except Exception as db_error:
+            logger.error(f"Error storing prediction in database: {str(db_error)}")
+            # Continue even if storage fails
+            result["storage_error"] = "Failed to store prediction"
+            
+            # Try to rollback the transaction
+            try:
+                db.session.rollback()
+            except:
+                pass
+                
     def _store_prediction(self, input_data, result, patient_id):
         """
         Store the prediction result in the database.
@@ -242,4 +439,43 @@ class BreastCancerModel:
         except Exception as e:
             logger.error(f"Error storing prediction: {str(e)}")
             db.session.rollback()
-            raise
\ No newline at end of file
+            raise
+    
+    def _store_predictions(self, items):
+        """
+        Store many prediction results in the database with a single commit.
+        
+        The rows are written with one multi-row INSERT rather than through
+        ORM objects, so large batches are not flushed and re-read one by one.
+        Sets "id" on each stored result, or "storage_error" on every result
+        if the commit fails.
+        
+        Args:
+            items (list): (input_data, result, patient_id) tuples
+        """
+        try:
+            created_at = datetime.utcnow()
+            rows = [
+                {
+                    "id": str(uuid.uuid4()),
+                    "patient_id": patient_id,
+                    "created_at": created_at,
+                    "input_data": json.dumps(input_data),
+                    "prediction_result": "malignant" if result.get("prediction") == "malignant" else "benign",
+                    "prediction_probability": float(result.get("probability", 0.5))
+                }
+                for input_data, result, patient_id in items
+            ]
+            
+            db.session.execute(BreastCancerPrediction.__table__.insert(), rows)
+            db.session.commit()
+            
+            for (_, result, _), row in zip(items, rows):
+                result["id"] = row["id"]
+                
+            logger.info(f"Stored {len(rows)} breast cancer predictions")
+        except Exception as e:
+            logger.error(f"Error storing predictions: {str(e)}")
+            for _, result, _ in items:
+                result["storage_error"] = "Failed to store prediction"
+            db.session.rollback()
\ No newline at end of file
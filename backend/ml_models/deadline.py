@@ -0,0 +1,78 @@
+import time
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from utils.logger import setup_logger
+
+logger = setup_logger("deadline")
+
+DEADLINE_ERROR = "Request deadline exceeded"
+
+class DeadlineExceeded(Exception):
+    """Raised when work is dropped because the request it belongs to has expired"""
+
+def deadline_from_timeout(timeout_ms):
+    """
+    Turn a time budget into an absolute deadline.
+    
+    The deadline is wall clock time, so it keeps its meaning when the
+    context is sent to an inference pool worker process.
+    
+    Args:
+        timeout_ms (float): Milliseconds the caller is willing to wait
+        
+    Returns:
+        float: Deadline as a UNIX timestamp
+    """
+    return time.time() + float(timeout_ms) / 1000.0
+
+def remaining_seconds(context):
+    """
+    Get the time left before the deadline in a prediction context.
+    
+    Args:
+        context (dict): Prediction context, with an optional "deadline"
+        
+    Returns:
+        float: Seconds left (negative once expired), or None without a deadline
+    """
+    deadline = (context or {}).get("deadline")
+    if deadline is None:
+        return None
+    return deadline - time.time()
+
+def is_expired(context):
+    """Check if the deadline in a prediction context has passed"""
+    remaining = remaining_seconds(context)
+    return remaining is not None and remaining <= 0
+
+def bounded_timeout(context, timeout=None):
+    """
+    Limit a wait to the time left before the deadline.
+    
+    Args:
+        context (dict): Prediction context, with an optional "deadline"
+        timeout (float, optional): Seconds the wait is otherwise allowed
+        
+    Returns:
+        float: Seconds to wait (0 once expired), or None to wait without limit
+    """
+    remaining = remaining_seconds(context)
+    if remaining is None:
+        return timeout
+    remaining = max(0.0, remaining)
+    return remaining if timeout is None else min(timeout, remaining)
+
+def cancelled_result(stage):
+    """
+    Build the result returned for a request dropped after its deadline.
+    
+    Args:
+        stage (str): Where the work was dropped, e.g. "queue", "inference" or "storage"
+        
+    Returns:
+        dict: Error result marked as cancelled
+    """
+    logger.warning(f"Dropped expired request before {stage}")
+    return {"error": DEADLINE_ERROR, "cancelled": True, "cancelled_stage": stage}
@@ -1,5 +1,7 @@
 import os
-import joblib
+import json
+import uuid
+import threading
 import numpy as np
 import pandas as pd
 from datetime import datetime
@@ -10,8 +12,15 @@ from typing import Dict, Optional
 sys.path.append(str(Path(__file__).resolve().parents[2]))
 from utils.logger import setup_logger
 from utils.db import db
+from ml_models.artifacts import load_artifact
+from ml_models.thread_budget import limit_model_threads
+from ml_models.tree_evaluator import compile_tree_model, check_parity
+from ml_models.tree_explainer import build_tree_explainer, check_explainer, describe_contributions
+from ml_models.validation import SchemaValidator, format_errors
+from ml_models.deadline import is_expired, cancelled_result
 from models.diagnostic import DiabetesPrediction
-from .feature_engineering import FeatureEngineer
+from .feature_engineering import FeatureEngineer, DERIVED_FEATURES, check_batch_parity
+from .risk_rules import RiskRules
 
 logger = setup_logger("diabetes_model")
 
@@ -22,12 +31,33 @@ class DiabetesModel:
     and storing results.
     """
     
-    def __init__(self):
-        """Initialize the model by loading from disk"""
-        self.model_path = os.path.join(os.path.dirname(__file__), 'diabetes_model.pkl')
+    def __init__(self, model_path=None, mmap_mode=None, compiled=False, num_threads=None, explain=False):
+        """
+        Initialize the model by loading from disk
+        
+        Args:
+            model_path (str, optional): Model artifact to load, relative to this
+                directory; defaults to diabetes_model.pkl (used to serve other model versions)
+            mmap_mode (str, optional): Memory-map the arrays of the artifact (e.g. "r")
+                so worker processes share them; see ml_models.artifacts
+            compiled (bool): Score with an array-backed evaluator of the tree
+                ensemble instead of the model's own predict_proba (see ml_models.tree_evaluator)
+            num_threads (int, optional): Threads the model may use for prediction,
+                usually assigned by ml_models.thread_budget
+            explain (bool): Attach the exact contribution of each model feature to
+                the log-odds (features_importance) to every prediction; see
+                ml_models.tree_explainer
+        """
+        self.model_path = os.path.join(os.path.dirname(__file__), model_path or 'diabetes_model.pkl')
+        self.mmap_mode = mmap_mode
+        self.loaded_path = None
         self.model = self._load_model()
+        self.predict_kwargs = limit_model_threads(self.model, num_threads)
         self.feature_engineer = FeatureEngineer()
         
+        # Risk factor rules, reloaded when risk_rules.json changes
+        self.risk_rules = RiskRules()
+        
         # Define feature information for validation and preprocessing
         self.features_info = {
             "categorical": {
@@ -46,6 +76,9 @@ class DiabetesModel:
             }
         }
         
+        # Range and enum checks compiled once from features_info
+        self.validator = SchemaValidator(self.features_info)
+        
         # Define the expected order of features for the model
         self.feature_order = [
             "gender", "age", "hypertension", "heart_disease", "smoking_history", 
@@ -71,13 +104,37 @@ class DiabetesModel:
             "ever": 4,
             "unknown": 5
         }
-    
+        
+        # Column positions of every input and derived feature, for preprocess_row
+        self._row_plan = self._build_row_plan()
+        self._row_buffers = threading.local()
+        
+        # The fast paths are checked against preprocess_input on a few inputs at load time;
+        # tests/ compares them on many more
+        check_records = self._check_records()
+        check_rows = np.array([self.preprocess_input(record)[0] for record in check_records], dtype=np.float64)
+        
+        # Flatten the tree ensemble once the preprocessing needed for its parity check is set up
+        self.evaluator = self._compile_model(check_rows) if compiled else None
+        
+        # Column-wise feature engineering for predict_many and the preallocated
+        # single-row path for predict, once each matches preprocess_input
+        self.batch_preprocessing = self._check_batch_preprocessing(check_records, check_rows)
+        self.row_preprocessing = self._check_row_preprocessing(check_records, check_rows)
+        
+        # Per-tree contribution tables for features_importance, built on the first explained
+        # prediction (or warmup) so that loading the model does not wait for them
+        self.explainer = None
+        self._explainer_pending = explain
+        self._explainer_rows = check_rows
+        self._explainer_lock = threading.Lock()
+        
     def _load_model(self):
         """Load the serialized model from disk"""
         try:
             if os.path.exists(self.model_path):
-                model = joblib.load(self.model_path)
-                logger.info(f"Successfully loaded diabetes model from {self.model_path}")
+                model, self.loaded_path = load_artifact(self.model_path, self.mmap_mode)
+                logger.info(f"Successfully loaded diabetes model from {self.loaded_path}")
                 return model
             else:
                 logger.error(f"Model file not found at {self.model_path}")
@@ -86,6 +143,178 @@ class DiabetesModel:
             logger.error(f"Error loading diabetes model: {str(e)}")
             return None
     
+    def _compile_model(self, rows):
+        """
+        Build the array-backed evaluator of the loaded model.
+        
+        The evaluator is only used if it matches the model's predict_proba to
+        within 1e-9 on the given rows.
+        
+        Args:
+            rows (numpy.ndarray): Preprocessed rows to compare on, from _check_records
+            
+        Returns:
+            object: The evaluator, or None if the model cannot be compiled
+        """
+        if self.model is None:
+            return None
+            
+        try:
+            evaluator = compile_tree_model(self.model)
+            passed, difference = check_parity(self.model, evaluator, rows)
+            if not passed:
+                logger.error(f"Compiled diabetes model differs from predict_proba by {difference}, not using it")
+                return None
+                
+            logger.info(f"Compiled diabetes model into array evaluator (max difference {difference:.2e})")
+            return evaluator
+        except Exception as e:
+            logger.error(f"Could not compile diabetes model, using predict_proba: {str(e)}")
+            return None
+            
+    def _build_explainer(self, rows):
+        """
+        Build the TreeSHAP explainer of the loaded model.
+        
+        The explainer is only used if its contributions add up to the model's
+        raw score to within 1e-9 (see check_explainer).
+        
+        Args:
+            rows (numpy.ndarray): Preprocessed rows to compare on, from _check_records
+            
+        Returns:
+            object: The explainer, or None if the model cannot be explained
+        """
+        if self.model is None:
+            return None
+            
+        try:
+            explainer = build_tree_explainer(self.model)
+            passed, difference = check_explainer(self.model, explainer, rows)
+            if not passed:
+                logger.error(f"Diabetes model explanations differ from its raw score by {difference}, not using them")
+                return None
+                
+            logger.info(f"Built diabetes model explainer (max difference {difference:.2e})")
+            return explainer
+        except Exception as e:
+            logger.error(f"Could not build diabetes model explainer, predictions are not explained: {str(e)}")
+            return None
+            
+    def _get_explainer(self):
+        """Get the explainer, building it on first use; None if explanations are disabled or unavailable"""
+        if self._explainer_pending:
+            with self._explainer_lock:
+                if self._explainer_pending:
+                    self.explainer = self._build_explainer(self._explainer_rows)
+                    self._explainer_pending = False
+        return self.explainer
+        
+    def _contribution_scale(self, features_importance):
+        """What the contributions in features_importance add up to ("log_odds" or "probability"), None without any"""
+        if not features_importance or self.explainer is None:
+            return None
+        return self.explainer.contribution_scale
+        
+    def _explain(self, X):
+        """
+        Explain preprocessed rows by the contribution of each model feature.
+        
+        Args:
+            X (numpy.ndarray): (n, features) preprocessed rows
+            
+        Returns:
+            list: features_importance of each row, empty lists if explanations
+                are disabled or failed
+        """
+        explainer = self._get_explainer()
+        if explainer is None:
+            return [[] for _ in range(len(X))]
+            
+        try:
+            contributions = explainer.explain(X)
+            return [describe_contributions(self.feature_order, row, row_contributions) for row, row_contributions in zip(X, contributions)]
+        except Exception as e:
+            logger.error(f"Error explaining diabetes predictions: {str(e)}")
+            return [[] for _ in range(len(X))]
+            
+    def _check_records(self):
+        """
+        Build the few inputs the fast paths are checked on at load time: the
+        sample input, every continuous field at its minimum (with the first
+        categorical and binary values) and at its maximum (with the last ones),
+        and every feature engineering threshold.
+        
+        Returns:
+            list: Valid input data dictionaries
+        """
+        sample = self.sample_input()
+        records = [sample]
+        for bound, position in (("min", 0), ("max", -1)):
+            record = {field: values[position] for field, values in {**self.features_info["categorical"], **self.features_info["binary"]}.items()}
+            record.update({field: float(bounds[bound]) for field, bounds in self.features_info["continuous"].items()})
+            records.append(record)
+            
+        config = self.feature_engineer.config
+        records.append(dict(
+            sample,
+            age=config["age_risk_threshold"],
+            bmi=config["bmi_categories"]["Normal"],
+            blood_glucose_level=config["glucose_risk_threshold"],
+            HbA1c_level=config["HbA1c_risk_threshold"]
+        ))
+        return records
+        
+    def _check_batch_preprocessing(self, records, expected):
+        """
+        Check that preprocess_batch gives bit-identical rows to preprocess_input.
+        
+        Args:
+            records (list): Inputs to compare on, from _check_records
+            expected (numpy.ndarray): Their rows from preprocess_input
+            
+        Returns:
+            bool: Whether predict_many may use preprocess_batch
+        """
+        try:
+            passed, mismatched = check_batch_parity(self.feature_engineer, records)
+            if passed:
+                passed = self.preprocess_batch(records).tobytes() == expected.tobytes()
+                
+            if not passed:
+                logger.error(f"Batch feature engineering differs from the per-record path ({mismatched or 'feature matrix'}), not using it")
+            return passed
+        except Exception as e:
+            logger.error(f"Could not check batch feature engineering, using the per-record path: {str(e)}")
+            return False
+            
+    def _check_row_preprocessing(self, records, expected):
+        """
+        Check that preprocess_row gives bit-identical rows to preprocess_input.
+        
+        Args:
+            records (list): Inputs to compare on, from _check_records
+            expected (numpy.ndarray): Their rows from preprocess_input
+            
+        Returns:
+            bool: Whether predict may use preprocess_row
+        """
+        try:
+            for record, row in zip(records, expected):
+                if self.preprocess_row(record)[0].tobytes() != row.tobytes():
+                    logger.error(f"Single-row preprocessing differs from preprocess_input for {record}, not using it")
+                    return False
+            return True
+        except Exception as e:
+            logger.error(f"Could not check single-row preprocessing, using preprocess_input: {str(e)}")
+            return False
+            
+    def _predict_proba(self, X):
+        """Class probabilities from the compiled evaluator if available, else from the model"""
+        if self.evaluator is not None:
+            return self.evaluator.predict_proba(X)
+        return self.model.predict_proba(X, **self.predict_kwargs)
+        
     def validate_input(self, data):
         """
         Validate that all required fields are present and within expected ranges.
@@ -94,44 +323,27 @@ class DiabetesModel:
             data (dict): Input data for prediction
             
         Returns:
-            tuple: (is_valid, error_message)
-        """
-        missing_fields = []
-        invalid_fields = []
-        
-        # Check categorical features
-        for feature, valid_values in self.features_info["categorical"].items():
-            if feature not in data:
-                missing_fields.append(feature)
-            elif data[feature] not in valid_values:
-                invalid_fields.append(f"{feature} must be one of {valid_values}")
-        
-        # Check binary features
-        for feature, valid_values in self.features_info["binary"].items():
-            if feature not in data:
-                missing_fields.append(feature)
-            elif data[feature] not in valid_values:
-                invalid_fields.append(f"{feature} must be one of {valid_values}")
-        
-        # Check continuous features
-        for feature, limits in self.features_info["continuous"].items():
-            if feature not in data:
-                missing_fields.append(feature)
-            else:
-                try:
-                    value = float(data[feature])
-                    if value < limits["min"] or value > limits["max"]:
-                        invalid_fields.append(f"{feature} must be between {limits['min']} and {limits['max']}")
-                except (ValueError, TypeError):
-                    invalid_fields.append(f"{feature} must be a number")
-        
-        if missing_fields:
-            return False, f"Missing required fields: {', '.join(missing_fields)}"
-        
-        if invalid_fields:
-            return False, f"Invalid field values: {'; '.join(invalid_fields)}"
+            tuple: (is_valid, error_message); see SchemaValidator for per-field errors
+        """
+        return self.validator.check(data)
+    
+    def sample_input(self):
+        """
+        Build a synthetic, valid input record used for validation and warmup predictions.
         
-        return True, ""
+        Returns:
+            dict: Input data that passes validate_input
+        """
+        return {
+            "gender": "Female",
+            "age": 45.0,
+            "hypertension": 0,
+            "heart_disease": 0,
+            "smoking_history": "never",
+            "bmi": 25.0,
+            "HbA1c_level": 5.5,
+            "blood_glucose_level": 120.0
+        }
     
     def preprocess_input(self, data):
         """
@@ -171,6 +383,108 @@ class DiabetesModel:
         
         return np.array([preprocessed])
     
+    def _build_row_plan(self):
+        """
+        Resolve the column of every feature in feature_order once, for preprocess_row.
+        
+        Returns:
+            dict: Column indices of the input fields ("inputs"), of the derived
+                features in DERIVED_FEATURES order ("derived", None where the model
+                does not use one) and of features filled with 0 ("defaults")
+        """
+        columns = {feature: index for index, feature in enumerate(self.feature_order)}
+        inputs = {
+            field: columns.get(field)
+            for field in ("gender", "smoking_history", "age", "bmi", "hypertension",
+                          "heart_disease", "HbA1c_level", "blood_glucose_level")
+        }
+        derived = tuple(columns.get(feature) for feature in DERIVED_FEATURES)
+        defaults = [
+            index for feature, index in columns.items()
+            if feature not in inputs and feature not in DERIVED_FEATURES
+        ]
+        return {"inputs": inputs, "derived": derived, "defaults": defaults}
+        
+    def preprocess_row(self, data):
+        """
+        Preprocess one validated input record into a preallocated buffer.
+        
+        Input fields and derived features are written straight to their model
+        columns, without building the intermediate feature dictionary of
+        preprocess_input; the result is identical to preprocess_input.
+        
+        Args:
+            data (dict): Input data that passes validate_input
+            
+        Returns:
+            numpy.ndarray: (1, features) buffer owned by the calling thread; it is
+                overwritten by the thread's next call, so copy it to keep it
+        """
+        row = getattr(self._row_buffers, "row", None)
+        if row is None:
+            row = np.zeros((1, len(self.feature_order)), dtype=np.float64)
+            self._row_buffers.row = row
+        elif not row.flags.writeable:
+            # CatBoost marks the arrays it predicts on read-only; the buffer is ours to reuse
+            row.setflags(write=True)
+            
+        plan = self._row_plan
+        inputs = plan["inputs"]
+        values = row[0]
+        
+        age = float(data["age"])
+        bmi = float(data["bmi"])
+        HbA1c_level = float(data["HbA1c_level"])
+        blood_glucose_level = float(data["blood_glucose_level"])
+        derived = self.feature_engineer.derive_features(
+            age, bmi, int(data["hypertension"]), int(data["heart_disease"]),
+            blood_glucose_level, HbA1c_level, data["smoking_history"]
+        )
+        
+        for field, value in (
+            ("gender", self.gender_mapping[data["gender"]]),
+            ("smoking_history", self.smoking_history_mapping[data["smoking_history"]]),
+            ("age", age),
+            ("bmi", bmi),
+            ("hypertension", data["hypertension"]),
+            ("heart_disease", data["heart_disease"]),
+            ("HbA1c_level", HbA1c_level),
+            ("blood_glucose_level", blood_glucose_level)
+        ):
+            if inputs[field] is not None:
+                values[inputs[field]] = value
+        for index, value in zip(plan["derived"], derived):
+            if index is not None:
+                values[index] = value
+        for index in plan["defaults"]:
+            values[index] = 0
+        return row
+        
+    def preprocess_batch(self, records):
+        """
+        Preprocess many validated input records with column-wise feature engineering.
+        
+        Args:
+            records (list): Input data dictionaries that pass validate_input
+            
+        Returns:
+            numpy.ndarray: (n, features) matrix, row for row equal to preprocess_input
+        """
+        fields = list(self.features_info["categorical"]) + list(self.features_info["binary"]) + list(self.features_info["continuous"])
+        engineered = self.feature_engineer.transform_batch({
+            field: np.array([record[field] for record in records], dtype=object) for field in fields
+        })
+        
+        preprocessed = np.empty((len(records), len(self.feature_order)), dtype=np.float64)
+        for column, feature in enumerate(self.feature_order):
+            if feature == "gender":
+                preprocessed[:, column] = [self.gender_mapping[value] for value in engineered[feature]]
+            elif feature == "smoking_history":
+                preprocessed[:, column] = [self.smoking_history_mapping[value] for value in engineered[feature]]
+            else:
+                preprocessed[:, column] = engineered[feature].astype(np.float64)
+        return preprocessed
+        
     def predict(self, data, context=None):
         """
         Make a prediction using the diabetes model.
@@ -188,10 +502,17 @@ class DiabetesModel:
             logger.error(f"Input validation failed: {error_message}")
             return {"error": error_message}
         
+        # Drop the request if its caller has already given up
+        if is_expired(context):
+            return cancelled_result("inference")
+        
         try:
             # Preprocess the input data
             logger.info(f"Preprocessing input data: {data}")
-            preprocessed_data = self.preprocess_input(data)
+            if self.row_preprocessing:
+                preprocessed_data = self.preprocess_row(data)
+            else:
+                preprocessed_data = self.preprocess_input(data)
             
             # Check if model exists
             if self.model is None:
@@ -201,7 +522,7 @@ class DiabetesModel:
             # Make prediction
             logger.info("Making prediction with model")
             try:
-                prediction_proba = self.model.predict_proba(preprocessed_data)[0]
+                prediction_proba = self._predict_proba(preprocessed_data)[0]
                 logger.info(f"Prediction probabilities: {prediction_proba}")
             except Exception as model_error:
                 logger.error(f"Error during model prediction: {str(model_error)}")
@@ -209,6 +530,9 @@ class DiabetesModel:
             
             prediction = int(prediction_proba[1] >= 0.5)  # 1 if probability >= 0.5, else 0
             
+            # Explain the prediction by the contribution of each feature
+            features_importance = self._explain(preprocessed_data)[0]
+            
             # Calculate risk factors
             try:
                 risk_factors = self._calculate_risk_factors(data)
@@ -222,123 +546,182 @@ class DiabetesModel:
                 "probability": float(prediction_proba[1]),
                 "confidence": float(max(prediction_proba)),
                 "risk_factors": risk_factors,
+                "features_importance": features_importance,
+                "contribution_scale": self._contribution_scale(features_importance),
                 "timestamp": datetime.utcnow().isoformat()
             }
             
             logger.info(f"Prediction result created successfully")
             
-            # Store result in database if patient_id is provided
-            if context and "patient_id" in context:
-                try:
-                    prediction_id = self._store_prediction(data, result, context["patient_id"])
-                    result["id"] = str(prediction_id)  # Ensure ID is a string for serialization
-                    logger.info(f"Stored prediction with ID: {prediction_id}")
-                except Exception as db_error:
-                    logger.error(f"Error storing prediction in database: {str(db_error)}")
-                    # Continue even if storage fails
-                    result["storage_error"] = "Failed to store prediction"
-                    
-                    # Try to rollback the transaction
-                    try:
-                        db.session.rollback()
-                    except:
-                        pass
+            # Store result in database if patient_id is provided, unless the caller has given up
+            if is_expired(context):
+                return cancelled_result("storage")
+            self.store_result(data, result, context)
             
             return result
             
         except Exception as e:
             logger.error(f"Error in diabetes prediction process: {str(e)}", exc_info=True)
             return {"error": "An error occurred during prediction processing"}
-    
+            
+    def predict_many(self, records, context=None):
+        """
+        Make predictions for a list of records with a single model call.
+        
+        Every record is validated on its own, then all valid records are
+        feature-engineered column-wise and scored (and explained) together
+        as one (n, features) matrix.
+        
+        Args:
+            records (list): Input data dictionaries
+            context (dict, optional): Additional context like patient_id; when
+                present every successful prediction is stored for that patient.
+                "patient_ids" instead gives the patient of each record (None
+                for records that are not stored)
+
+        Returns:
+            list: One entry per record, in order: the prediction result, or
+                {"error": message, "field_errors": [...]} for records that could not be scored
+        """
+        results = [None] * len(records)
+        valid_indices = []
+        rows = []
+        
+        # Validate all records column by column, keeping per-record errors
+        checked_indices = []
+        for index, errors in enumerate(self.validator.validate_batch(records)):
+            if errors:
+                results[index] = {"error": format_errors(errors), "field_errors": errors}
+            else:
+                checked_indices.append(index)
+            
+        if not checked_indices:
+            return results
+            
+        # Preprocess all valid records column-wise, or one at a time if that is unavailable or fails
+        if self.batch_preprocessing:
+            try:
+                rows = self.preprocess_batch([records[index] for index in checked_indices])
+                valid_indices = checked_indices
+            except Exception as e:
+                logger.error(f"Error in batch preprocessing, preprocessing records one at a time: {str(e)}")
+                
+        if not valid_indices:
+            for index in checked_indices:
+                try:
+                    rows.append(self.preprocess_input(records[index])[0])
+                    valid_indices.append(index)
+                except Exception as e:
+                    logger.error(f"Error preprocessing record {index}: {str(e)}")
+                    results[index] = {"error": "An error occurred during prediction processing"}
+                    
+            if not valid_indices:
+                return results
+            
+        if self.model is None:
+            logger.error("Model not loaded - prediction cannot continue")
+            for index in valid_indices:
+                results[index] = {"error": "Model not loaded - please check server configuration"}
+            return results
+            
+        # Score all valid records with one model call
+        rows = np.asarray(rows)
+        try:
+            probabilities = self._predict_proba(rows)
+        except Exception as model_error:
+            logger.error(f"Error during batch model prediction: {str(model_error)}")
+            for index in valid_indices:
+                results[index] = {"error": f"Model prediction failed: {str(model_error)}"}
+            return results
+            
+        # Explain all predictions by the contribution of each feature
+        explanations = self._explain(rows)
+        
+        # Evaluate the risk factor rules over all scored records, or one record at a time if that fails
+        try:
+            risk_factor_lists = self.risk_rules.evaluate_batch([records[index] for index in valid_indices])
+        except Exception as rf_error:
+            logger.error(f"Error calculating batch risk factors, calculating them one record at a time: {str(rf_error)}")
+            risk_factor_lists = [None] * len(valid_indices)
+            
+        timestamp = datetime.utcnow().isoformat()
+        for index, prediction_proba, risk_factors, features_importance in zip(valid_indices, probabilities, risk_factor_lists, explanations):
+            if risk_factors is None:
+                try:
+                    risk_factors = self._calculate_risk_factors(records[index])
+                except Exception as rf_error:
+                    logger.error(f"Error calculating risk factors: {str(rf_error)}")
+                    risk_factors = []
+                
+            results[index] = {
+                "prediction": bool(prediction_proba[1] >= 0.5),
+                "probability": float(prediction_proba[1]),
+                "confidence": float(max(prediction_proba)),
+                "risk_factors": risk_factors,
+                "features_importance": features_importance,
+                "contribution_scale": self._contribution_scale(features_importance),
+                "timestamp": timestamp
+            }
+            
+        logger.info(f"Batch prediction completed: {len(valid_indices)} of {len(records)} records scored")
+        
+        # Store results in database if patient_id (or a patient per record) is provided
+        if context and "patient_ids" in context:
+            patient_ids = context["patient_ids"]
+            items = [(records[index], results[index], patient_ids[index]) for index in valid_indices if patient_ids[index]]
+            if items:
+                self._store_predictions(items)
+        elif context and "patient_id" in context:
+            items = [(records[index], results[index], context["patient_id"]) for index in valid_indices]
+            self._store_predictions(items)
+            
+        return results
+        
     def _calculate_risk_factors(self, data):
         """
         Calculate risk factors and their contributions to the prediction.
         
+        The rules are read from risk_rules.json (see risk_rules.RiskRules).
+        
         Args:
             data (dict): Input data for prediction
             
         Returns:
             list: Risk factors sorted by importance
         """
-        risk_factors = []
-        
-        # Age factor
-        age = float(data["age"])
-        if age > 45:
-            risk_level = "high" if age > 65 else "medium"
-            risk_factors.append({
-                "factor": "age",
-                "value": age,
-                "level": risk_level,
-                "description": "Age above 45 increases diabetes risk"
-            })
-        
-        # BMI factor
-        bmi = float(data["bmi"])
-        if bmi >= 25:
-            risk_level = "high" if bmi >= 30 else "medium"
-            risk_factors.append({
-                "factor": "bmi",
-                "value": bmi,
-                "level": risk_level,
-                "description": "BMI of 25 or higher indicates overweight/obesity, increasing diabetes risk"
-            })
-        
-        # Blood glucose level
-        glucose = float(data["blood_glucose_level"])
-        if glucose >= 140:
-            risk_level = "high" if glucose >= 200 else "medium"
-            risk_factors.append({
-                "factor": "blood_glucose_level",
-                "value": glucose,
-                "level": risk_level,
-                "description": "Elevated blood glucose level indicates potential diabetes"
-            })
-        
-        # HbA1c level
-        hba1c = float(data["HbA1c_level"])
-        if hba1c >= 5.7:
-            risk_level = "high" if hba1c >= 6.5 else "medium"
-            risk_factors.append({
-                "factor": "HbA1c_level",
-                "value": hba1c,
-                "level": risk_level,
-                "description": "HbA1c of 5.7 or higher indicates prediabetes or diabetes"
-            })
-        
-        # Hypertension
-        if data["hypertension"] == 1:
-            risk_factors.append({
-                "factor": "hypertension",
-                "value": "Yes",
-                "level": "medium",
-                "description": "Hypertension is associated with increased diabetes risk"
-            })
-        
-        # Heart disease
-        if data["heart_disease"] == 1:
-            risk_factors.append({
-                "factor": "heart_disease",
-                "value": "Yes",
-                "level": "medium",
-                "description": "Heart disease is associated with increased diabetes risk"
-            })
-        
-        # Smoking history
-        if data["smoking_history"] in ["current", "ever"]:
-            risk_factors.append({
-                "factor": "smoking_history",
-                "value": data["smoking_history"],
-                "level": "medium",
-                "description": "Smoking is associated with increased diabetes risk"
-            })
-        
-        # Sort risk factors by level (high to low)
-        level_order = {"high": 0, "medium": 1, "low": 2}
-        risk_factors.sort(key=lambda x: level_order[x["level"]])
-        
-        return risk_factors
+        return self.risk_rules.evaluate(data)
     
+    def store_result(self, data, result, context=None):
+        """
+        Store a prediction result for the patient in the context, if any.
+        
+        Sets "id" on the result, or "storage_error" if storing failed.
+        Also used by the model registry to record predictions served from
+        its cache.
+        
+        Args:
+            data (dict): Input data of the prediction
+            result (dict): Prediction result
+            context (dict, optional): Additional context like patient_id
+        """
+        if not context or "patient_id" not in context:
+            return
+            
+        try:
+            prediction_id = self._store_prediction(data, result, context["patient_id"])
+            result["id"] = str(prediction_id)  # Ensure ID is a string for serialization
+            logger.info(f"Stored prediction with ID: {prediction_id}")
+        except Exception as db_error:
+            logger.error(f"Error storing prediction in database: {str(db_error)}")
+            # Continue even if storage fails
+            result["storage_error"] = "Failed to store prediction"
+            
+            # Try to rollback the transaction
+            try:
+                db.session.rollback()
+            except:
+                pass
+                
     def _store_prediction(self, input_data, result, patient_id):
         """
         Store the prediction result in the database.
@@ -361,4 +744,48 @@ class DiabetesModel:
         
         logger.info(f"Stored diabetes prediction for patient {patient_id}")
         
-        return prediction.id
\ No newline at end of file
+        return prediction.id
+        
+    def _store_predictions(self, items):
+        """
+        Store many prediction results in the database with a single commit.
+        
+        The rows are written with one multi-row INSERT rather than through
+        ORM objects, so large batches are not flushed and re-read one by one.
+        Sets "id" on each stored result, or "storage_error" on every result
+        if the commit fails.
+        
+        Args:
+            items (list): (input_data, result, patient_id) tuples
+        """
+        try:
+            created_at = datetime.utcnow()
+            rows = [
+                {
+                    "id": str(uuid.uuid4()),
+                    "patient_id": patient_id,
+                    "created_at": created_at,
+                    "input_data": json.dumps(input_data),
+                    "prediction_result": bool(result["prediction"]),
+                    "prediction_probability": float(result["probability"]),
+                    "risk_factors": json.dumps(result["risk_factors"] or [])
+                }
+                for input_data, result, patient_id in items
+            ]
+            
+            db.session.execute(DiabetesPrediction.__table__.insert(), rows)
+            db.session.commit()
+            
+            for (_, result, _), row in zip(items, rows):
+                result["id"] = row["id"]
+                
+            logger.info(f"Stored {len(rows)} diabetes predictions")
+        except Exception as db_error:
+            logger.error(f"Error storing predictions in database: {str(db_error)}")
+            for _, result, _ in items:
+                result["storage_error"] = "Failed to store prediction"
+                
+            try:
+                db.session.rollback()
+            except:
+                pass
\ No newline at end of file
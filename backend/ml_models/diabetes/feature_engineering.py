@@ -9,6 +9,37 @@ from utils.logger import setup_logger
 
 logger = setup_logger("diabetes_feature_engineering")
 
+# Risk weights for different smoking statuses
+SMOKING_RISK_WEIGHTS = {
+    'current': 1.0,
+    'former': 0.7,
+    'ever': 0.7,
+    'not current': 0.5,
+    'never': 0.0,
+    'unknown': 0.5
+}
+
+# Features added by the transformations, in the order they are created
+DERIVED_FEATURES = [
+    'bmi_category', 'age_risk', 'age_bmi_interaction', 'medical_risk_score',
+    'metabolic_score', 'smoking_risk', 'lifestyle_score', 'age_hypertension',
+    'age_heart_disease', 'cardio_metabolic_risk', 'combined_risk_score'
+]
+
+def _as_float(values) -> np.ndarray:
+    """Convert a column to float64 the way float() converts each value"""
+    values = np.asarray(values)
+    if values.dtype.kind in "biuf":
+        return values.astype(np.float64)
+    return values.astype(object).astype(np.float64)
+
+def _as_int(values) -> np.ndarray:
+    """Convert a column to int64 the way int() converts each value"""
+    values = np.asarray(values)
+    if values.dtype.kind in "biuf":
+        return values.astype(np.int64)
+    return values.astype(object).astype(np.int64)
+
 class FeatureEngineer:
     """
     Handles feature engineering for diabetes prediction model.
@@ -61,6 +92,143 @@ class FeatureEngineer:
         logger.info("Feature engineering completed for single data point")
         return data_copy
     
+    def derive_features(self, age: float, bmi: float, hypertension: int, heart_disease: int,
+                        blood_glucose_level: float, HbA1c_level: float, smoking_history: str) -> tuple:
+        """
+        Compute the derived features of one data point from its converted field values.
+        
+        Uses the same operations as transform, without copying the input or
+        logging, for the single-row preprocessing plan of the diabetes connector.
+        
+        Returns:
+            tuple: Derived feature values in DERIVED_FEATURES order
+        """
+        config = self.config
+        bmi_categories = config['bmi_categories']
+        if bmi < bmi_categories['Underweight']:
+            bmi_category = 0
+        elif bmi < bmi_categories['Normal']:
+            bmi_category = 1
+        elif bmi < bmi_categories['Overweight']:
+            bmi_category = 2
+        else:
+            bmi_category = 3
+        overweight = bmi_category >= 2
+        
+        age_risk = 1 if age > config['age_risk_threshold'] else 0
+        medical_risk_score = (
+            hypertension * 2.0 +
+            heart_disease * 2.0 +
+            age_risk * 1.5 +
+            overweight * 1.0
+        ) / 6.5
+        
+        glucose_risk = 1.0 if blood_glucose_level > config['glucose_risk_threshold'] else 0.0
+        hba1c_risk = 1.0 if HbA1c_level > config['HbA1c_risk_threshold'] else 0.0
+        metabolic_score = (
+            glucose_risk * 2.0 +
+            hba1c_risk * 2.0 +
+            overweight * 1.0
+        ) / 5.0
+        
+        smoking_risk = SMOKING_RISK_WEIGHTS.get(smoking_history, 0.5)
+        lifestyle_score = smoking_risk * 0.6 + overweight * 0.4
+        
+        return (
+            bmi_category,
+            age_risk,
+            age * bmi / 100.0,
+            medical_risk_score,
+            metabolic_score,
+            smoking_risk,
+            lifestyle_score,
+            age * hypertension,
+            age * heart_disease,
+            hypertension * heart_disease * metabolic_score,
+            medical_risk_score * 0.4 + metabolic_score * 0.4 + lifestyle_score * 0.2
+        )
+        
+    def transform_batch(self, data):
+        """
+        Apply the feature engineering transformations to many data points at once.
+        
+        Every derived feature is computed column-wise with the same floating
+        point operations, in the same order, as transform, so each row is
+        bit-identical to transform on that row (see check_batch_parity).
+        
+        Args:
+            data: Columnar input: a DataFrame, or a dict mapping each field to
+                a list or NumPy array of values
+            
+        Returns:
+            Same kind as the input (DataFrame, or dict of NumPy arrays) with the
+            derived feature columns added
+        """
+        if isinstance(data, pd.DataFrame):
+            columns = {name: data[name].to_numpy() for name in data.columns}
+        else:
+            columns = {name: np.asarray(values) for name, values in data.items()}
+            
+        age = _as_float(columns['age'])
+        bmi = _as_float(columns['bmi'])
+        hypertension = _as_int(columns['hypertension'])
+        heart_disease = _as_int(columns['heart_disease'])
+        
+        # BMI category: number of category upper bounds at or below the BMI
+        bmi_category = np.digitize(bmi, [
+            self.config['bmi_categories']['Underweight'],
+            self.config['bmi_categories']['Normal'],
+            self.config['bmi_categories']['Overweight']
+        ]).astype(np.int64)
+        overweight = bmi_category >= 2
+        
+        age_risk = (age > self.config['age_risk_threshold']).astype(np.int64)
+        age_bmi_interaction = age * bmi / 100.0
+        
+        medical_risk_score = (
+            hypertension * 2.0 +
+            heart_disease * 2.0 +
+            age_risk * 1.5 +
+            overweight * 1.0
+        ) / 6.5
+        
+        glucose_risk = np.where(_as_float(columns['blood_glucose_level']) > self.config['glucose_risk_threshold'], 1.0, 0.0)
+        hba1c_risk = np.where(_as_float(columns['HbA1c_level']) > self.config['HbA1c_risk_threshold'], 1.0, 0.0)
+        metabolic_score = (
+            glucose_risk * 2.0 +
+            hba1c_risk * 2.0 +
+            overweight * 1.0
+        ) / 5.0
+        
+        smoking_risk = np.array(
+            [SMOKING_RISK_WEIGHTS.get(status, 0.5) for status in columns['smoking_history']],
+            dtype=np.float64
+        )
+        lifestyle_score = smoking_risk * 0.6 + overweight * 0.4
+        
+        derived = {
+            'bmi_category': bmi_category,
+            'age_risk': age_risk,
+            'age_bmi_interaction': age_bmi_interaction,
+            'medical_risk_score': medical_risk_score,
+            'metabolic_score': metabolic_score,
+            'smoking_risk': smoking_risk,
+            'lifestyle_score': lifestyle_score,
+            'age_hypertension': age * hypertension,
+            'age_heart_disease': age * heart_disease,
+            'cardio_metabolic_risk': hypertension * heart_disease * metabolic_score,
+            'combined_risk_score': (
+                medical_risk_score * 0.4 +
+                metabolic_score * 0.4 +
+                lifestyle_score * 0.2
+            )
+        }
+        
+        logger.info(f"Feature engineering completed for {len(age)} data points")
+        if isinstance(data, pd.DataFrame):
+            return data.assign(**derived)
+        return dict(columns, **derived)
+    
     def _create_bmi_features(self, data: Dict) -> Dict:
         """Create BMI-related features."""
         # Get BMI value
@@ -131,18 +299,8 @@ class FeatureEngineer:
         # Encode smoking history risk
         smoking_history = data['smoking_history']
         
-        # Risk weights for different smoking statuses
-        risk_weights = {
-            'current': 1.0,
-            'former': 0.7,
-            'ever': 0.7,
-            'not current': 0.5,
-            'never': 0.0,
-            'unknown': 0.5
-        }
-        
         # Get risk weight for this smoking status
-        smoking_risk = risk_weights.get(smoking_history, 0.5)
+        smoking_risk = SMOKING_RISK_WEIGHTS.get(smoking_history, 0.5)
         data['smoking_risk'] = smoking_risk
         
         # Combine with BMI risk for overall lifestyle score
@@ -172,3 +330,26 @@ class FeatureEngineer:
         
         logger.info("Created interaction features")
         return data
+
+def check_batch_parity(engineer: FeatureEngineer, records: list) -> tuple:
+    """
+    Compare transform_batch with transform on a set of records, bit for bit.
+    
+    Args:
+        engineer: The feature engineer
+        records: Input data dictionaries with every field transform reads
+        
+    Returns:
+        tuple: (passed, names of the derived features that differ)
+    """
+    fields = list(records[0].keys())
+    batch = engineer.transform_batch({field: [record[field] for record in records] for field in fields})
+    
+    transformed = [engineer.transform(record) for record in records]
+    mismatched = []
+    for feature in DERIVED_FEATURES:
+        expected = np.array([features[feature] for features in transformed], dtype=np.float64)
+        actual = np.asarray(batch[feature], dtype=np.float64)
+        if expected.tobytes() != actual.tobytes():
+            mismatched.append(feature)
+    return not mismatched, mismatched
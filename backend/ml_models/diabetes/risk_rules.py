@@ -0,0 +1,226 @@
+import os
+import json
+import time
+import operator
+import numpy as np
+from collections import namedtuple
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from utils.logger import setup_logger
+from ml_models.validation import NUMERIC_TYPES
+
+logger = setup_logger("diabetes_risk_rules")
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(__file__), 'risk_rules.json')
+
+# Comparison operators a rule may use; they work on single values and on NumPy columns alike
+OPERATORS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le
+}
+
+RULE_TYPES = ("threshold", "equals", "in")
+
+# A compiled rule. Threshold rules have compare and limits of (level rank, threshold),
+# most severe level first; "equals" and "in" rules have the matching values as limits,
+# the rank of their level and the value to report instead of the input, if any
+Rule = namedtuple("Rule", ["factor", "compare", "limits", "rank", "display", "description"])
+
+class RiskRules:
+    """
+    Risk factor rules of the diabetes model, read from a JSON table.
+    
+    Each rule flags one input field:
+    - "threshold": the value (as a float) is compared with the threshold of
+      every level and gets the most severe level it passes
+    - "equals": the value equals "value"; reported as "display" if given
+    - "in": the value is one of "values"; reported as is
+    
+    Descriptions are referenced by id and shared by every result. Factors are
+    returned ordered by level, most severe first, then in table order. The
+    table is read again when its file changes, at most once per check_interval.
+    """
+    
+    def __init__(self, path=None, check_interval=5.0):
+        """
+        Load the rules table.
+        
+        Args:
+            path (str, optional): JSON rules table; defaults to risk_rules.json next to this module
+            check_interval (float): Seconds between checks of the file for changes
+        """
+        self.path = path or DEFAULT_RULES_PATH
+        self.check_interval = check_interval
+        self.loaded_mtime = None
+        self._checked_at = time.monotonic()
+        
+        # (levels, rules), replaced as a whole so evaluation never sees a half-loaded table
+        self._table = ((), ())
+        self.load()
+        
+    def load(self):
+        """
+        Read and compile the rules table, keeping the current table if the file is invalid.
+        
+        Returns:
+            bool: True if the table was loaded
+        """
+        try:
+            mtime = os.path.getmtime(self.path)
+            with open(self.path, 'r') as f:
+                table = json.load(f)
+            self._table = self._compile(table)
+            self.loaded_mtime = mtime
+            logger.info(f"Loaded {len(self._table[1])} diabetes risk rules from {self.path}")
+            return True
+        except Exception as e:
+            logger.error(f"Error loading diabetes risk rules from {self.path}: {str(e)}")
+            return False
+            
+    def _compile(self, table):
+        """
+        Check a rules table and resolve its level names and description ids.
+        
+        Args:
+            table (dict): "levels" (most severe first), "descriptions" by id and "rules"
+            
+        Returns:
+            tuple: (levels, compiled rules)
+        """
+        levels = tuple(table["levels"])
+        ranks = {level: rank for rank, level in enumerate(levels)}
+        descriptions = {key: sys.intern(text) for key, text in table["descriptions"].items()}
+        
+        rules = []
+        for rule in table["rules"]:
+            kind = rule["type"]
+            if kind not in RULE_TYPES:
+                raise ValueError(f"Unknown rule type {kind} for factor {rule['factor']}")
+                
+            factor = sys.intern(rule["factor"])
+            description = descriptions[rule["description"]]
+            if kind == "threshold":
+                thresholds = sorted((ranks[level], threshold) for level, threshold in rule["thresholds"].items())
+                rules.append(Rule(factor, OPERATORS[rule["operator"]], tuple(thresholds), None, None, description))
+            else:
+                values = (rule["value"],) if kind == "equals" else tuple(rule["values"])
+                rules.append(Rule(factor, None, values, ranks[rule["level"]], rule.get("display"), description))
+            
+        return levels, tuple(rules)
+        
+    def refresh(self):
+        """Reload the table if its file changed since it was loaded (checked at most once per interval)"""
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime != self.loaded_mtime:
+            self.load()
+            
+    def evaluate(self, record):
+        """
+        Get the risk factors of one record.
+        
+        Args:
+            record (dict): Validated input data
+            
+        Returns:
+            list: Risk factors sorted by level, most severe first
+        """
+        self.refresh()
+        levels, rules = self._table
+        
+        flagged = [[] for _ in levels]
+        for factor, compare, limits, rule_rank, display, description in rules:
+            value = record[factor]
+            if compare is not None:
+                # Threshold rules take the rank of the most severe level the value passes
+                value = float(value)
+                for rank, threshold in limits:
+                    if compare(value, threshold):
+                        break
+                else:
+                    continue
+            elif value in limits:
+                rank = rule_rank
+                if display is not None:
+                    value = display
+            else:
+                continue
+                
+            flagged[rank].append({
+                "factor": factor,
+                "value": value,
+                "level": levels[rank],
+                "description": description
+            })
+            
+        return [factor for level_factors in flagged for factor in level_factors]
+        
+    def evaluate_batch(self, records):
+        """
+        Get the risk factors of many records, evaluating each rule over a whole column.
+        
+        Args:
+            records (list): Validated input data dictionaries
+            
+        Returns:
+            list: Risk factors of each record, in order, as evaluate returns them
+        """
+        self.refresh()
+        levels, rules = self._table
+        count = len(records)
+        
+        # Level rank of every rule for every record; len(levels) where the rule does not apply
+        not_flagged = len(levels)
+        rule_ranks = []
+        rule_values = []
+        for rule in rules:
+            values = [record[rule.factor] for record in records]
+            if rule.compare is not None:
+                # Least severe level first, so more severe levels overwrite it
+                numbers = self._to_numbers(values)
+                ranks = np.full(count, not_flagged)
+                for level_rank, threshold in reversed(rule.limits):
+                    ranks[rule.compare(numbers, threshold)] = level_rank
+                rule_values.append(numbers.tolist())
+            else:
+                column = np.empty(count, dtype=object)
+                column[:] = values
+                matched = np.zeros(count, dtype=bool)
+                for allowed in rule.limits:
+                    matched |= (column == allowed).astype(bool)
+                ranks = np.where(matched, rule.rank, not_flagged)
+                rule_values.append([rule.display] * count if rule.display is not None else values)
+            rule_ranks.append(ranks)
+            
+        results = [[] for _ in range(count)]
+        for rank, level in enumerate(levels):
+            for rule, ranks, values in zip(rules, rule_ranks, rule_values):
+                factor, description = rule.factor, rule.description
+                for index in np.flatnonzero(ranks == rank).tolist():
+                    results[index].append({
+                        "factor": factor,
+                        "value": values[index],
+                        "level": level,
+                        "description": description
+                    })
+        return results
+        
+    def _to_numbers(self, values):
+        """Convert a column with float(), at once when every value is a plain number"""
+        if set(map(type, values)) <= NUMERIC_TYPES:
+            try:
+                return np.array(values, dtype=np.float64)
+            except OverflowError:
+                pass
+        return np.array([float(value) for value in values], dtype=np.float64)
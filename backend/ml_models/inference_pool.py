@@ -0,0 +1,315 @@
+import os
+import importlib
+import threading
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from utils.logger import setup_logger
+from ml_models.thread_budget import thread_budget
+from ml_models.deadline import bounded_timeout, is_expired, cancelled_result
+
+logger = setup_logger("inference_pool")
+
+# Model instances loaded in this worker process, keyed by (model name, version)
+_worker_models = {}
+_worker_app_context = None
+
+def _init_worker(model_specs):
+    """
+    Initializer run once in every worker process.
+    
+    Pushes a Flask application context so connectors can store their
+    predictions as usual, then loads every model placed on this pool.
+    
+    Args:
+        model_specs (dict): (model name, version) mapped to the version configuration
+    """
+    global _worker_app_context
+    
+    backend_dir = str(Path(__file__).resolve().parents[1])
+    if backend_dir not in sys.path:
+        sys.path.append(backend_dir)
+        
+    try:
+        from flask import Flask
+        from config import Config
+        from utils.db import db
+        # Imported so foreign keys of the prediction tables can be resolved
+        from models.patient import Patient
+        from models.user import User
+        
+        app = Flask("inference_worker")
+        app.config.from_object(Config)
+        db.init_app(app)
+        _worker_app_context = app.app_context()
+        _worker_app_context.push()
+    except Exception as e:
+        logger.error(f"Worker {os.getpid()} could not set up the database, predictions will not be stored: {str(e)}")
+        
+    # Environment limits are inherited from the web process; also cap pools loaded since
+    thread_budget.apply()
+    
+    for (model_name, version), model_info in model_specs.items():
+        try:
+            module = importlib.import_module(model_info["connector"])
+            model_class = getattr(module, model_info["class"])
+            params = thread_budget.connector_params(model_name, model_class, model_info.get("params", {}))
+            _worker_models[(model_name, version)] = model_class(**params)
+            logger.info(f"Worker {os.getpid()} loaded model {model_name} (v{version})")
+        except Exception as e:
+            logger.error(f"Worker {os.getpid()} failed to load model {model_name} (v{version}): {str(e)}", exc_info=True)
+
+def _worker_predict(model_name, version, data, context):
+    """Run a prediction with a model loaded in this worker process"""
+    model = _worker_models.get((model_name, version))
+    if model is None:
+        return {"error": f"Model {model_name} is not available"}
+        
+    try:
+        return model.predict(data, context)
+    except Exception as e:
+        logger.error(f"Error making prediction with model {model_name} in worker {os.getpid()}: {str(e)}", exc_info=True)
+        try:
+            from utils.db import db
+            db.session.rollback()
+        except Exception:
+            pass
+        return {"error": str(e)}
+
+def _worker_predict_many(model_name, version, records, context):
+    """Run a batch of predictions with a model loaded in this worker process"""
+    model = _worker_models.get((model_name, version))
+    if model is None:
+        return [{"error": f"Model {model_name} is not available"} for _ in records]
+        
+    if not hasattr(model, "predict_many"):
+        return [_worker_predict(model_name, version, data, context) for data in records]
+        
+    try:
+        return model.predict_many(records, context)
+    except Exception as e:
+        logger.error(f"Error making batch prediction with model {model_name} in worker {os.getpid()}: {str(e)}", exc_info=True)
+        try:
+            from utils.db import db
+            db.session.rollback()
+        except Exception:
+            pass
+        return [{"error": str(e)} for _ in records]
+
+def _worker_store_result(model_name, version, data, result, context):
+    """Store a cached prediction result with a model loaded in this worker process"""
+    model = _worker_models.get((model_name, version))
+    if model is None:
+        result["storage_error"] = "Failed to store prediction"
+        return result
+        
+    model.store_result(data, result, context)
+    return result
+
+def _worker_validate(model_name, version):
+    """Run a validation prediction with the sample input of a model loaded in this worker"""
+    model = _worker_models.get((model_name, version))
+    if model is None:
+        return False, f"Model {model_name} (v{version}) could not be loaded in worker"
+        
+    sample_input = getattr(model, "sample_input", None)
+    if sample_input is None:
+        return True, ""
+        
+    result = _worker_predict(model_name, version, sample_input(), None)
+    if "error" in result:
+        return False, result["error"]
+    return True, ""
+
+class InferencePool:
+    """
+    A pool of worker processes that each hold their own copy of a set of models.
+    Inputs and results are pickled across the process boundary, so CPU-bound
+    inference runs outside the web process's GIL.
+    """
+    
+    def __init__(self, name, workers, model_specs, start_method="spawn", timeout=None):
+        """
+        Initialize the pool (worker processes start on first use).
+        
+        Args:
+            name (str): Pool name from the executor configuration
+            workers (int): Number of worker processes
+            model_specs (dict): (model name, version) mapped to the version configuration
+            start_method (str): multiprocessing start method
+            timeout (float, optional): Seconds to wait for a result
+        """
+        self.name = name
+        self.workers = workers
+        self.model_specs = model_specs
+        self.start_method = start_method
+        self.timeout = timeout
+        self._executor = None
+        self._lock = threading.Lock()
+        
+    def _new_executor(self):
+        """Create a process pool whose workers load this pool's models"""
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context(self.start_method),
+            initializer=_init_worker,
+            initargs=(self.model_specs,)
+        )
+        
+    def _get_executor(self):
+        """Get the process pool, creating it on first use"""
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = self._new_executor()
+                    logger.info(f"Started inference pool '{self.name}' with {self.workers} workers "
+                                f"for {[f'{m}:{v}' for m, v in self.model_specs]}")
+        return self._executor
+        
+    def predict(self, model_name, version, data, context=None):
+        """
+        Run a prediction in a worker process and wait for its result.
+        
+        The wait ends at the pool timeout or at the request deadline in the
+        context, whichever comes first; a prediction still queued for a
+        worker is then cancelled.
+        
+        Returns:
+            dict: Prediction results
+        """
+        timeout = bounded_timeout(context, self.timeout)
+        try:
+            return self._submit(_worker_predict, model_name, version, data, context, timeout=timeout)
+        except FutureTimeoutError:
+            if is_expired(context):
+                return cancelled_result("inference")
+            return self._timeout_error(timeout)
+            
+    def predict_many(self, model_name, version, records, context=None):
+        """
+        Run a batch of predictions in one worker process and wait for the results.
+        
+        The wait is bounded like predict; when it ends, every record gets
+        the timeout (or cancellation) result.
+        
+        Returns:
+            list: One prediction result per record
+        """
+        timeout = bounded_timeout(context, self.timeout)
+        try:
+            return self._submit(_worker_predict_many, model_name, version, records, context, timeout=timeout)
+        except FutureTimeoutError:
+            if is_expired(context):
+                return [cancelled_result("inference") for _ in records]
+            return [self._timeout_error(timeout) for _ in records]
+            
+    def _timeout_error(self, timeout):
+        """Build the error result of a prediction that did not finish within the timeout"""
+        logger.error(f"Inference timed out after {timeout:g}s in pool '{self.name}'")
+        return {"error": f"Inference timed out after {timeout:g}s in pool '{self.name}'"}
+        
+    def store_result(self, model_name, version, data, result, context):
+        """
+        Store a prediction result for the patient in the context in a worker process.
+        
+        Returns:
+            dict: The result with its stored record "id" (or "storage_error")
+        """
+        return self._submit(_worker_store_result, model_name, version, data, result, context)
+        
+    def warmup(self, model_name, version, iterations=3):
+        """
+        Run validation predictions with a model so every worker process is
+        started and has loaded and exercised it before taking traffic.
+        
+        Returns:
+            tuple: (latencies in ms, error message or None)
+        """
+        executor = self._get_executor()
+        latencies = []
+        
+        for _ in range(iterations):
+            # One round of concurrent calls, so each idle worker picks one up
+            started = time.perf_counter()
+            futures = [executor.submit(_worker_validate, model_name, version) for _ in range(self.workers)]
+            for future in futures:
+                is_valid, error_message = future.result(timeout=self.timeout)
+                if not is_valid:
+                    return latencies, error_message
+            latencies.append((time.perf_counter() - started) * 1000)
+            
+        return latencies, None
+        
+    def _submit(self, fn, *args, timeout=None):
+        """Run a worker function and wait for its result, restarting a broken pool once"""
+        timeout = self.timeout if timeout is None else timeout
+        executor = self._get_executor()
+        try:
+            future = executor.submit(fn, *args)
+            return self._wait(future, timeout)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); start fresh workers and retry once
+            logger.error(f"Inference pool '{self.name}' is broken, restarting its workers")
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = self._new_executor()
+            future = self._get_executor().submit(fn, *args)
+            return self._wait(future, timeout)
+            
+    def _wait(self, future, timeout):
+        """Wait for a worker result; on timeout, cancel the call if no worker has started it"""
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise
+            
+    def recycle(self):
+        """
+        Replace the worker processes, e.g. after a model artifact changed.
+        
+        The new workers must pass a validation prediction for every model
+        before they take traffic. The old pool then finishes the work already
+        submitted to it and shuts down.
+        
+        Returns:
+            tuple: (succeeded, error_message)
+        """
+        new_executor = self._new_executor()
+        
+        for model_name, version in self.model_specs:
+            try:
+                is_valid, error_message = new_executor.submit(_worker_validate, model_name, version).result(timeout=self.timeout)
+            except Exception as e:
+                is_valid, error_message = False, str(e)
+                
+            if not is_valid:
+                new_executor.shutdown(wait=False)
+                logger.error(f"Validation of recycled pool '{self.name}' failed for {model_name} (v{version}): {error_message}")
+                return False, error_message
+                
+        with self._lock:
+            old_executor = self._executor
+            self._executor = new_executor
+            
+        if old_executor is not None:
+            old_executor.shutdown(wait=False)
+        logger.info(f"Recycled inference pool '{self.name}'")
+        return True, ""
+        
+    def shutdown(self, wait=True):
+        """
+        Stop all worker processes.
+        
+        Args:
+            wait (bool): Block until submitted work has finished
+        """
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
@@ -1,14 +1,30 @@
 import os
+import gc
 import importlib
 import json
+import random
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from pathlib import Path
 import sys
 
 sys.path.append(str(Path(__file__).resolve().parents[1]))
 from utils.logger import setup_logger
+from ml_models.model_stats import VersionStats, model_size
+from ml_models.inference_pool import InferencePool
+from ml_models.prediction_cache import PredictionCache, input_hash
+from ml_models.artifacts import process_memory, mapped_file_memory
+from ml_models.thread_budget import thread_budget
+from ml_models.admission import AdmissionController
+from ml_models.deadline import is_expired, cancelled_result
 
 logger = setup_logger("model_registry")
 
+ROUTING_POLICIES = ("pinned", "split", "shadow")
+
 class ModelRegistry:
     """
     Central registry for all prediction models in the system.
@@ -18,7 +34,21 @@ class ModelRegistry:
     def __init__(self):
         self.models = {}
         self.config_path = os.path.join(os.path.dirname(__file__), 'model_config.json')
+        self._config_mtime = None
+        self._watcher_thread = None
+        self._watcher_stop = threading.Event()
+        self._shadow_executor = None
+        self._shadow_pending = 0
+        self._shadow_lock = threading.Lock()
+        self._pools = {}
+        self._pools_lock = threading.Lock()
+        self._preloaded = False
+        self._warmup_thread = None
+        self._warmup_lock = threading.Lock()
+        self._warmup_finished = False
+        self.admission = AdmissionController()
         self._load_config()
+        self.admission.configure(self.model_config.get("admission", {}))
         
     def _load_config(self):
         """Load model configuration from JSON file"""
@@ -26,6 +56,7 @@ class ModelRegistry:
             if os.path.exists(self.config_path):
                 with open(self.config_path, 'r') as f:
                     self.model_config = json.load(f)
+                self._config_mtime = os.path.getmtime(self.config_path)
                 logger.info(f"Loaded model configuration from {self.config_path}")
             else:
                 self.model_config = {
@@ -48,53 +79,1106 @@ class ModelRegistry:
             self.model_config = {"models": {}}
             
     def register_models(self):
-        """Discover and register all enabled models from configuration"""
+        """
+        Discover all enabled models from configuration.
+        
+        Only the connector module and class names are recorded here; the
+        connector is imported and instantiated on first use (see get_model).
+        """
         for model_name, model_info in self.model_config.get("models", {}).items():
             if model_info.get("enabled", False):
-                try:
-                    # Dynamically import the connector module
-                    module_name = model_info.get("connector")
-                    class_name = model_info.get("class")
+                module_name = model_info.get("connector")
+                class_name = model_info.get("class")
+                
+                if not module_name or not class_name:
+                    logger.error(f"Missing connector or class for model {model_name}")
+                    continue
                     
-                    if not module_name or not class_name:
-                        logger.error(f"Missing connector or class for model {model_name}")
-                        continue
+                # Register the model and its versions without loading them
+                self.models[model_name] = self._new_model_entry(model_info)
+                
+                versions = ", ".join(self.models[model_name]["versions"])
+                logger.info(f"Registered model: {model_name} (versions: {versions}), loading deferred until first use")
+                
+    def _version_infos(self, model_info):
+        """
+        Expand a model configuration entry into one configuration per version.
+        
+        The entry itself describes the default version. Additional versions
+        listed under "versions" inherit every field from it and may override
+        connector, class or params (e.g. params.model_path).
+        
+        Args:
+            model_info (dict): Model configuration entry
+            
+        Returns:
+            dict: Version string mapped to its merged configuration
+        """
+        base_info = {key: value for key, value in model_info.items() if key not in ("versions", "routing")}
+        default_version = str(model_info.get("version", "1.0.0"))
+        version_infos = {default_version: dict(base_info, version=default_version)}
+        
+        for version, overrides in model_info.get("versions", {}).items():
+            version_infos[str(version)] = dict(base_info, **(overrides or {}), version=str(version))
+            
+        return version_infos
+        
+    def _new_model_entry(self, model_info):
+        """Create a registry entry for a model with all of its versions unloaded"""
+        version_infos = self._version_infos(model_info)
+        
+        return {
+            "info": model_info,
+            "default_version": str(model_info.get("version", "1.0.0")),
+            "routing": self._parse_routing(model_info, version_infos),
+            "versions": {
+                version: self._new_entry(version_info)
+                for version, version_info in version_infos.items()
+            }
+        }
+        
+    def _parse_routing(self, model_info, version_infos, strict=False):
+        """
+        Validate the routing policy of a model, falling back to pinning the default version.
+        
+        Supported policies:
+            {"policy": "pinned", "version": "1.0.0"}
+            {"policy": "split", "weights": {"1.0.0": 90, "1.1.0": 10}}
+            {"policy": "shadow", "primary": "1.0.0", "shadow": ["1.1.0"], "sample_rate": 1.0}
+            
+        Args:
+            model_info (dict): Model configuration entry
+            version_infos (dict): Configured versions of the model
+            strict (bool): Raise ValueError on an invalid policy instead of falling back
+        """
+        default_version = str(model_info.get("version", "1.0.0"))
+        routing = dict(model_info.get("routing") or {"policy": "pinned", "version": default_version})
+        policy = routing.get("policy", "pinned")
+        
+        try:
+            if policy not in ROUTING_POLICIES:
+                raise ValueError(f"unknown policy {policy}")
+                
+            if policy == "pinned":
+                routing["version"] = str(routing.get("version", default_version))
+                referenced = [routing["version"]]
+            elif policy == "split":
+                routing["weights"] = {str(v): float(w) for v, w in routing.get("weights", {}).items()}
+                if not routing["weights"] or sum(routing["weights"].values()) <= 0:
+                    raise ValueError("split policy needs positive weights")
+                referenced = list(routing["weights"])
+            else:
+                routing["primary"] = str(routing.get("primary", default_version))
+                shadow = routing.get("shadow", [])
+                routing["shadow"] = [str(v) for v in (shadow if isinstance(shadow, list) else [shadow])]
+                routing["sample_rate"] = float(routing.get("sample_rate", 1.0))
+                referenced = [routing["primary"]] + routing["shadow"]
+                
+            unknown = [v for v in referenced if v not in version_infos]
+            if unknown:
+                raise ValueError(f"unknown versions {unknown}")
+                
+            return routing
+        except (ValueError, TypeError) as e:
+            if strict:
+                raise
+            logger.error(f"Invalid routing configuration {routing}: {str(e)}; pinning version {default_version}")
+            return {"policy": "pinned", "version": default_version}
+            
+    def _new_entry(self, model_info):
+        """Create an empty (not yet loaded) registry entry for one model version"""
+        return {
+            "instance": None,
+            "info": model_info,
+            "lock": threading.Lock(),
+            "reload_lock": threading.Lock(),
+            "load_attempts": 0,
+            "load_error": None,
+            "loaded_at": None,
+            "artifact_mtime": None,
+            "reload_count": 0,
+            "last_reload": None,
+            "stats": VersionStats(),
+            "cache": self._new_cache(model_info),
+            "load_stats": None,
+            "state": "registered",
+            "warmup": None
+        }
+        
+    def _new_cache(self, model_info):
+        """
+        Create the prediction cache of a model version from its "cache" settings.
+        
+        Returns:
+            PredictionCache: The cache, or None if caching is not enabled for the model
+        """
+        cache_config = model_info.get("cache")
+        if not cache_config or not cache_config.get("enabled", True):
+            return None
+            
+        return PredictionCache(
+            max_entries=cache_config.get("max_entries", 1024),
+            ttl_seconds=cache_config.get("ttl_seconds", 600)
+        )
+        
+    def _build_instance(self, model_name, model_info):
+        """
+        Import the connector module and instantiate its model class.
+        
+        Args:
+            model_name (str): Name of the model
+            model_info (dict): Model version configuration entry; its optional
+                "params" are passed to the connector as keyword arguments
+                
+        Returns:
+            object: A new model instance
+        """
+        # Dynamically import the connector module
+        module = importlib.import_module(model_info["connector"])
+        
+        # Get the model class
+        model_class = getattr(module, model_info["class"])
+        
+        # Instantiate the model with its share of the node's CPU threads
+        params = thread_budget.connector_params(model_name, model_class, model_info.get("params", {}))
+        return model_class(**params)
+        
+    def _build_measured(self, model_name, model_info):
+        """
+        Build a model instance and measure what loading it cost.
+        
+        Memory is measured for the whole process, so loads running in
+        parallel (e.g. during warmup) blur each other's figures.
+        
+        Returns:
+            tuple: (model instance, load statistics)
+        """
+        rss_before = (process_memory() or {}).get("rss_kb")
+        started = time.perf_counter()
+        instance = self._build_instance(model_name, model_info)
+        load_seconds = time.perf_counter() - started
+        rss_after = (process_memory() or {}).get("rss_kb")
+        
+        artifact_path = getattr(instance, "loaded_path", None) or getattr(instance, "model_path", None)
+        artifact_bytes = None
+        if artifact_path and os.path.exists(artifact_path):
+            # Keras may save a model as a directory
+            if os.path.isdir(artifact_path):
+                artifact_bytes = sum(
+                    os.path.getsize(os.path.join(root, name))
+                    for root, _, names in os.walk(artifact_path) for name in names
+                )
+            else:
+                artifact_bytes = os.path.getsize(artifact_path)
+                
+        load_stats = {
+            "artifact": artifact_path,
+            "artifact_bytes": artifact_bytes,
+            "load_seconds": round(load_seconds, 3),
+            "rss_before_kb": rss_before,
+            "rss_after_kb": rss_after,
+            "rss_delta_kb": rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+            "model_size": model_size(getattr(instance, "model", None))
+        }
+        return instance, load_stats
+        
+    def _artifact_mtime(self, instance):
+        """Get the modification time of the artifact a model instance was loaded from"""
+        model_path = getattr(instance, "model_path", None)
+        if model_path and os.path.exists(model_path):
+            return os.path.getmtime(model_path)
+        return None
+        
+    def _get_version_entry(self, model_name, version):
+        """Look up the registry entry of one model version, or None"""
+        model_entry = self.models.get(model_name)
+        if model_entry is None:
+            return None
+        return model_entry["versions"].get(str(version))
+        
+    def _load_model_instance(self, model_name, version):
+        """
+        Import the connector and instantiate the model for a registered version.
+        
+        Concurrent callers wait on the entry lock so that only one of them
+        performs the load; the others reuse its instance (or its failure).
+        
+        Args:
+            model_name (str): Name of the registered model
+            version (str): Version of the model to load
+            
+        Returns:
+            object: The model instance, or None if loading failed
+        """
+        entry = self._get_version_entry(model_name, version)
+        attempt = entry["load_attempts"]
+        
+        with entry["lock"]:
+            # Another thread finished (or failed) the load while we were waiting
+            if entry["instance"] is not None or entry["load_attempts"] != attempt:
+                return entry["instance"]
+                
+            entry["load_attempts"] += 1
+            model_info = entry["info"]
+            
+            try:
+                instance, entry["load_stats"] = self._build_measured(model_name, model_info)
+                entry["artifact_mtime"] = self._artifact_mtime(instance)
+                entry["loaded_at"] = datetime.utcnow().isoformat()
+                entry["load_error"] = None
+                entry["instance"] = instance
+                
+                logger.info(f"Successfully loaded model: {model_name} (v{version})")
+            except Exception as e:
+                entry["load_error"] = str(e)
+                logger.error(f"Error loading model {model_name} (v{version}): {str(e)}", exc_info=True)
+                
+            return entry["instance"]
+            
+    def _primary_version(self, model_name):
+        """Get the version that serves traffic when no request context is involved"""
+        routing = self.models[model_name]["routing"]
+        
+        if routing["policy"] == "pinned":
+            return routing["version"]
+        if routing["policy"] == "shadow":
+            return routing["primary"]
+        return max(routing["weights"], key=routing["weights"].get)
+        
+    def _route(self, model_name, context=None):
+        """
+        Choose the version that serves a request according to the routing policy.
+        
+        Split routing is sticky per patient when a patient_id is available,
+        so repeat predictions for a patient are served by the same version.
+        
+        Returns:
+            tuple: (serving version, list of shadow versions)
+        """
+        routing = self.models[model_name]["routing"]
+        
+        if routing["policy"] == "split":
+            weights = routing["weights"]
+            total = sum(weights.values())
+            
+            if context and context.get("patient_id"):
+                point = (zlib.crc32(str(context["patient_id"]).encode()) % 10000) / 10000 * total
+            else:
+                point = random.random() * total
+                
+            for version, weight in weights.items():
+                point -= weight
+                if point < 0:
+                    return version, []
+            return version, []
+            
+        if routing["policy"] == "shadow":
+            shadows = routing["shadow"] if random.random() < routing["sample_rate"] else []
+            return routing["primary"], shadows
+            
+        return routing["version"], []
+        
+    def has_model(self, model_name):
+        """Check whether a model is registered, without loading it"""
+        return model_name in self.models
+        
+    def _pool_name(self, model_name):
+        """
+        Get the inference pool a model is placed on, or None to run it inline.
+        
+        With executor.mode "process", models run on the pool named by their
+        "pool" field (default "default"); "pool": "inline" keeps a model on
+        the request thread.
+        """
+        executor_config = self.model_config.get("executor", {})
+        if executor_config.get("mode", "inline") != "process":
+            return None
+            
+        pool_name = self.models[model_name]["info"].get("pool", "default")
+        return None if pool_name in (None, "inline") else pool_name
+        
+    def _get_pool(self, pool_name):
+        """Get an inference pool, creating it with every model version placed on it"""
+        pool = self._pools.get(pool_name)
+        if pool is not None:
+            return pool
+            
+        with self._pools_lock:
+            if pool_name not in self._pools:
+                executor_config = self.model_config.get("executor", {})
+                pool_config = executor_config.get("pools", {}).get(pool_name, {})
+                
+                model_specs = {
+                    (model_name, version): entry["info"]
+                    for model_name, model_entry in self.models.items()
+                    if self._pool_name(model_name) == pool_name
+                    for version, entry in model_entry["versions"].items()
+                }
+                
+                self._pools[pool_name] = InferencePool(
+                    name=pool_name,
+                    workers=pool_config.get("workers", os.cpu_count() or 1),
+                    model_specs=model_specs,
+                    start_method=executor_config.get("start_method", "spawn"),
+                    timeout=executor_config.get("timeout_seconds")
+                )
+            return self._pools[pool_name]
+            
+    def _invoke(self, model_name, version, data, context):
+        """
+        Run a prediction with one model version, inline or on its inference pool.
+        
+        Returns:
+            dict: Prediction results
+        """
+        pool_name = self._pool_name(model_name)
+        if pool_name is not None:
+            return self._get_pool(pool_name).predict(model_name, version, data, context)
+            
+        model = self.get_model(model_name, version)
+        if not model:
+            logger.error(f"Model {model_name} (v{version}) could not be loaded for prediction")
+            return {"error": f"Model {model_name} is not available"}
+            
+        return model.predict(data, context)
+        
+    def _invoke_store(self, model_name, version, data, result, context):
+        """
+        Store a prediction result served from the cache for the patient in the context.
+        
+        Returns:
+            dict: The result with its stored record "id" (or "storage_error")
+        """
+        if not context or "patient_id" not in context:
+            return result
+            
+        pool_name = self._pool_name(model_name)
+        if pool_name is not None:
+            return self._get_pool(pool_name).store_result(model_name, version, data, result, context)
+            
+        model = self.get_model(model_name, version)
+        if not model:
+            result["storage_error"] = "Failed to store prediction"
+            return result
+            
+        model.store_result(data, result, context)
+        return result
+        
+    def _invoke_many(self, model_name, version, records, context):
+        """
+        Run a batch of predictions with one model version, inline or on its inference pool.
+        Connectors without a predict_many method score the records one at a time.
+        
+        Returns:
+            list: One prediction result per record
+        """
+        pool_name = self._pool_name(model_name)
+        if pool_name is not None:
+            return self._get_pool(pool_name).predict_many(model_name, version, records, context)
+            
+        model = self.get_model(model_name, version)
+        if not model:
+            logger.error(f"Model {model_name} (v{version}) could not be loaded for prediction")
+            return [{"error": f"Model {model_name} is not available"} for _ in records]
+            
+        if not hasattr(model, "predict_many"):
+            return [model.predict(data, context) for data in records]
+            
+        return model.predict_many(records, context)
+        
+    def get_model(self, model_name, version=None):
+        """
+        Get a specific model by name, loading it on first access.
+        
+        Args:
+            model_name (str): Name of the model
+            version (str, optional): Specific version; defaults to the version
+                that serves traffic under the model's routing policy
+        """
+        if (model_name not in self.models):
+            logger.warning(f"Model {model_name} not found in registry")
+            return None
+            
+        if version is None:
+            version = self._primary_version(model_name)
+            
+        entry = self._get_version_entry(model_name, version)
+        if entry is None:
+            logger.warning(f"Version {version} of model {model_name} not found in registry")
+            return None
+            
+        instance = entry["instance"]
+        if instance is None:
+            instance = self._load_model_instance(model_name, version)
+            
+        return instance
+        
+    def get_all_models(self):
+        """
+        Get all registered models with their metadata.
+        
+        Each version also reports what loading it cost (artifact size, load
+        time, process memory before and after, parameter or tree count) and
+        its rolling single-prediction latency. Load figures are only known for
+        versions loaded in this process, not in inference pool workers.
+        """
+        return {
+            name: {
+                "info": model_entry["info"],
+                "routing": model_entry["routing"],
+                "versions": {
+                    version: {
+                        "loaded": entry["instance"] is not None,
+                        "loaded_at": entry["loaded_at"],
+                        "reload_count": entry["reload_count"],
+                        "last_reload": entry["last_reload"],
+                        "resources": entry["load_stats"],
+                        "latency_ms": entry["stats"].snapshot()["latency_ms"]
+                    }
+                    for version, entry in model_entry["versions"].items()
+                }
+            }
+            for name, model_entry in list(self.models.items())
+        }
+        
+    def preload_models(self, freeze_gc=True):
+        """
+        Load every inline model version now instead of on first use.
+        
+        Meant to run once in a preforking master (see gunicorn.conf.py): the
+        workers forked afterwards share the loaded models' memory pages
+        copy-on-write instead of each loading a private copy. Models served by
+        an inference pool are loaded by the pool's own workers and skipped, as
+        are versions configured with "preload": false (e.g. TensorFlow models,
+        which are not safe to use across fork); each worker loads those itself.
+        
+        Args:
+            freeze_gc (bool): Move the loaded objects to the permanent GC
+                generation, so garbage collection in the workers does not write
+                to (and thereby copy) their pages
+                
+        Returns:
+            dict: Versions loaded per model
+        """
+        loaded = {}
+        for model_name, model_entry in list(self.models.items()):
+            if self._pool_name(model_name) is not None:
+                continue
+            for version, entry in model_entry["versions"].items():
+                if not entry["info"].get("preload", True):
+                    continue
+                if self.get_model(model_name, version) is not None:
+                    loaded.setdefault(model_name, []).append(version)
                     
-                    # Import the module
-                    module = importlib.import_module(module_name)
+        if freeze_gc and hasattr(gc, "freeze"):
+            gc.collect()
+            gc.freeze()
+            
+        self._preloaded = True
+        logger.info(f"Preloaded models {loaded} (gc frozen: {freeze_gc})")
+        return loaded
+        
+    def after_fork(self):
+        """
+        Drop the threaded state a forked worker inherited from the master.
+        
+        Threads do not survive fork: inference pools and the shadow executor
+        are created again on first use, and the artifact watcher is restarted
+        if it is enabled. Micro-batchers restart their own threads. Warmup
+        state is per process, so each worker warms up (see start_warmup) and
+        reports its own readiness.
+        """
+        self._pools_lock = threading.Lock()
+        self._pools = {}
+        self._shadow_lock = threading.Lock()
+        self._shadow_executor = None
+        self._shadow_pending = 0
+        self._warmup_lock = threading.Lock()
+        self._warmup_thread = None
+        self._warmup_finished = False
+        
+        self._watcher_stop = threading.Event()
+        self._watcher_thread = None
+        if self.model_config.get("hot_reload", {}).get("watch", False):
+            self.start_watcher()
+            
+    def start_warmup(self):
+        """Load and warm up all models in a background thread (once)"""
+        with self._warmup_lock:
+            if self._warmup_thread is not None:
+                return
+            self._warmup_thread = threading.Thread(target=self.warmup_models, name="model-warmup", daemon=True)
+            self._warmup_thread.start()
+            
+    def warmup_models(self):
+        """
+        Load every registered model version in parallel, then run warmup
+        predictions through each connector's full validate/preprocess/predict
+        path so that the first user requests do not pay for lazy loading or
+        graph tracing.
+        
+        If a background warmup is already running, waits for it instead.
+        
+        Returns:
+            dict: Readiness report (see get_readiness)
+        """
+        thread = self._warmup_thread
+        if thread is not None and thread is not threading.current_thread() and thread.is_alive():
+            thread.join()
+            return self.get_readiness()
+            
+        warmup_config = self.model_config.get("warmup", {})
+        iterations = max(1, int(warmup_config.get("iterations", 3)))
+        targets = [
+            (model_name, version)
+            for model_name, model_entry in list(self.models.items())
+            for version in model_entry["versions"]
+        ]
+        
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, int(warmup_config.get("max_parallel_loads", 4))),
+                                thread_name_prefix="model-warmup") as executor:
+            list(executor.map(lambda target: self._warmup_version(*target, iterations), targets))
+            
+        self._warmup_finished = True
+        readiness = self.get_readiness()
+        logger.info(f"Model warmup finished in {time.perf_counter() - started:.2f}s (ready: {readiness['ready']})")
+        return readiness
+        
+    def _warmup_version(self, model_name, version, iterations):
+        """Load one model version and time its warmup predictions"""
+        entry = self._get_version_entry(model_name, version)
+        if entry is None:
+            return
+            
+        entry["state"] = "loading"
+        latencies, error = [], None
+        try:
+            pool_name = self._pool_name(model_name)
+            if pool_name is not None:
+                # Every worker process of the pool loads and warms up its own copy
+                entry["state"] = "warming"
+                latencies, error = self._get_pool(pool_name).warmup(model_name, version, iterations)
+            else:
+                instance = self.get_model(model_name, version)
+                if instance is None or getattr(instance, "model", True) is None:
+                    error = entry["load_error"] or "Model artifact could not be loaded"
+                else:
+                    entry["state"] = "warming"
+                    latencies, error = self._warmup_instance(instance, iterations)
+        except Exception as e:
+            logger.error(f"Error warming up model {model_name} (v{version}): {str(e)}", exc_info=True)
+            error = str(e)
+            
+        entry["warmup"] = {
+            "iterations": len(latencies),
+            "first_ms": round(latencies[0], 3) if latencies else None,
+            "last_ms": round(latencies[-1], 3) if latencies else None,
+            "error": error,
+            "finished_at": datetime.utcnow().isoformat()
+        }
+        entry["state"] = "failed" if error else "ready"
+        if error:
+            logger.error(f"Warmup of model {model_name} (v{version}) failed: {error}")
+        else:
+            logger.info(f"Model {model_name} (v{version}) warmed up: {entry['warmup']}")
+            
+    def _warmup_instance(self, instance, iterations):
+        """
+        Run the connector's sample input through predict() several times.
+        
+        Returns:
+            tuple: (latencies in ms, error message or None)
+        """
+        sample_input = getattr(instance, "sample_input", None)
+        if sample_input is None:
+            return [], None
+            
+        latencies = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            result = instance.predict(sample_input())
+            latencies.append((time.perf_counter() - started) * 1000)
+            if not isinstance(result, dict) or "error" in result:
+                error = result.get("error") if isinstance(result, dict) else "Unexpected prediction result"
+                return latencies, error
+                
+        return latencies, None
+        
+    def get_readiness(self):
+        """
+        Get the readiness of this process to take traffic.
+        
+        The process is ready once warmup has finished and every model version
+        it warmed up is loaded and answered its warmup predictions. Versions
+        registered afterwards (e.g. by reload_config) do not hold readiness back.
+        When warmup is disabled in the configuration, models load lazily and
+        the process is always ready.
+        
+        Returns:
+            dict: Overall readiness and per-version state, load time and warmup latency
+        """
+        warmup_enabled = self.model_config.get("warmup", {}).get("enabled", False)
+        models = {}
+        ready = self._warmup_finished or not warmup_enabled
+        
+        for model_name, model_entry in list(self.models.items()):
+            models[model_name] = {}
+            for version, entry in model_entry["versions"].items():
+                models[model_name][version] = {
+                    "state": entry["state"],
+                    "load_seconds": (entry["load_stats"] or {}).get("load_seconds"),
+                    "warmup": entry["warmup"]
+                }
+                if warmup_enabled and entry["state"] in ("loading", "warming", "failed"):
+                    ready = False
                     
-                    # Get the model class
-                    model_class = getattr(module, class_name)
+        return {"ready": ready, "warmup_finished": self._warmup_finished, "models": models}
+        
+    def get_memory_stats(self):
+        """
+        Get the memory of this process and of each loaded model version.
+        
+        Per model the report holds the growth in resident memory measured while
+        the version was loaded, and the resident/shared/private memory backed
+        by its memory-mapped artifact file (if it was loaded with mmap_mode).
+        
+        Returns:
+            dict: Process and per-version memory figures in kB
+        """
+        artifacts = {}
+        for model_entry in list(self.models.values()):
+            for entry in model_entry["versions"].values():
+                loaded_path = getattr(entry["instance"], "loaded_path", None)
+                if loaded_path:
+                    artifacts[loaded_path] = os.path.realpath(loaded_path)
                     
-                    # Instantiate the model
-                    model_instance = model_class()
+        mapped = mapped_file_memory(list(artifacts)) or {}
+        
+        models = {}
+        for model_name, model_entry in list(self.models.items()):
+            models[model_name] = {}
+            for version, entry in model_entry["versions"].items():
+                instance = entry["instance"]
+                loaded_path = getattr(instance, "loaded_path", None)
+                models[model_name][version] = {
+                    "loaded": instance is not None,
+                    "artifact": loaded_path,
+                    "mmap_mode": getattr(instance, "mmap_mode", None),
+                    "load_rss_delta_kb": (entry["load_stats"] or {}).get("rss_delta_kb"),
+                    "mapped": mapped.get(artifacts.get(loaded_path))
+                }
+                
+        return {
+            "pid": os.getpid(),
+            "preloaded": self._preloaded,
+            "process": process_memory(),
+            "models": models
+        }
+        
+    def get_version_stats(self, model_name):
+        """
+        Get per-version latency and agreement statistics of a model.
+        
+        Args:
+            model_name (str): Name of the model
+            
+        Returns:
+            dict: Routing policy and statistics per version, or None if the model is unknown
+        """
+        model_entry = self.models.get(model_name)
+        if model_entry is None:
+            return None
+            
+        versions = {}
+        for version, entry in model_entry["versions"].items():
+            stats = dict(entry["stats"].snapshot(), loaded=entry["instance"] is not None)
+            
+            # Connector-level metrics such as micro-batching
+            get_runtime_stats = getattr(entry["instance"], "get_runtime_stats", None)
+            if get_runtime_stats is not None:
+                stats["runtime"] = get_runtime_stats()
+                
+            if entry["cache"] is not None:
+                stats["cache"] = entry["cache"].stats()
+                
+            versions[version] = stats
+            
+        return {
+            "model": model_name,
+            "routing": model_entry["routing"],
+            "versions": versions
+        }
+        
+    def set_routing(self, model_name, routing):
+        """
+        Replace the routing policy of a model at runtime (e.g. to promote a version).
+        
+        Args:
+            model_name (str): Name of the model
+            routing (dict): New routing policy
+            
+        Returns:
+            dict: The routing policy in effect, or an error
+        """
+        model_entry = self.models.get(model_name)
+        if model_entry is None:
+            return {"error": f"Model {model_name} not found"}
+            
+        version_infos = {version: entry["info"] for version, entry in model_entry["versions"].items()}
+        try:
+            parsed = self._parse_routing(dict(model_entry["info"], routing=routing), version_infos, strict=True)
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Rejected routing {routing} for model {model_name}: {str(e)}")
+            return {"error": f"Invalid routing policy for model {model_name}: {str(e)}"}
+            
+        model_entry["routing"] = parsed
+        logger.info(f"Routing for model {model_name} set to {parsed}")
+        return parsed
+        
+    def reload_model(self, model_name, version=None, background=True):
+        """
+        Load a fresh instance of a model and swap it in without downtime.
+        
+        The new instance is built alongside the current one and checked with
+        a validation prediction before it replaces the registry entry.
+        Requests that already hold the old instance finish on it.
+        
+        Args:
+            model_name (str): Name of the model to reload
+            version (str, optional): Version to reload; defaults to the version
+                serving traffic
+            background (bool): Run the reload in a background thread
+            
+        Returns:
+            dict: Reload status
+        """
+        if model_name not in self.models:
+            logger.warning(f"Reload requested for unknown model {model_name}")
+            return {"error": f"Model {model_name} not found"}
+            
+        if version is None:
+            version = self._primary_version(model_name)
+            
+        if self._get_version_entry(model_name, version) is None:
+            logger.warning(f"Reload requested for unknown version {version} of model {model_name}")
+            return {"error": f"Version {version} of model {model_name} not found"}
+            
+        if background:
+            thread = threading.Thread(
+                target=self._reload_model,
+                args=(model_name, version),
+                name=f"model-reload-{model_name}-{version}",
+                daemon=True
+            )
+            thread.start()
+            return {"model": model_name, "version": version, "status": "reloading"}
+            
+        return self._reload_model(model_name, version)
+        
+    def _reload_model(self, model_name, version):
+        """Build, validate and atomically swap in a new instance of a model version"""
+        entry = self._get_version_entry(model_name, version)
+        if entry is None:
+            return {"error": f"Version {version} of model {model_name} not found"}
+            
+        # Only one reload per model version at a time
+        if not entry["reload_lock"].acquire(blocking=False):
+            logger.warning(f"Reload of model {model_name} (v{version}) already in progress")
+            return {"model": model_name, "version": version, "status": "in_progress"}
+            
+        try:
+            logger.info(f"Reloading model {model_name} (v{version})")
+            started = time.perf_counter()
+            
+            # Models served by an inference pool are reloaded by replacing its workers
+            pool_name = self._pool_name(model_name)
+            if pool_name is not None:
+                succeeded, error_message = self._get_pool(pool_name).recycle()
+                if not succeeded:
+                    return self._record_reload(entry, "failed", f"Validation failed: {error_message}")
                     
-                    # Register the model
-                    self.models[model_name] = {
-                        "instance": model_instance,
-                        "info": model_info
-                    }
+                with entry["lock"]:
+                    entry["loaded_at"] = datetime.utcnow().isoformat()
+                    entry["reload_count"] += 1
+                self._clear_cache(entry)
+                
+                duration = time.perf_counter() - started
+                return self._record_reload(entry, "succeeded", duration_seconds=round(duration, 3))
+                
+            try:
+                new_instance, load_stats = self._build_measured(model_name, entry["info"])
+            except Exception as e:
+                logger.error(f"Error building new instance of model {model_name}: {str(e)}", exc_info=True)
+                return self._record_reload(entry, "failed", f"Load failed: {str(e)}")
+                
+            # Run a validation prediction before the new instance takes traffic
+            is_valid, error_message = self._validate_instance(model_name, new_instance)
+            if not is_valid:
+                logger.error(f"Validation of reloaded model {model_name} failed: {error_message}")
+                return self._record_reload(entry, "failed", f"Validation failed: {error_message}")
+                
+            # Atomic swap: new requests get the new instance, in-flight ones keep the old one
+            with entry["lock"]:
+                old_instance = entry["instance"]
+                entry["instance"] = new_instance
+                entry["load_stats"] = load_stats
+                entry["artifact_mtime"] = self._artifact_mtime(new_instance)
+                entry["loaded_at"] = datetime.utcnow().isoformat()
+                entry["load_error"] = None
+                entry["reload_count"] += 1
+            self._clear_cache(entry)
+            
+            # Let the old instance release background resources (e.g. its micro-batcher)
+            close = getattr(old_instance, "close", None)
+            if close is not None:
+                close()
+                
+            duration = time.perf_counter() - started
+            logger.info(f"Model {model_name} (v{version}) reloaded and swapped in after {duration:.2f}s")
+            return self._record_reload(entry, "succeeded", duration_seconds=round(duration, 3))
+        finally:
+            entry["reload_lock"].release()
+            
+    def _clear_cache(self, entry):
+        """Drop cached results of a version whose instance was replaced"""
+        if entry["cache"] is not None:
+            entry["cache"].clear()
+            
+    def _record_reload(self, entry, status, error=None, duration_seconds=None):
+        """Store the outcome of the last reload on the entry and return it"""
+        entry["last_reload"] = {
+            "status": status,
+            "error": error,
+            "duration_seconds": duration_seconds,
+            "finished_at": datetime.utcnow().isoformat()
+        }
+        return dict(entry["last_reload"])
+        
+    def _validate_instance(self, model_name, instance):
+        """
+        Run a validation prediction on a freshly built model instance.
+        
+        Uses the connector's sample_input() and no context, so nothing is
+        written to the database.
+        
+        Returns:
+            tuple: (is_valid, error_message)
+        """
+        if getattr(instance, "model", True) is None:
+            return False, "Model artifact could not be loaded"
+            
+        sample_input = getattr(instance, "sample_input", None)
+        if sample_input is None:
+            logger.warning(f"Model {model_name} has no sample_input(), skipping validation prediction")
+            return True, ""
+            
+        try:
+            result = instance.predict(sample_input())
+        except Exception as e:
+            return False, str(e)
+            
+        if not isinstance(result, dict):
+            return False, f"Unexpected prediction result type {type(result).__name__}"
+        if "error" in result:
+            return False, result["error"]
+            
+        return True, ""
+        
+    def reload_config(self):
+        """
+        Re-read model_config.json and apply it to the registry.
+        
+        New models are registered and disabled ones removed. Versions whose
+        configuration is unchanged keep their loaded instance; loaded
+        versions whose configuration changed are reloaded in the background.
+        
+        Returns:
+            dict: Names of added, removed and reloaded models
+        """
+        self._load_config()
+        self.admission.configure(self.model_config.get("admission", {}))
+        configured = {
+            name: info for name, info in self.model_config.get("models", {}).items()
+            if info.get("enabled", False) and info.get("connector") and info.get("class")
+        }
+        changes = {"added": [], "removed": [], "reloaded": []}
+        
+        for model_name in list(self.models):
+            if model_name not in configured:
+                del self.models[model_name]
+                changes["removed"].append(model_name)
+                
+        for model_name, model_info in configured.items():
+            old_entry = self.models.get(model_name)
+            if old_entry is None:
+                self.models[model_name] = self._new_model_entry(model_info)
+                changes["added"].append(model_name)
+                continue
+                
+            if old_entry["info"] == model_info:
+                continue
+                
+            new_entry = self._new_model_entry(model_info)
+            to_reload = []
+            for version, entry in new_entry["versions"].items():
+                old_version_entry = old_entry["versions"].get(version)
+                if old_version_entry is None:
+                    continue
                     
-                    logger.info(f"Successfully registered model: {model_name} (v{model_info.get('version', 'unknown')})")
-                except Exception as e:
-                    logger.error(f"Error registering model {model_name}: {str(e)}")
-    
-    def get_model(self, model_name):
-        """Get a specific model by name"""
-        if (model_name not in self.models):
-            logger.warning(f"Model {model_name} not found in registry")
-            return None
+                if old_version_entry["info"] != entry["info"] and old_version_entry["instance"] is not None:
+                    to_reload.append(version)
+                # Keep the loaded instance, and its statistics, until the reload swaps it
+                old_version_entry["info"] = entry["info"]
+                new_entry["versions"][version] = old_version_entry
+                
+            self.models[model_name] = new_entry
+            for version in to_reload:
+                changes["reloaded"].append(f"{model_name}:{version}")
+                
+        # Inference pools were built for the old model placement; let them drain
+        # and start new ones on demand
+        if any(changes.values()):
+            with self._pools_lock:
+                old_pools, self._pools = self._pools, {}
+            for pool in old_pools.values():
+                pool.shutdown(wait=False)
+                
+        for change in changes["reloaded"]:
+            model_name, version = change.split(":", 1)
+            self.reload_model(model_name, version=version, background=True)
             
-        return self.models[model_name]["instance"]
-    
-    def get_all_models(self):
-        """Get all registered models with their metadata"""
-        return {name: {"info": info["info"]} for name, info in self.models.items()}
-    
+        logger.info(f"Applied model configuration changes: {changes}")
+        return changes
+        
+    def start_watcher(self, poll_interval=None):
+        """
+        Start a background thread that reloads models when their artifact
+        file or model_config.json changes on disk.
+        
+        Args:
+            poll_interval (float, optional): Seconds between checks; defaults to
+                hot_reload.poll_interval_seconds from the configuration
+        """
+        if self._watcher_thread is not None and self._watcher_thread.is_alive():
+            return
+            
+        if poll_interval is None:
+            poll_interval = self.model_config.get("hot_reload", {}).get("poll_interval_seconds", 10)
+            
+        self._watcher_stop.clear()
+        self._watcher_thread = threading.Thread(
+            target=self._watch,
+            args=(poll_interval,),
+            name="model-registry-watcher",
+            daemon=True
+        )
+        self._watcher_thread.start()
+        logger.info(f"Started model artifact watcher (every {poll_interval}s)")
+        
+    def stop_watcher(self):
+        """Stop the artifact watcher thread"""
+        self._watcher_stop.set()
+        
+    def _watch(self, poll_interval):
+        """Poll artifact and configuration modification times"""
+        while not self._watcher_stop.wait(poll_interval):
+            try:
+                if os.path.exists(self.config_path) and os.path.getmtime(self.config_path) != self._config_mtime:
+                    logger.info("Model configuration changed on disk")
+                    self.reload_config()
+                    
+                for model_name, model_entry in list(self.models.items()):
+                    for version, entry in list(model_entry["versions"].items()):
+                        instance = entry["instance"]
+                        if instance is None or entry["reload_lock"].locked():
+                            continue
+                            
+                        mtime = self._artifact_mtime(instance)
+                        if mtime is not None and mtime != entry["artifact_mtime"]:
+                            logger.info(f"Artifact for model {model_name} (v{version}) changed on disk")
+                            # Remember this version so a failed reload is not retried until the next change
+                            entry["artifact_mtime"] = mtime
+                            self._reload_model(model_name, version)
+            except Exception as e:
+                logger.error(f"Error in model artifact watcher: {str(e)}", exc_info=True)
+                
+    def _submit_shadow(self, model_name, version, data, primary_result):
+        """
+        Score the same input with a shadow version in the background.
+        
+        Shadow work is dropped when too much of it is already pending, so a
+        slow candidate can never back up the serving path.
+        """
+        shadow_config = self.model_config.get("shadow", {})
+        max_pending = shadow_config.get("max_pending", 32)
+        
+        with self._shadow_lock:
+            if self._shadow_pending >= max_pending:
+                logger.warning(f"Dropping shadow prediction for {model_name} (v{version}): {self._shadow_pending} pending")
+                return
+            self._shadow_pending += 1
+            
+            if self._shadow_executor is None:
+                self._shadow_executor = ThreadPoolExecutor(
+                    max_workers=shadow_config.get("workers", 2),
+                    thread_name_prefix="shadow-inference"
+                )
+                
+        self._shadow_executor.submit(self._run_shadow, model_name, version, data, primary_result)
+        
+    def _run_shadow(self, model_name, version, data, primary_result):
+        """
+        Run one shadow prediction and compare it with the primary result.
+        
+        The shadow prediction runs without context so nothing is stored;
+        only its latency and its agreement with the primary result are recorded.
+        """
+        try:
+            entry = self._get_version_entry(model_name, version)
+            if entry is None:
+                return
+                
+            started = time.perf_counter()
+            try:
+                result = self._invoke(model_name, version, data, None)
+            except Exception as e:
+                logger.error(f"Error in shadow prediction with model {model_name} (v{version}): {str(e)}")
+                result = {"error": str(e)}
+            latency_ms = (time.perf_counter() - started) * 1000
+            
+            failed = not isinstance(result, dict) or "error" in result
+            entry["stats"].record(latency_ms, error=failed)
+            
+            if not failed and isinstance(primary_result, dict) and "error" not in primary_result:
+                agreed = self._outcome(result) == self._outcome(primary_result)
+                probability_diff = None
+                if "probability" in result and "probability" in primary_result:
+                    probability_diff = abs(float(result["probability"]) - float(primary_result["probability"]))
+                entry["stats"].record_comparison(agreed, probability_diff)
+        finally:
+            with self._shadow_lock:
+                self._shadow_pending -= 1
+                
+    def _outcome(self, result):
+        """Extract the predicted outcome used to compare two prediction results"""
+        if "predicted_class" in result:
+            return result["predicted_class"]
+        return result.get("prediction")
+        
     def predict(self, model_name, data, context=None):
         """
         Make a prediction using the specified model
         
+        The serving version is chosen by the model's routing policy; under
+        the shadow policy the shadow versions score the same input asynchronously.
+        Models with a "cache" setting answer repeated inputs from a per-version
+        LRU cache. Inference passes admission control first: when the model's
+        queue for the request's priority class is full, an error with
+        "overloaded" and "retry_after" is returned without running the model.
+        Work for a request whose context "deadline" has passed is dropped and
+        counted as cancelled in the version statistics.
+        
         Args:
             model_name (str): Name of the model to use
             data (dict): Input data for prediction
@@ -103,30 +1187,121 @@ class ModelRegistry:
         Returns:
             dict: Prediction results
         """
-        model = self.get_model(model_name)
-        
-        if not model:
+        if model_name not in self.models:
             logger.error(f"Model {model_name} not found for prediction")
             return {"error": f"Model {model_name} not found"}
+            
+        version, shadow_versions = self._route(model_name, context)
+        entry = self._get_version_entry(model_name, version)
         
         try:
-            # Make prediction with context
-            result = model.predict(data, context)
-            logger.info(f"Prediction made with model {model_name}")
+            started = time.perf_counter()
+            
+            # Serve repeated inputs from the version's cache; the patient record is still created
+            cache = entry["cache"] if isinstance(data, dict) else None
+            if cache is not None:
+                cache_key = input_hash(data)
+                generation = entry["reload_count"]
+                cached = cache.get(cache_key, generation)
+                if cached is not None:
+                    if is_expired(context):
+                        entry["stats"].record_cancelled("storage")
+                        return cancelled_result("storage")
+                    cached["timestamp"] = datetime.utcnow().isoformat()
+                    cached["cached"] = True
+                    result = self._invoke_store(model_name, version, data, cached, context)
+                    latency_ms = (time.perf_counter() - started) * 1000
+                    entry["stats"].record(latency_ms)
+                    logger.info(f"Prediction for model {model_name} (v{version}) served from cache in {latency_ms:.1f}ms")
+                    return result
+                    
+            # Make prediction with context, inline or on the model's inference pool
+            result = self.admission.run(model_name, context, lambda: self._invoke(model_name, version, data, context))
+            if isinstance(result, dict) and result.get("overloaded"):
+                return result
+            if isinstance(result, dict) and result.get("cancelled"):
+                entry["stats"].record_cancelled(result.get("cancelled_stage", "inference"))
+                return result
+                
+            latency_ms = (time.perf_counter() - started) * 1000
+            logger.info(f"Prediction made with model {model_name} (v{version}) in {latency_ms:.1f}ms")
             
             # Log the prediction result structure for debugging
             logger.info(f"Prediction result structure: {type(result)}")
             if isinstance(result, dict):
                 logger.info(f"Prediction result keys: {result.keys()}")
+                result["model_version"] = version
+                
+            failed = not isinstance(result, dict) or "error" in result
+            entry["stats"].record(latency_ms, error=failed)
             
+            if cache is not None and not failed:
+                cache.put(cache_key, generation, {
+                    key: value for key, value in result.items() if key not in ("id", "storage_error")
+                })
+                
+            for shadow_version in shadow_versions:
+                self._submit_shadow(model_name, shadow_version, data, result)
+                
             # Return results
             return result
         except Exception as e:
+            entry["stats"].record(0.0, error=True)
             logger.error(f"Error making prediction with model {model_name}: {str(e)}", exc_info=True)
             return {"error": str(e)}
+            
+    def predict_many(self, model_name, records, context=None):
+        """
+        Make predictions for a list of records using the specified model
+        
+        The whole batch is routed to one version and scored with a single
+        model call where the connector supports it. Batches are not sent to
+        shadow versions and do not count towards per-request latency stats.
+        Like predict, the batch passes admission control (as one request).
+        
+        Args:
+            model_name (str): Name of the model to use
+            records (list): Input data dictionaries
+            context (dict, optional): Additional context information such as patient_id, doctor_id
+            
+        Returns:
+            list: One prediction result per record, or a dict with an error
+        """
+        if model_name not in self.models:
+            logger.error(f"Model {model_name} not found for prediction")
+            return {"error": f"Model {model_name} not found"}
+            
+        version, _ = self._route(model_name, context)
+        
+        try:
+            started = time.perf_counter()
+            results = self.admission.run(model_name, context, lambda: self._invoke_many(model_name, version, records, context))
+            if isinstance(results, dict):
+                return results
+                
+            latency_ms = (time.perf_counter() - started) * 1000
+            logger.info(f"Batch of {len(records)} predictions made with model {model_name} (v{version}) in {latency_ms:.1f}ms")
+            
+            for result in results:
+                if isinstance(result, dict):
+                    result["model_version"] = version
+                    
+            return results
+        except Exception as e:
+            logger.error(f"Error making batch prediction with model {model_name}: {str(e)}", exc_info=True)
+            return {"error": str(e)}
 
 # Create a singleton instance of the registry
 model_registry = ModelRegistry()
 
-# Register all models at import time
-model_registry.register_models()
\ No newline at end of file
+# Register all models at import time (connectors are loaded lazily on first use)
+model_registry.register_models()
+
+# Load all models up front if enabled (e.g. in a preforking master, see gunicorn.conf.py)
+preload_config = model_registry.model_config.get("preload", {})
+if preload_config.get("enabled", False):
+    model_registry.preload_models(freeze_gc=preload_config.get("freeze_gc", True))
+
+# Watch model artifacts for changes if enabled in the configuration
+if model_registry.model_config.get("hot_reload", {}).get("watch", False):
+    model_registry.start_watcher()
\ No newline at end of file
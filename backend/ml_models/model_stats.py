@@ -0,0 +1,159 @@
+import threading
+from collections import deque
+from pathlib import Path
+import sys
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from utils.logger import setup_logger
+
+logger = setup_logger("model_stats")
+
+class VersionStats:
+    """
+    Rolling latency and outcome statistics for one version of a model.
+    Used by the model registry to compare versions served side by side.
+    """
+    
+    def __init__(self, window_size=1000):
+        """
+        Initialize empty statistics.
+        
+        Args:
+            window_size (int): Number of most recent latencies kept for percentiles
+        """
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window_size)
+        self.requests = 0
+        self.errors = 0
+        
+        # Requests dropped after their deadline, by the stage they were dropped at
+        self.cancelled = {}
+        
+        # Agreement with the primary version (only filled for shadow versions)
+        self.comparisons = 0
+        self.agreements = 0
+        self._probability_diff_sum = 0.0
+        self._probability_diff_count = 0
+        
+    def record(self, latency_ms, error=False):
+        """
+        Record one prediction.
+        
+        Args:
+            latency_ms (float): Wall clock time of the prediction in milliseconds
+            error (bool): Whether the prediction returned an error
+        """
+        with self._lock:
+            self.requests += 1
+            if error:
+                self.errors += 1
+            else:
+                self._latencies.append(latency_ms)
+                
+    def record_cancelled(self, stage):
+        """
+        Record a request dropped because its deadline passed.
+        
+        Args:
+            stage (str): Where it was dropped, e.g. "queue", "inference" or "storage"
+        """
+        with self._lock:
+            self.cancelled[stage] = self.cancelled.get(stage, 0) + 1
+            
+    def record_comparison(self, agreed, probability_diff=None):
+        """
+        Record how a shadow prediction compared with the primary prediction.
+        
+        Args:
+            agreed (bool): Whether both versions predicted the same outcome
+            probability_diff (float, optional): Absolute difference of the predicted probabilities
+        """
+        with self._lock:
+            self.comparisons += 1
+            if agreed:
+                self.agreements += 1
+            if probability_diff is not None:
+                self._probability_diff_sum += probability_diff
+                self._probability_diff_count += 1
+                
+    def snapshot(self):
+        """
+        Get the current statistics.
+        
+        Returns:
+            dict: Request counts, cancellations, latency percentiles in ms and agreement figures
+        """
+        with self._lock:
+            latencies = np.array(self._latencies, dtype=float)
+            stats = {
+                "requests": self.requests,
+                "errors": self.errors,
+                "cancelled": dict(self.cancelled, total=sum(self.cancelled.values())),
+                "latency_ms": None
+            }
+            
+            if latencies.size:
+                stats["latency_ms"] = {
+                    "mean": round(float(latencies.mean()), 3),
+                    "p50": round(float(np.percentile(latencies, 50)), 3),
+                    "p95": round(float(np.percentile(latencies, 95)), 3),
+                    "p99": round(float(np.percentile(latencies, 99)), 3),
+                    "window": int(latencies.size)
+                }
+                
+            if self.comparisons:
+                stats["agreement"] = {
+                    "comparisons": self.comparisons,
+                    "agreements": self.agreements,
+                    "rate": round(self.agreements / self.comparisons, 4),
+                    "mean_probability_diff": (
+                        round(self._probability_diff_sum / self._probability_diff_count, 6)
+                        if self._probability_diff_count else None
+                    )
+                }
+                
+            return stats
+
+def model_size(model):
+    """
+    Describe the size of a loaded model by its parameter or tree count.
+    
+    Args:
+        model (object): The underlying estimator (Keras model, CatBoost model or sklearn estimator)
+        
+    Returns:
+        dict: Parameter, tree and node counts that apply to the model, or None
+            if its size cannot be determined (e.g. not fitted)
+    """
+    if model is None:
+        return None
+        
+    try:
+        # Keras models
+        if hasattr(model, "count_params"):
+            return {"parameters": int(model.count_params())}
+            
+        # CatBoost models
+        if hasattr(model, "tree_count_") and model.is_fitted():
+            return {"trees": int(model.tree_count_)}
+            
+        # sklearn tree ensembles and single trees
+        estimators = getattr(model, "estimators_", None)
+        if estimators is not None:
+            trees = [getattr(estimator, "tree_", None) for estimator in np.ravel(estimators)]
+            return {
+                "trees": len(trees),
+                "nodes": int(sum(tree.node_count for tree in trees if tree is not None))
+            }
+        if hasattr(model, "tree_"):
+            return {"trees": 1, "nodes": int(model.tree_.node_count)}
+            
+        # Linear sklearn models
+        if hasattr(model, "coef_"):
+            return {"parameters": int(np.size(model.coef_) + np.size(getattr(model, "intercept_", 0)))}
+    except Exception as e:
+        logger.warning(f"Could not determine model size: {str(e)}")
+        
+    return None
@@ -0,0 +1,122 @@
+import copy
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from utils.logger import setup_logger
+
+logger = setup_logger("prediction_cache")
+
+def _tagged_value(value):
+    """Tag a value that is not a JSON type with its type name so it cannot collide with one"""
+    return f"<{type(value).__name__}>{value!r}"
+
+def input_hash(data):
+    """
+    Compute a canonical hash of prediction input data.
+    
+    Values are hashed exactly as given: 25, 25.0, "25" and " 25" are
+    different keys, so an input is only answered from the cache when it is
+    identical to one the model's input validation has already accepted.
+    
+    Args:
+        data (dict): Input data for prediction
+        
+    Returns:
+        str: Hex digest that is independent of key order
+    """
+    canonical = json.dumps(data, sort_keys=True, separators=(",", ":"), default=_tagged_value)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+class PredictionCache:
+    """
+    Bounded LRU cache of prediction results for one model version.
+    
+    Every entry is tagged with the generation of the model instance that
+    produced it; lookups with a different generation are misses, so a
+    reloaded model never serves results of the instance it replaced.
+    """
+    
+    def __init__(self, max_entries=1024, ttl_seconds=600):
+        """
+        Initialize an empty cache.
+        
+        Args:
+            max_entries (int): Largest number of results kept; least recently used ones are evicted
+            ttl_seconds (float): Seconds a result may be served from the cache
+        """
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = float(ttl_seconds)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        
+    def get(self, key, generation):
+        """
+        Look up a cached result.
+        
+        Args:
+            key (str): Input hash
+            generation (int): Generation of the model instance serving the request
+            
+        Returns:
+            dict: A copy of the cached result, or None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry_generation, stored_at, result = entry
+                if entry_generation == generation and time.monotonic() - stored_at < self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return copy.deepcopy(result)
+                del self._entries[key]
+            self.misses += 1
+            return None
+            
+    def put(self, key, generation, result):
+        """
+        Store a prediction result.
+        
+        Args:
+            key (str): Input hash
+            generation (int): Generation of the model instance that produced the result
+            result (dict): Prediction result without per-request fields
+        """
+        with self._lock:
+            self._entries[key] = (generation, time.monotonic(), copy.deepcopy(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+                
+    def clear(self):
+        """Drop every cached result"""
+        with self._lock:
+            self._entries.clear()
+            
+    def stats(self):
+        """
+        Get cache counters.
+        
+        Returns:
+            dict: Size, limits and hit/miss/eviction counts
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None
+            }
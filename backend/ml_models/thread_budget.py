@@ -0,0 +1,285 @@
+import os
+import json
+import inspect
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from utils.logger import setup_logger
+
+logger = setup_logger("thread_budget")
+
+# Environment variables read by the native thread pools when their library loads
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+                   "BLIS_NUM_THREADS", "VECLIB_MAXIMUM_THREADS", "NUMEXPR_NUM_THREADS")
+
+def detect_cpus():
+    """
+    Count the CPUs this process may actually use.
+    
+    Takes the smaller of the CPU affinity mask and the container's cgroup CPU
+    quota, so a container limited to 2 CPUs on a 32 core host counts 2.
+    
+    Returns:
+        int: Usable CPUs (at least 1)
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+        
+    quota = None
+    try:
+        # cgroup v2
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            limit, period = f.read().split()[:2]
+            if limit != "max":
+                quota = int(limit) / int(period)
+    except (OSError, ValueError):
+        try:
+            # cgroup v1
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+                limit = int(f.read())
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+                period = int(f.read())
+            if limit > 0:
+                quota = limit / period
+        except (OSError, ValueError):
+            pass
+            
+    if quota is not None:
+        cpus = min(cpus, max(1, int(quota)))
+    return max(1, cpus)
+
+def limit_model_threads(model, num_threads):
+    """
+    Cap the threads a loaded estimator uses for prediction.
+    
+    Args:
+        model (object): sklearn estimator or CatBoost model
+        num_threads (int): Thread budget of the model
+        
+    Returns:
+        dict: Keyword arguments to pass to the model's predict_proba
+    """
+    if model is None or not num_threads:
+        return {}
+        
+    # CatBoost takes the thread count per prediction call (default: all cores)
+    if type(model).__name__.startswith("CatBoost"):
+        return {"thread_count": int(num_threads)}
+        
+    # sklearn ensembles parallelize prediction over n_jobs
+    if hasattr(model, "n_jobs"):
+        model.n_jobs = int(num_threads)
+    return {}
+
+class ThreadBudget:
+    """
+    Splits the node's CPUs between the processes serving the API and gives
+    every process, and every model in it, an intra-op/inter-op thread budget.
+    
+    Without a budget TensorFlow, the BLAS behind NumPy, OpenMP and CatBoost
+    each size their pools to all cores in every worker process, and the
+    workers oversubscribe the node under concurrent load.
+    """
+    
+    def __init__(self, config_path=None):
+        """
+        Initialize the budget from the "threads" section of model_config.json.
+        
+        Args:
+            config_path (str, optional): Path of model_config.json
+        """
+        self.config_path = config_path or os.path.join(os.path.dirname(__file__), 'model_config.json')
+        self.applied = False
+        self.settings = None
+        self._load_config()
+        
+    def _load_config(self):
+        """Read the thread and executor settings"""
+        try:
+            with open(self.config_path, 'r') as f:
+                model_config = json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading thread configuration: {str(e)}")
+            model_config = {}
+            
+        self.config = model_config.get("threads", {})
+        self.executor_config = model_config.get("executor", {})
+        
+    def _web_workers(self):
+        """Number of web worker processes on this node, from Config"""
+        workers = self.config.get("web_workers")
+        if workers:
+            return int(workers)
+        try:
+            from config import Config
+            return int(getattr(Config, "WEB_WORKERS", 1))
+        except Exception:
+            return 1
+            
+    def compute(self):
+        """
+        Compute the budget for this node.
+        
+        Returns:
+            dict: Detected CPUs, process counts and per-process thread budget
+        """
+        cpus = detect_cpus()
+        usable = max(1, cpus - int(self.config.get("reserve_cpus", 0)))
+        web_workers = self._web_workers()
+        
+        # Inference pool workers run models in their own processes and need CPUs too
+        pool_workers = 0
+        if self.executor_config.get("mode", "inline") == "process":
+            pool_workers = sum(int(pool.get("workers", 1)) for pool in self.executor_config.get("pools", {}).values())
+            
+        processes = web_workers + pool_workers
+        intra_op = max(1, usable // processes)
+        
+        return {
+            "detected_cpus": cpus,
+            "usable_cpus": usable,
+            "web_workers": web_workers,
+            "pool_workers": pool_workers,
+            "intra_op_threads": intra_op,
+            "inter_op_threads": max(1, int(self.config.get("inter_op_threads", 1)))
+        }
+        
+    def model_threads(self, model_name):
+        """
+        Get the thread budget of one model in this process.
+        
+        A model may be capped below the process budget with
+        threads.models.<name>.max_threads.
+        
+        Args:
+            model_name (str): Name of the model
+            
+        Returns:
+            int: Threads the model may use, or None if budgeting is disabled
+        """
+        if not self.config.get("enabled", False):
+            return None
+            
+        settings = self.settings or self.compute()
+        max_threads = self.config.get("models", {}).get(model_name, {}).get("max_threads")
+        if max_threads:
+            return max(1, min(settings["intra_op_threads"], int(max_threads)))
+        return settings["intra_op_threads"]
+        
+    def connector_params(self, model_name, model_class, params):
+        """
+        Add the model's thread budget to its connector parameters.
+        
+        The budget is passed as num_threads to connectors that accept it,
+        unless the configuration already sets num_threads for the model.
+        
+        Args:
+            model_name (str): Name of the model
+            model_class (type): Connector class
+            params (dict): Connector parameters from the configuration
+            
+        Returns:
+            dict: Parameters to instantiate the connector with
+        """
+        threads = self.model_threads(model_name)
+        if threads is None or "num_threads" in params:
+            return params
+            
+        try:
+            accepts_threads = "num_threads" in inspect.signature(model_class.__init__).parameters
+        except (TypeError, ValueError):
+            accepts_threads = False
+            
+        return dict(params, num_threads=threads) if accepts_threads else params
+        
+    def apply(self):
+        """
+        Apply the budget to this process.
+        
+        Sets the environment variables read by OpenMP/BLAS and TensorFlow when
+        they load (inherited by inference pool workers), limits pools that are
+        already loaded through threadpoolctl when it is installed, and
+        configures TensorFlow if it was already imported. Variables set
+        explicitly in the environment are left alone.
+        
+        Returns:
+            dict: The effective settings (see report)
+        """
+        if not self.config.get("enabled", False):
+            logger.info("Thread budgeting disabled")
+            return self.report()
+            
+        self.settings = self.compute()
+        intra_op = self.settings["intra_op_threads"]
+        inter_op = self.settings["inter_op_threads"]
+        
+        for name in THREAD_ENV_VARS:
+            os.environ.setdefault(name, str(intra_op))
+        os.environ.setdefault("TF_NUM_INTRAOP_THREADS", str(intra_op))
+        os.environ.setdefault("TF_NUM_INTEROP_THREADS", str(inter_op))
+        
+        try:
+            from threadpoolctl import threadpool_limits
+            threadpool_limits(limits=int(os.environ["OMP_NUM_THREADS"]))
+        except ImportError:
+            pass
+            
+        if "tensorflow" in sys.modules:
+            tf = sys.modules["tensorflow"]
+            try:
+                tf.config.threading.set_intra_op_parallelism_threads(int(os.environ["TF_NUM_INTRAOP_THREADS"]))
+                tf.config.threading.set_inter_op_parallelism_threads(int(os.environ["TF_NUM_INTEROP_THREADS"]))
+            except RuntimeError:
+                logger.warning("TensorFlow runtime already initialized, its thread settings are unchanged")
+                
+        self.applied = True
+        logger.info(f"Applied thread budget: {self.settings}")
+        return self.report()
+        
+    def report(self):
+        """
+        Get the effective thread settings of this process.
+        
+        Returns:
+            dict: Computed budget, per-model threads, environment and, where
+                available, the native thread pools actually loaded
+        """
+        report = {
+            "pid": os.getpid(),
+            "enabled": self.config.get("enabled", False),
+            "applied": self.applied,
+            "budget": self.settings,
+            "models": {
+                name: self.model_threads(name) for name in self.config.get("models", {})
+            },
+            "environment": {
+                name: os.environ.get(name)
+                for name in THREAD_ENV_VARS + ("TF_NUM_INTRAOP_THREADS", "TF_NUM_INTEROP_THREADS")
+            },
+            "native_pools": None,
+            "tensorflow": None
+        }
+        
+        try:
+            from threadpoolctl import threadpool_info
+            report["native_pools"] = [
+                {"library": pool.get("internal_api"), "prefix": pool.get("prefix"), "num_threads": pool.get("num_threads")}
+                for pool in threadpool_info()
+            ]
+        except ImportError:
+            pass
+            
+        if "tensorflow" in sys.modules:
+            tf = sys.modules["tensorflow"]
+            report["tensorflow"] = {
+                "intra_op_threads": tf.config.threading.get_intra_op_parallelism_threads(),
+                "inter_op_threads": tf.config.threading.get_inter_op_parallelism_threads()
+            }
+            
+        return report
+
+# Create a singleton instance of the thread budget
+thread_budget = ThreadBudget()
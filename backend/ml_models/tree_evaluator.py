@@ -0,0 +1,267 @@
+import os
+import json
+import tempfile
+import numpy as np
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from utils.logger import setup_logger
+
+logger = setup_logger("tree_evaluator")
+
+class ObliviousTreeEvaluator:
+    """
+    Evaluates a binary CatBoost classifier from flat NumPy arrays.
+    
+    Every tree of a CatBoost model is oblivious: all nodes at one depth test
+    the same feature against the same border, so a row's leaf is the bit
+    pattern of its depth comparisons. All trees are scored at once with one
+    vectorized comparison and one gather of leaf values.
+    """
+    
+    def __init__(self, split_features, split_borders, leaf_values, scale, bias, nan_as):
+        """
+        Args:
+            split_features (numpy.ndarray): (trees, depth) feature index of each level
+            split_borders (numpy.ndarray): (trees, depth) float32 border of each level;
+                padded levels of shallower trees have border +inf
+            leaf_values (numpy.ndarray): (trees, 2 ** depth) leaf values
+            scale (float): Scale applied to the summed leaf values
+            bias (float): Bias added to the scaled sum
+            nan_as (numpy.ndarray): Per feature value substituted for NaN
+        """
+        self.split_features = split_features
+        self.split_borders = split_borders
+        self.leaf_values = leaf_values
+        self.scale = scale
+        self.bias = bias
+        self.nan_as = nan_as
+        self._tree_index = np.arange(leaf_values.shape[0])
+        self._bit_weights = 1 << np.arange(split_features.shape[1])
+        
+    @classmethod
+    def from_catboost(cls, model):
+        """
+        Flatten a fitted CatBoostClassifier through its JSON export.
+        
+        Args:
+            model (catboost.CatBoostClassifier): Binary classifier on float features only
+            
+        Returns:
+            ObliviousTreeEvaluator: The compiled evaluator
+        """
+        return cls.from_export(export_catboost(model))
+        
+    @classmethod
+    def from_export(cls, exported):
+        """
+        Flatten the JSON export of a CatBoostClassifier.
+        
+        Args:
+            exported (dict): The model as returned by export_catboost
+            
+        Returns:
+            ObliviousTreeEvaluator: The compiled evaluator
+        """
+        features_info = exported["features_info"]
+        if set(features_info) - {"float_features"}:
+            raise ValueError("Only models on float features can be compiled")
+            
+        trees = exported["oblivious_trees"]
+        depth = max(len(tree["splits"]) for tree in trees)
+        split_features = np.zeros((len(trees), depth), dtype=np.intp)
+        split_borders = np.full((len(trees), depth), np.inf, dtype=np.float32)
+        leaf_values = np.zeros((len(trees), 2 ** depth), dtype=np.float64)
+        
+        for t, tree in enumerate(trees):
+            if len(tree["leaf_values"]) != 2 ** len(tree["splits"]):
+                raise ValueError("Only binary classifiers can be compiled")
+            for level, split in enumerate(tree["splits"]):
+                if split.get("split_type", "FloatFeature") != "FloatFeature":
+                    raise ValueError(f"Unsupported split type {split['split_type']}")
+                split_features[t, level] = split["float_feature_index"]
+                split_borders[t, level] = split["border"]
+            leaf_values[t, :len(tree["leaf_values"])] = tree["leaf_values"]
+            
+        # CatBoost treats NaN as below every border ("Min") or above every border ("Max")
+        float_features = features_info.get("float_features", [])
+        nan_as = np.zeros(max((f["flat_feature_index"] for f in float_features), default=-1) + 1, dtype=np.float32)
+        for feature in float_features:
+            treatment = feature.get("nan_value_treatment", "AsIs")
+            nan_as[feature["flat_feature_index"]] = np.inf if treatment == "AsTrue" else -np.inf
+            
+        scale, bias = exported.get("scale_and_bias", [1.0, [0.0]])
+        bias = bias[0] if isinstance(bias, list) else bias
+        return cls(split_features, split_borders, leaf_values, float(scale), float(bias), nan_as)
+        
+    def leaf_indices(self, X):
+        """Index of the leaf each row reaches in each tree, as an (n, trees) matrix"""
+        # CatBoost compares float32 features against float32 borders
+        X = np.asarray(X, dtype=np.float32)
+        if np.isnan(X).any():
+            X = np.where(np.isnan(X), self.nan_as[:X.shape[1]], X)
+            
+        bits = X[:, self.split_features] > self.split_borders
+        return bits.astype(np.intp) @ self._bit_weights
+        
+    def raw_score(self, X):
+        """Log-odds of the positive class for an (n, features) matrix"""
+        leaves = self.leaf_indices(X)
+        return self.leaf_values[self._tree_index, leaves].sum(axis=1) * self.scale + self.bias
+        
+    def predict_proba(self, X):
+        """Class probabilities for an (n, features) matrix, like predict_proba of the model"""
+        positive = 1.0 / (1.0 + np.exp(-self.raw_score(X)))
+        return np.column_stack([1.0 - positive, positive])
+
+class ForestEvaluator:
+    """
+    Evaluates an sklearn decision tree or random forest classifier from the
+    concatenated node arrays of all its trees.
+    
+    All rows walk all trees together, one level per step; rows that reached
+    a leaf stay there, so the walk takes as many steps as the deepest tree.
+    Missing (NaN) values go to the side sklearn sends them to at each split.
+    """
+    
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth, missing_left=None):
+        """
+        Args:
+            feature (numpy.ndarray): Split feature per node (0 for leaves)
+            threshold (numpy.ndarray): Split threshold per node
+            left (numpy.ndarray): Left child per node (the node itself for leaves)
+            right (numpy.ndarray): Right child per node (the node itself for leaves)
+            value (numpy.ndarray): (nodes, classes) class probabilities per node
+            roots (numpy.ndarray): Index of the root node of each tree
+            max_depth (int): Depth of the deepest tree
+            missing_left (numpy.ndarray, optional): Whether NaN goes to the left
+                child per node; NaN goes right everywhere if not given
+        """
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.missing_left = missing_left if missing_left is not None else np.zeros(feature.size, dtype=bool)
+        
+    @classmethod
+    def from_sklearn(cls, model):
+        """
+        Flatten a fitted sklearn DecisionTreeClassifier, RandomForestClassifier
+        or ExtraTreesClassifier.
+        
+        Returns:
+            ForestEvaluator: The compiled evaluator
+        """
+        estimators = getattr(model, "estimators_", None)
+        if estimators is None:
+            estimators = [model]
+            
+        features, thresholds, lefts, rights, values, roots, missing_lefts = [], [], [], [], [], [], []
+        offset, max_depth = 0, 0
+        for estimator in estimators:
+            tree = estimator.tree_
+            nodes = np.arange(tree.node_count)
+            is_leaf = tree.children_left == -1
+            
+            # Leaves point to themselves so extra walk steps keep rows in place
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(tree.threshold)
+            lefts.append(np.where(is_leaf, nodes, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, nodes, tree.children_right) + offset)
+            value = tree.value[:, 0, :].astype(np.float64)
+            values.append(value / value.sum(axis=1, keepdims=True))
+            
+            # Recorded by sklearn >= 1.3, which sends NaN to the child with more samples
+            # when the feature had no missing values in training
+            missing_left = getattr(tree, "missing_go_to_left", None)
+            missing_lefts.append(np.zeros(tree.node_count, dtype=bool) if missing_left is None else missing_left.astype(bool))
+            roots.append(offset)
+            offset += tree.node_count
+            max_depth = max(max_depth, tree.max_depth)
+            
+        return cls(
+            np.concatenate(features).astype(np.intp),
+            np.concatenate(thresholds),
+            np.concatenate(lefts).astype(np.intp),
+            np.concatenate(rights).astype(np.intp),
+            np.concatenate(values),
+            np.array(roots, dtype=np.intp),
+            max_depth,
+            np.concatenate(missing_lefts)
+        )
+        
+    def predict_proba(self, X):
+        """Class probabilities for an (n, features) matrix, like predict_proba of the model"""
+        # sklearn casts inputs to float32 before comparing them with the thresholds
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        rows = np.arange(X.shape[0])[:, np.newaxis]
+        nodes = np.broadcast_to(self.roots, (X.shape[0], self.roots.size)).copy()
+        
+        for _ in range(self.max_depth):
+            values = X[rows, self.feature[nodes]]
+            go_left = np.where(np.isnan(values), self.missing_left[nodes], values <= self.threshold[nodes])
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+            
+        return self.value[nodes].mean(axis=1)
+
+def export_catboost(model):
+    """
+    Export a fitted CatBoost model to its JSON description.
+    
+    Args:
+        model (catboost.CatBoost): The model
+        
+    Returns:
+        dict: The parsed JSON export, with "oblivious_trees", "features_info"
+            and "scale_and_bias"
+    """
+    handle, path = tempfile.mkstemp(suffix=".json")
+    os.close(handle)
+    try:
+        model.save_model(path, format="json")
+        with open(path) as f:
+            return json.load(f)
+    finally:
+        os.remove(path)
+
+def compile_tree_model(model):
+    """
+    Build an array-backed evaluator for a fitted tree ensemble.
+    
+    Args:
+        model (object): CatBoostClassifier, or an sklearn decision tree / random
+            forest / extra trees classifier
+            
+    Returns:
+        object: Evaluator with a predict_proba(X) method
+        
+    Raises:
+        ValueError: If the model type or its structure is not supported
+    """
+    if type(model).__name__ == "CatBoostClassifier":
+        return ObliviousTreeEvaluator.from_catboost(model)
+    if hasattr(model, "tree_") or hasattr(model, "estimators_"):
+        estimators = getattr(model, "estimators_", [model])
+        if all(hasattr(estimator, "tree_") for estimator in estimators) and hasattr(model, "classes_"):
+            return ForestEvaluator.from_sklearn(model)
+    raise ValueError(f"Cannot compile model of type {type(model).__name__}")
+
+def check_parity(model, evaluator, X, tolerance=1e-9):
+    """
+    Compare a compiled evaluator with the model's own predict_proba.
+    
+    Args:
+        model (object): The original model
+        evaluator (object): Its compiled evaluator
+        X (numpy.ndarray): Rows to score
+        tolerance (float): Largest allowed absolute probability difference
+        
+    Returns:
+        tuple: (passed, max absolute difference)
+    """
+    difference = float(np.abs(np.asarray(model.predict_proba(X)) - evaluator.predict_proba(X)).max())
+    return difference <= tolerance, difference
@@ -0,0 +1,434 @@
+import math
+import numpy as np
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from utils.logger import setup_logger
+from ml_models.tree_evaluator import ObliviousTreeEvaluator, export_catboost
+
+logger = setup_logger("tree_explainer")
+
+def _shapley_weights(slots):
+    """Shapley weight of a coalition of s other players, for s = 0 .. slots - 1"""
+    return [math.factorial(s) * math.factorial(slots - 1 - s) / math.factorial(slots) for s in range(slots)]
+
+def _path_contributions(values, covers, taken):
+    """
+    Exact Shapley values of the features on root-to-leaf paths (TreeSHAP).
+    
+    With the path-dependent feature perturbation of TreeSHAP, a leaf adds
+    value * prod(taken[f] if f is known else covers[f]) over the distinct
+    features f on its path to the expected output of a tree. Each leaf is a
+    product game whose Shapley values follow from the polynomial
+    prod(covers[f] + taken[f] * t): the weighted coefficients of the
+    polynomial without feature i, times value * (taken[i] - covers[i]).
+    Unused slots (covers 1, taken True) are null players with value 0.
+    
+    Args:
+        values (numpy.ndarray): Leaf values, broadcastable to the leading dimensions
+        covers (numpy.ndarray): (..., slots) fraction of the training cover that
+            follows the path at the splits on each feature
+        taken (numpy.ndarray): (..., slots) whether the row follows the path at
+            every split on each feature
+            
+    Returns:
+        numpy.ndarray: (..., slots) contribution of each path feature
+    """
+    covers, taken = np.broadcast_arrays(covers, taken)
+    slots = covers.shape[-1]
+    weights = _shapley_weights(slots)
+    taken_values = taken.astype(np.float64)
+    
+    # Coefficients of prod(covers[f] + taken[f] * t), lowest degree first
+    coefficients = [np.ones(covers.shape[:-1])] + [np.zeros(covers.shape[:-1]) for _ in range(slots)]
+    for f in range(slots):
+        cover, step = covers[..., f], taken_values[..., f]
+        coefficients = [coefficients[0] * cover] + [
+            coefficients[s] * cover + coefficients[s - 1] * step for s in range(1, slots + 1)
+        ]
+        
+    # Where the row leaves the path at feature i, the polynomial without i is the full one divided by covers[i]
+    left_total = weights[0] * coefficients[0]
+    for s in range(1, slots):
+        left_total += weights[s] * coefficients[s]
+        
+    contributions = np.empty(covers.shape)
+    for i in range(slots):
+        cover, followed = covers[..., i], taken[..., i]
+        
+        # Where it follows the path, divide the factor (cover + t) back out
+        quotient = coefficients[slots]
+        followed_sum = weights[slots - 1] * quotient
+        for s in range(slots - 1, 0, -1):
+            quotient = coefficients[s] - cover * quotient
+            followed_sum += weights[s - 1] * quotient
+            
+        # A leaf with cover 0 where the row leaves the path adds nothing
+        with np.errstate(divide="ignore", invalid="ignore"):
+            weighted = np.where(followed, followed_sum, np.where(cover > 0, left_total / cover, 0.0))
+        contributions[..., i] = values * (taken_values[..., i] - cover) * weighted
+    return contributions
+
+class ObliviousTreeExplainer:
+    """
+    Exact per-feature contributions (TreeSHAP) to the log-odds of a binary
+    CatBoost classifier.
+    
+    An oblivious tree sends every row with the same split outcomes to the
+    same leaf, and the contributions of a row to one tree depend on nothing
+    but those outcomes. They are computed once per tree and leaf when the
+    explainer is built, so explaining a batch is one gather of the rows'
+    leaves, like scoring it. The contributions and the expected value add up
+    to the model's raw score and match CatBoost's ShapValues.
+    """
+    
+    # Trees deeper than this take too long to tabulate (4 ** depth per tree)
+    MAX_DEPTH = 8
+    
+    # What the contributions add up to, reported with them as contribution_scale
+    contribution_scale = "log_odds"
+    
+    def __init__(self, evaluator, contributions, slot_features, expected_value):
+        """
+        Args:
+            evaluator (ObliviousTreeEvaluator): Finds the leaf of each row in each tree
+            contributions (numpy.ndarray): (trees, leaves, depth) scaled contribution
+                of the feature split on at each level, for rows reaching each leaf
+            slot_features (numpy.ndarray): (trees, depth) feature of each level
+            expected_value (float): Raw score of the model before any feature is known
+        """
+        self.evaluator = evaluator
+        self.expected_value = expected_value
+        self.n_features = evaluator.nan_as.size
+        
+        # One table row per (tree, leaf), gathered by tree * leaves + leaf
+        trees, leaves, depth = contributions.shape
+        self.contributions = contributions.reshape(trees * leaves, depth)
+        self._leaf_base = np.arange(trees) * leaves
+        
+        # Adds up the (trees * depth) slot contributions of a row by feature with one product
+        slot_features = slot_features.reshape(-1)
+        self._slot_matrix = np.zeros((slot_features.size, self.n_features))
+        self._slot_matrix[np.arange(slot_features.size), slot_features] = 1.0
+        
+    @classmethod
+    def from_catboost(cls, model, chunk_size=16):
+        """
+        Tabulate the contributions of a fitted CatBoostClassifier from its JSON export.
+        
+        Args:
+            model (catboost.CatBoostClassifier): Binary classifier on float features only
+            chunk_size (int): Trees tabulated at once
+            
+        Returns:
+            ObliviousTreeExplainer: The explainer
+        """
+        exported = export_catboost(model)
+        evaluator = ObliviousTreeEvaluator.from_export(exported)
+        trees, depth = evaluator.split_features.shape
+        if depth > cls.MAX_DEPTH:
+            raise ValueError(f"Trees of depth {depth} are too deep to explain")
+            
+        leaves = 2 ** depth
+        leaf_weights = np.zeros((trees, leaves))
+        for t, tree in enumerate(exported["oblivious_trees"]):
+            leaf_weights[t, :len(tree["leaf_weights"])] = tree["leaf_weights"]
+            
+        # Levels added to pad shallower trees never split and carry no feature
+        padded = np.isinf(evaluator.split_borders)
+        features = np.where(padded, -1, evaluator.split_features)
+        
+        # Cover of the node a leaf's path passes at each level; the last split is the root
+        bits = (np.arange(leaves)[:, np.newaxis] >> np.arange(depth)) & 1
+        node_covers = np.stack([
+            leaf_weights.reshape(trees, leaves >> level, 1 << level).sum(axis=2)[:, np.arange(leaves) >> level]
+            for level in range(depth + 1)
+        ], axis=2)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratios = np.where(node_covers[:, :, 1:] > 0, node_covers[:, :, :-1] / node_covers[:, :, 1:], 0.0)
+        ratios = np.where(padded[:, np.newaxis, :], 1.0, ratios)
+        
+        # Levels splitting on a feature already split on higher up share the slot of its first level
+        first_level = np.argmax(features[:, :, np.newaxis] == features[:, np.newaxis, :], axis=2)
+        slot_levels = (first_level == np.arange(depth)) & ~padded
+        slot_features = np.where(slot_levels, features, 0)
+        
+        contributions = np.zeros((trees, leaves, depth))
+        expected_value = 0.0
+        for start in range(0, trees, chunk_size):
+            chunk = slice(start, min(start + chunk_size, trees))
+            count = chunk.stop - chunk.start
+            chunk_trees = np.arange(count)
+            
+            # covers: (tree, leaf, slot); taken: (tree, leaf reached by the row, leaf, slot)
+            covers = np.ones((count, leaves, depth))
+            taken = np.ones((count, leaves, leaves, depth), dtype=bool)
+            for level in range(depth):
+                slot = first_level[chunk, level]
+                same_side = bits[:, np.newaxis, level] == bits[np.newaxis, :, level]
+                same_side = same_side | padded[chunk, level][:, np.newaxis, np.newaxis]
+                covers[chunk_trees, :, slot] *= ratios[chunk, :, level]
+                taken[chunk_trees, :, :, slot] &= same_side
+                
+            values = evaluator.leaf_values[chunk][:, np.newaxis, :]
+            leaf_contributions = _path_contributions(values, covers[:, np.newaxis], taken)
+            contributions[chunk] = leaf_contributions.sum(axis=2) * slot_levels[chunk][:, np.newaxis, :]
+            expected_value += float((evaluator.leaf_values[chunk] * covers.prod(axis=2)).sum())
+            
+        return cls(
+            evaluator,
+            contributions * evaluator.scale,
+            slot_features,
+            expected_value * evaluator.scale + evaluator.bias
+        )
+        
+    def explain(self, X):
+        """
+        Contribution of each feature to the log-odds of the positive class.
+        
+        Args:
+            X (numpy.ndarray): (n, features) rows
+            
+        Returns:
+            numpy.ndarray: (n, features) contributions; each row adds up to the
+                raw score minus expected_value
+        """
+        leaves = self.evaluator.leaf_indices(X)
+        slot_contributions = np.take(self.contributions, self._leaf_base + leaves, axis=0)
+        return slot_contributions.reshape(leaves.shape[0], -1) @ self._slot_matrix
+
+class ForestExplainer:
+    """
+    Exact per-feature contributions (TreeSHAP) to the positive class probability
+    of an sklearn decision tree or random forest classifier.
+    
+    The root-to-leaf paths of all trees are flattened once into (leaf,
+    feature) pairs: each distinct feature on a path, with the interval of
+    values that follows the path and whether a missing (NaN) value follows
+    it, as sklearn routes missing values. A leaf's contributions to a row depend only
+    on which of its pairs the row follows, so they are tabulated per leaf for
+    every such pattern, and explaining a batch is one gather per pair.
+    """
+    
+    # Largest contribution table built, in entries
+    MAX_TABLE_ENTRIES = 2 ** 22
+    
+    # What the contributions add up to, reported with them as contribution_scale
+    contribution_scale = "probability"
+    
+    def __init__(self, pairs, table, expected_value, n_features):
+        """
+        Args:
+            pairs (dict): Per (leaf, feature) pair, ordered by leaf: "feature",
+                "lower" and "upper" (the path is followed for values in
+                (lower, upper]), "nan_follows" (whether NaN follows the path),
+                "bit" (its bit in the leaf's pattern) and
+                "leaf"; per leaf with pairs, "leaf_starts" (its first pair),
+                "table_offsets" and "lengths" (its number of pairs)
+            table (numpy.ndarray): Flat contributions; the contribution of pair
+                s of leaf i for pattern p is at table_offsets[i] + p * lengths[i] + s
+            expected_value (float): Probability before any feature is known
+            n_features (int): Number of input features
+        """
+        self.table = table
+        self.expected_value = expected_value
+        self.n_features = n_features
+        
+        self._features = pairs["feature"]
+        self._lower = pairs["lower"]
+        self._upper = pairs["upper"]
+        self._nan_follows = pairs["nan_follows"]
+        self._bits = pairs["bit"]
+        self._leaf_starts = pairs["leaf_starts"]
+        
+        # Pairs reordered by feature, so contributions add up over contiguous columns
+        by_feature = np.argsort(self._features, kind="stable")
+        leaves = pairs["leaf"][by_feature]
+        slots = np.log2(self._bits[by_feature]).astype(np.intp)
+        self._gather_leaves = leaves
+        self._gather_base = pairs["table_offsets"][leaves] + slots
+        self._gather_lengths = pairs["lengths"][leaves]
+        sorted_features = self._features[by_feature]
+        self._feature_starts = np.flatnonzero(np.r_[True, sorted_features[1:] != sorted_features[:-1]])
+        self._explained_features = sorted_features[self._feature_starts]
+        
+    @classmethod
+    def from_sklearn(cls, model):
+        """
+        Flatten the paths of a fitted binary sklearn DecisionTreeClassifier,
+        RandomForestClassifier or ExtraTreesClassifier.
+        
+        Returns:
+            ForestExplainer: The explainer
+        """
+        if len(model.classes_) != 2:
+            raise ValueError("Only binary classifiers can be explained")
+            
+        estimators = getattr(model, "estimators_", None)
+        if estimators is None:
+            estimators = [model]
+            
+        paths = []
+        for estimator in estimators:
+            tree = estimator.tree_
+            value = tree.value[:, 0, :].astype(np.float64)
+            positive = value[:, 1] / value.sum(axis=1) / len(estimators)
+            cover = tree.weighted_n_node_samples
+            
+            # Recorded by sklearn >= 1.3; NaN goes right everywhere otherwise (as in ForestEvaluator)
+            missing_left = getattr(tree, "missing_go_to_left", None)
+            
+            # Depth-first walk keeping, per feature, the interval, cover fraction and NaN routing of the path
+            stack = [(0, {})]
+            while stack:
+                node, constraints = stack.pop()
+                if tree.children_left[node] == -1:
+                    paths.append((positive[node], constraints))
+                    continue
+                    
+                feature, threshold = tree.feature[node], tree.threshold[node]
+                lower, upper, fraction, nan_follows = constraints.get(feature, (-np.inf, np.inf, 1.0, True))
+                nan_left = missing_left is not None and bool(missing_left[node])
+                for child, bounds, nan_goes in (
+                    (tree.children_left[node], (lower, min(upper, threshold)), nan_left),
+                    (tree.children_right[node], (max(lower, threshold), upper), not nan_left)
+                ):
+                    child_fraction = fraction * cover[child] / cover[node]
+                    stack.append((child, {**constraints, feature: bounds + (child_fraction, nan_follows and nan_goes)}))
+                    
+        # A leaf whose path splits on nothing (a tree that is a single leaf) only adds to the expected value
+        expected_value = float(sum(
+            value * np.prod([c[2] for c in constraints.values()])
+            for value, constraints in paths
+        ))
+        paths = [(value, constraints) for value, constraints in paths if constraints]
+        lengths = np.array([len(constraints) for _, constraints in paths], dtype=np.intp)
+        table_sizes = (2 ** lengths) * lengths
+        if table_sizes.sum() > cls.MAX_TABLE_ENTRIES:
+            raise ValueError(f"Paths are too long to explain ({table_sizes.sum()} table entries)")
+            
+        pairs = {
+            "leaf": np.repeat(np.arange(len(paths)), lengths),
+            "feature": np.array([feature for _, constraints in paths for feature in constraints], dtype=np.intp),
+            "lower": np.array([c[0] for _, constraints in paths for c in constraints.values()], dtype=np.float64),
+            "upper": np.array([c[1] for _, constraints in paths for c in constraints.values()], dtype=np.float64),
+            "nan_follows": np.array([c[3] for _, constraints in paths for c in constraints.values()], dtype=bool),
+            "bit": np.concatenate([1 << np.arange(length) for length in lengths]) if paths else np.zeros(0, dtype=np.intp),
+            "leaf_starts": np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype(np.intp),
+            "table_offsets": np.concatenate([[0], np.cumsum(table_sizes)[:-1]]).astype(np.intp),
+            "lengths": lengths
+        }
+        covers = [np.array([c[2] for c in constraints.values()]) for _, constraints in paths]
+        values = np.array([value for value, _ in paths])
+        
+        # Tabulate the leaves with paths of each length over all their follow patterns
+        table = np.zeros(int(table_sizes.sum()))
+        for length in np.unique(lengths).tolist():
+            leaves = np.flatnonzero(lengths == length)
+            patterns = ((np.arange(2 ** length)[:, np.newaxis] >> np.arange(length)) & 1).astype(bool)
+            contributions = _path_contributions(
+                values[leaves, np.newaxis],
+                np.stack([covers[leaf] for leaf in leaves])[:, np.newaxis, :],
+                patterns[np.newaxis]
+            )
+            positions = pairs["table_offsets"][leaves, np.newaxis] + np.arange(2 ** length * length)
+            table[positions] = contributions.reshape(len(leaves), -1)
+            
+        return cls(pairs, table, expected_value, model.n_features_in_)
+        
+    def explain(self, X):
+        """
+        Contribution of each feature to the positive class probability.
+        
+        Args:
+            X (numpy.ndarray): (n, features) rows
+            
+        Returns:
+            numpy.ndarray: (n, features) contributions; each row adds up to the
+                probability minus expected_value
+        """
+        # sklearn casts inputs to float32 before comparing them with the thresholds
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        explained = np.zeros((X.shape[0], self.n_features))
+        if not self._features.size:
+            return explained
+            
+        values = X[:, self._features]
+        followed = np.where(np.isnan(values), self._nan_follows, (values > self._lower) & (values <= self._upper))
+        patterns = np.add.reduceat(followed * self._bits, self._leaf_starts, axis=1)
+        positions = self._gather_base + patterns[:, self._gather_leaves] * self._gather_lengths
+        contributions = self.table[positions]
+        explained[:, self._explained_features] = np.add.reduceat(contributions, self._feature_starts, axis=1)
+        return explained
+
+def build_tree_explainer(model):
+    """
+    Build the TreeSHAP explainer of a fitted tree ensemble.
+    
+    Args:
+        model (object): CatBoostClassifier, or an sklearn decision tree / random
+            forest / extra trees classifier
+            
+    Returns:
+        object: Explainer with an explain(X) method and an expected_value
+        
+    Raises:
+        ValueError: If the model type or its structure is not supported
+    """
+    if type(model).__name__ == "CatBoostClassifier":
+        return ObliviousTreeExplainer.from_catboost(model)
+    if hasattr(model, "tree_") or hasattr(model, "estimators_"):
+        estimators = getattr(model, "estimators_", [model])
+        if all(hasattr(estimator, "tree_") for estimator in estimators) and hasattr(model, "classes_"):
+            return ForestExplainer.from_sklearn(model)
+    raise ValueError(f"Cannot explain model of type {type(model).__name__}")
+
+def check_explainer(model, explainer, X, tolerance=1e-9):
+    """
+    Check that an explainer's contributions and expected value add up to the
+    model's output: the raw score of CatBoost models, predict_proba of sklearn
+    models. The contributions themselves are compared with CatBoost's
+    ShapValues and with brute-force Shapley values in tests/.
+    
+    Args:
+        model (object): The original model
+        explainer (object): Its explainer
+        X (numpy.ndarray): Rows to explain
+        tolerance (float): Largest allowed absolute difference
+        
+    Returns:
+        tuple: (passed, max absolute difference)
+    """
+    explained = explainer.explain(X).sum(axis=1) + explainer.expected_value
+    if type(model).__name__ == "CatBoostClassifier":
+        expected = np.asarray(model.predict(X, prediction_type="RawFormulaVal"))
+    else:
+        expected = np.asarray(model.predict_proba(X))[:, 1]
+    difference = float(np.abs(expected - explained).max())
+    return difference <= tolerance, difference
+
+def describe_contributions(feature_names, row, contributions):
+    """
+    List the contributions of one explained row for a prediction result.
+    
+    Args:
+        feature_names (list): Name of each model feature
+        row (numpy.ndarray): The row's feature values
+        contributions (numpy.ndarray): The row's contributions from explain
+        
+    Returns:
+        list: {"feature", "value", "contribution"} per feature, largest absolute
+            contribution first
+    """
+    values = np.asarray(row, dtype=np.float64).tolist()
+    contributions = np.asarray(contributions, dtype=np.float64).tolist()
+    order = sorted(range(len(contributions)), key=lambda index: -abs(contributions[index]))
+    return [
+        {
+            "feature": feature_names[index],
+            "value": values[index],
+            "contribution": contributions[index]
+        }
+        for index in order
+    ]
@@ -0,0 +1,242 @@
+import numpy as np
+from operator import itemgetter
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from utils.logger import setup_logger
+
+logger = setup_logger("validation")
+
+# Sections of a connector's features_info, in the order their fields are checked
+SECTIONS = ("categorical", "binary", "continuous")
+
+# Types whose float() conversion NumPy reproduces exactly, so whole columns convert at once
+NUMERIC_TYPES = frozenset((int, float, bool))
+
+_MISSING = object()
+
+class SchemaValidator:
+    """
+    Input validation compiled once from a tabular connector's features_info.
+    
+    Categorical and binary fields become membership checks against their
+    valid values, continuous fields become float conversions with a range
+    check. Error messages are built when the validator is compiled, not per
+    request, and match what the connectors have always returned.
+    
+    Errors are structured: one dict per failing field with its "field", a
+    "code" (missing, not_allowed, not_a_number, out_of_range, or not_an_object
+    for records that are not dicts) and a "message".
+    """
+    
+    def __init__(self, features_info):
+        """
+        Compile the checks of a schema.
+        
+        Args:
+            features_info (dict): Sections "categorical" and "binary" mapping
+                fields to their valid values, and "continuous" mapping fields
+                to {"min": ..., "max": ...}
+        """
+        self.checks = []
+        for section in SECTIONS:
+            for field, spec in features_info.get(section, {}).items():
+                if section == "continuous":
+                    self.checks.append({
+                        "field": field,
+                        "kind": "range",
+                        "min": spec["min"],
+                        "max": spec["max"],
+                        "range_message": f"{field} must be between {spec['min']} and {spec['max']}",
+                        "number_message": f"{field} must be a number"
+                    })
+                else:
+                    self.checks.append({
+                        "field": field,
+                        "kind": "enum",
+                        "values": list(spec),
+                        "message": f"{field} must be one of {spec}"
+                    })
+        self.fields = [check["field"] for check in self.checks]
+        
+    def validate(self, record):
+        """
+        Validate one record.
+        
+        Args:
+            record (dict): Input data
+            
+        Returns:
+            list: Field errors, empty if the record is valid
+        """
+        if not isinstance(record, dict):
+            return [{"field": None, "code": "not_an_object", "message": "Record must be an object"}]
+            
+        errors = []
+        for check in self.checks:
+            field = check["field"]
+            if field not in record:
+                errors.append({"field": field, "code": "missing", "message": f"{field} is required"})
+                continue
+                
+            value = record[field]
+            if check["kind"] == "enum":
+                if value not in check["values"]:
+                    errors.append({"field": field, "code": "not_allowed", "message": check["message"]})
+                continue
+                
+            try:
+                number = float(value)
+            except (ValueError, TypeError, OverflowError):
+                errors.append({"field": field, "code": "not_a_number", "message": check["number_message"]})
+                continue
+            if number < check["min"] or number > check["max"]:
+                errors.append({"field": field, "code": "out_of_range", "message": check["range_message"]})
+        return errors
+        
+    def validate_batch(self, data):
+        """
+        Validate many records at once, one field column at a time.
+        
+        Continuous columns whose values are all plain numbers are converted
+        and range-checked as NumPy arrays.
+        
+        Args:
+            data: A list of record dicts, or columns: a dict (or DataFrame)
+                mapping each field to a sequence of values
+                
+        Returns:
+            list: Field errors of each row, in order (empty lists for valid rows)
+        """
+        if isinstance(data, list):
+            row_errors = [[] for _ in data]
+            positions = [position for position, record in enumerate(data) if isinstance(record, dict)]
+            records = [data[position] for position in positions]
+            for position in set(range(len(data))) - set(positions):
+                row_errors[position] = self.validate(data[position])
+            columns = self._columns(records)
+            count = len(records)
+        else:
+            count = len(data[next(iter(data.keys()))]) if len(data.keys()) else 0
+            columns = {
+                field: list(data[field]) if field in data else [_MISSING] * count
+                for field in self.fields
+            }
+            row_errors = [[] for _ in range(count)]
+            positions = list(range(count))
+            
+        for check in self.checks:
+            field = check["field"]
+            values = columns[field]
+            if values.count(_MISSING):
+                missing = np.fromiter((value is _MISSING for value in values), dtype=bool, count=count)
+            else:
+                missing = np.zeros(count, dtype=bool)
+                
+            if check["kind"] == "enum":
+                allowed = check["values"]
+                if not missing.any() and self._all_allowed(values, allowed):
+                    continue
+                failed = np.fromiter(
+                    (value is not _MISSING and value not in allowed for value in values),
+                    dtype=bool, count=count
+                )
+                codes = {"not_allowed": (failed, check["message"])}
+            else:
+                numbers, not_number = self._to_numbers(values, missing)
+                with np.errstate(invalid="ignore"):
+                    out_of_range = ~missing & ~not_number & ((numbers < check["min"]) | (numbers > check["max"]))
+                codes = {
+                    "not_a_number": (not_number, check["number_message"]),
+                    "out_of_range": (out_of_range, check["range_message"])
+                }
+            codes["missing"] = (missing, f"{field} is required")
+            
+            for code, (mask, message) in codes.items():
+                for index in np.flatnonzero(mask):
+                    row_errors[positions[index]].append({"field": field, "code": code, "message": message})
+                    
+        return row_errors
+        
+    def _columns(self, records):
+        """Transpose records into one list per schema field, with _MISSING for absent fields"""
+        if len(self.fields) > 1 and records:
+            try:
+                # Fast path when every record has every field
+                rows = list(map(itemgetter(*self.fields), records))
+                return {field: list(column) for field, column in zip(self.fields, zip(*rows))}
+            except KeyError:
+                pass
+        return {field: [record.get(field, _MISSING) for record in records] for field in self.fields}
+        
+    def _all_allowed(self, values, allowed):
+        """Check a column against valid values once per distinct value (False if unsure)"""
+        try:
+            return all(value in allowed for value in set(values))
+        except TypeError:
+            # Unhashable values are checked one by one
+            return False
+            
+    def _to_numbers(self, values, missing):
+        """
+        Convert a column with float(), vectorized when every value is a plain number.
+        
+        Returns:
+            tuple: (float64 array, NaN where not converted; mask of present values float() rejects)
+        """
+        count = len(values)
+        if not missing.any() and set(map(type, values)) <= NUMERIC_TYPES:
+            try:
+                return np.array(values, dtype=np.float64), np.zeros(count, dtype=bool)
+            except OverflowError:
+                pass
+                
+        numbers = np.full(count, np.nan)
+        not_number = np.zeros(count, dtype=bool)
+        for index, value in enumerate(values):
+            if missing[index]:
+                continue
+            try:
+                numbers[index] = float(value)
+            except (ValueError, TypeError, OverflowError):
+                not_number[index] = True
+        return numbers, not_number
+        
+    def check(self, record):
+        """
+        Validate one record and summarize the result like the connectors' validate_input.
+        
+        Args:
+            record (dict): Input data
+            
+        Returns:
+            tuple: (is_valid, error_message)
+        """
+        errors = self.validate(record)
+        if not errors:
+            return True, ""
+        return False, format_errors(errors)
+
+def format_errors(errors):
+    """
+    Summarize the field errors of one record in a single message.
+    
+    Missing fields are reported first and alone; otherwise every invalid
+    field's message is listed, in schema order.
+    
+    Args:
+        errors (list): Field errors from SchemaValidator
+        
+    Returns:
+        str: Error message, or "" if there are no errors
+    """
+    if not errors:
+        return ""
+    if errors[0]["code"] == "not_an_object":
+        return errors[0]["message"]
+        
+    missing = [error["field"] for error in errors if error["code"] == "missing"]
+    if missing:
+        return f"Missing required fields: {', '.join(missing)}"
+    return f"Invalid field values: {'; '.join(error['message'] for error in errors)}"
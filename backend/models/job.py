@@ -0,0 +1,79 @@
+from datetime import datetime
+import uuid
+import json
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from utils.logger import setup_logger
+from utils.db import db
+
+logger = setup_logger("job_models")
+
+class JobStatus:
+    """Lifecycle states of an asynchronous prediction job"""
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    
+    FINISHED = (COMPLETED, FAILED)
+
+class PredictionJob(db.Model):
+    """Model for tracking predictions that run in the background"""
+    
+    __tablename__ = 'prediction_jobs'
+    
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    model_name = db.Column(db.String(50), nullable=False)
+    patient_id = db.Column(db.String(36), db.ForeignKey('patients.id'), nullable=False)
+    doctor_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default=JobStatus.QUEUED)
+    
+    # Response body of the prediction once completed, stored as JSON
+    _result = db.Column('result', db.Text, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    
+    @property
+    def result(self):
+        """Get the result as a dictionary"""
+        if self._result:
+            return json.loads(self._result)
+        return None
+        
+    @result.setter
+    def result(self, value):
+        """Set the result from a dictionary"""
+        self._result = json.dumps(value) if value is not None else None
+        
+    def __init__(self, model_name, patient_id, doctor_id):
+        """Initialize a new queued prediction job"""
+        self.model_name = model_name
+        self.patient_id = patient_id
+        self.doctor_id = doctor_id
+        self.status = JobStatus.QUEUED
+        
+        logger.info(f"Created new {model_name} prediction job for patient: {patient_id}")
+        
+    @property
+    def finished(self):
+        """Whether the job has completed or failed"""
+        return self.status in JobStatus.FINISHED
+        
+    def to_dict(self):
+        """Convert the job to a dictionary for API responses"""
+        return {
+            'id': self.id,
+            'model_name': self.model_name,
+            'patient_id': self.patient_id,
+            'status': self.status,
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Import the backend packages the way the application does
+sys.path.append(str(Path(__file__).resolve().parents[1]))
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+# The connector stores predictions through the database models
+pytest.importorskip("flask_sqlalchemy")
+
+from ml_models.diabetes.connector import DiabetesModel
+
+@pytest.fixture(scope="module")
+def model():
+    return DiabetesModel()
+
+def parity_records(model):
+    """Inputs spanning every continuous range, categorical value and feature engineering threshold"""
+    sample = model.sample_input()
+    records = [sample]
+    for field, bounds in model.features_info["continuous"].items():
+        for value in np.linspace(bounds["min"], bounds["max"], 7):
+            records.append(dict(sample, **{field: float(value)}))
+    for field, values in {**model.features_info["categorical"], **model.features_info["binary"]}.items():
+        records.extend(dict(sample, **{field: value}) for value in values)
+        
+    config = model.feature_engineer.config
+    thresholds = {
+        "age": [config["age_risk_threshold"]],
+        "bmi": [bound for bound in config["bmi_categories"].values() if np.isfinite(bound)],
+        "blood_glucose_level": [config["glucose_risk_threshold"]],
+        "HbA1c_level": [config["HbA1c_risk_threshold"]]
+    }
+    for field, values in thresholds.items():
+        for value in values:
+            records.extend(dict(sample, **{field: value + offset}) for offset in (-1e-9, 0.0, 1e-9))
+            
+    # Numbers sent as strings are converted like preprocess_input converts them
+    records.append({field: str(value) if field in model.features_info["continuous"] else value for field, value in sample.items()})
+    return records
+
+def test_load_time_checks_enable_fast_paths(model):
+    assert model.row_preprocessing
+    assert model.batch_preprocessing
+
+def test_preprocess_row_matches_preprocess_input(model):
+    for record in parity_records(model):
+        expected = np.asarray(model.preprocess_input(record), dtype=np.float64)
+        assert model.preprocess_row(record).tobytes() == expected.tobytes(), record
+
+def test_preprocess_batch_matches_preprocess_input(model):
+    records = parity_records(model)
+    expected = np.array([model.preprocess_input(record)[0] for record in records], dtype=np.float64)
+    assert model.preprocess_batch(records).tobytes() == expected.tobytes()
+
+def test_row_buffer_is_reusable_after_predict(model):
+    sample = model.sample_input()
+    assert "error" not in model.predict(sample)
+    expected = np.asarray(model.preprocess_input(sample), dtype=np.float64)
+    assert model.preprocess_row(sample).tobytes() == expected.tobytes()
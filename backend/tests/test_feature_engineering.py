@@ -0,0 +1,97 @@
+import itertools
+import numpy as np
+import pandas as pd
+import pytest
+
+from ml_models.diabetes.feature_engineering import (
+    DERIVED_FEATURES, SMOKING_RISK_WEIGHTS, FeatureEngineer, check_batch_parity
+)
+
+FIELDS = ["age", "bmi", "hypertension", "heart_disease", "blood_glucose_level", "HbA1c_level", "smoking_history"]
+
+@pytest.fixture(scope="module")
+def engineer():
+    return FeatureEngineer()
+
+def sample_record():
+    return {
+        "gender": "Female",
+        "age": 45.0,
+        "hypertension": 0,
+        "heart_disease": 0,
+        "smoking_history": "never",
+        "bmi": 25.0,
+        "HbA1c_level": 5.5,
+        "blood_glucose_level": 120.0
+    }
+
+def assert_bit_identical(engineer, records, as_frame=False):
+    """Check every derived feature of transform_batch against transform, row by row"""
+    fields = list(records[0].keys())
+    columns = {field: [record[field] for record in records] for field in fields}
+    batch = engineer.transform_batch(pd.DataFrame(columns) if as_frame else columns)
+    
+    transformed = [engineer.transform(record) for record in records]
+    for feature in DERIVED_FEATURES:
+        expected = np.array([features[feature] for features in transformed], dtype=np.float64)
+        actual = np.asarray(batch[feature], dtype=np.float64)
+        assert actual.tobytes() == expected.tobytes(), feature
+
+def test_every_category_and_binary_combination(engineer):
+    records = [
+        dict(sample_record(), smoking_history=smoking, hypertension=hypertension, heart_disease=heart_disease, bmi=bmi)
+        for smoking, hypertension, heart_disease, bmi in itertools.product(
+            list(SMOKING_RISK_WEIGHTS) + ["not recorded"], (0, 1), (0, 1), (17.0, 22.0, 27.0, 35.0)
+        )
+    ]
+    assert_bit_identical(engineer, records)
+    assert_bit_identical(engineer, records, as_frame=True)
+
+def test_random_records(engineer):
+    rng = np.random.default_rng(0)
+    records = [
+        {
+            "age": float(rng.uniform(0, 120)),
+            "bmi": float(rng.uniform(10, 60)),
+            "hypertension": int(rng.integers(0, 2)),
+            "heart_disease": int(rng.integers(0, 2)),
+            "blood_glucose_level": float(rng.uniform(50, 300)),
+            "HbA1c_level": float(rng.uniform(3, 15)),
+            "smoking_history": str(rng.choice(list(SMOKING_RISK_WEIGHTS)))
+        }
+        for _ in range(500)
+    ]
+    assert_bit_identical(engineer, records)
+    assert check_batch_parity(engineer, records) == (True, [])
+
+def test_numeric_strings(engineer):
+    records = [
+        dict(sample_record(), age="45", bmi="27.35", hypertension="1", heart_disease="0", blood_glucose_level="140.0", HbA1c_level="5.7"),
+        dict(sample_record(), age="61.5", bmi=31.2, hypertension=1, heart_disease="1", blood_glucose_level="200", HbA1c_level=8)
+    ]
+    assert_bit_identical(engineer, records)
+    assert_bit_identical(engineer, records, as_frame=True)
+
+def test_threshold_boundaries(engineer):
+    config = engineer.config
+    thresholds = {
+        "age": [config["age_risk_threshold"]],
+        "bmi": [bound for bound in config["bmi_categories"].values() if np.isfinite(bound)],
+        "blood_glucose_level": [config["glucose_risk_threshold"]],
+        "HbA1c_level": [config["HbA1c_risk_threshold"]]
+    }
+    records = []
+    for field, values in thresholds.items():
+        for value in values:
+            for boundary in (np.nextafter(value, -np.inf), value, np.nextafter(value, np.inf)):
+                records.append(dict(sample_record(), **{field: float(boundary)}))
+    assert_bit_identical(engineer, records)
+
+def test_missing_optional_fields(engineer):
+    # Only the fields the transformations read are required; gender is not one of them
+    records = [{field: sample_record()[field] for field in FIELDS}, {field: sample_record()[field] for field in FIELDS}]
+    records[1]["age"] = 70.0
+    assert_bit_identical(engineer, records)
+    
+    batch = engineer.transform_batch({field: [record[field] for record in records] for field in FIELDS})
+    assert "gender" not in batch
@@ -0,0 +1,46 @@
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import pytest
+
+from ml_models.deadline import DEADLINE_ERROR
+from ml_models.inference_pool import InferencePool
+
+@pytest.fixture
+def pool(monkeypatch):
+    """Pool whose worker calls never finish in time; the timeout each wait got is recorded"""
+    pool = InferencePool("default", workers=1, model_specs=[("diabetes", "1.0.0")], timeout=5)
+    pool.waits = []
+    
+    def submit(fn, *args, timeout=None):
+        pool.waits.append(timeout)
+        raise FutureTimeoutError()
+        
+    monkeypatch.setattr(pool, "_submit", submit)
+    return pool
+
+def test_predict_reports_pool_timeout(pool):
+    result = pool.predict("diabetes", "1.0.0", {"age": 50})
+    
+    assert pool.waits == [5]
+    assert result == {"error": "Inference timed out after 5s in pool 'default'"}
+
+def test_predict_cancels_after_deadline(pool):
+    result = pool.predict("diabetes", "1.0.0", {"age": 50}, {"deadline": time.time() - 1})
+    
+    assert pool.waits == [0.0]
+    assert result["error"] == DEADLINE_ERROR
+    assert result["cancelled"] is True
+
+def test_predict_many_reports_pool_timeout_per_record(pool):
+    results = pool.predict_many("diabetes", "1.0.0", [{"age": 50}, {"age": 60}])
+    
+    assert pool.waits == [5]
+    assert results == [{"error": "Inference timed out after 5s in pool 'default'"}] * 2
+
+def test_predict_many_cancels_every_record_after_deadline(pool):
+    results = pool.predict_many("diabetes", "1.0.0", [{"age": 50}, {"age": 60}], {"deadline": time.time() - 1})
+    
+    assert pool.waits == [0.0]
+    assert len(results) == 2
+    assert all(result["cancelled"] and result["cancelled_stage"] == "inference" for result in results)
@@ -0,0 +1,81 @@
+import pytest
+
+from ml_models.model_registry import ModelRegistry
+from ml_models.prediction_cache import input_hash
+
+class StrictModel:
+    """Connector stub that only accepts integer 0/1 flags and records what it stores"""
+    
+    def __init__(self):
+        self.predictions = 0
+        self.stored = []
+        
+    def validate_input(self, data):
+        if type(data.get("hypertension")) is not int or data["hypertension"] not in (0, 1):
+            return False, "Invalid value for hypertension: must be 0 or 1"
+        if data.get("gender") not in ("Female", "Male"):
+            return False, "Invalid value for gender"
+        return True, ""
+        
+    def predict(self, data, context=None):
+        is_valid, error_message = self.validate_input(data)
+        if not is_valid:
+            return {"error": error_message}
+        self.predictions += 1
+        result = {"prediction": 1, "probability": 0.8}
+        if context and "patient_id" in context:
+            self.store_result(data, result, context)
+        return result
+        
+    def store_result(self, data, result, context):
+        self.stored.append((dict(data), dict(result)))
+        result["id"] = len(self.stored)
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = ModelRegistry()
+    registry.models["strict"] = registry._new_model_entry({
+        "connector": "tests.test_prediction_cache",
+        "class": "StrictModel",
+        "version": "1.0.0",
+        "enabled": True,
+        "cache": {"enabled": True, "max_entries": 16, "ttl_seconds": 600}
+    })
+    model = StrictModel()
+    monkeypatch.setattr(registry, "_pool_name", lambda model_name: None)
+    monkeypatch.setattr(registry, "get_model", lambda model_name, version=None: model)
+    registry.strict_model = model
+    return registry
+
+def test_input_hash_keeps_exact_types_and_values():
+    keys = {input_hash({"age": value}) for value in (25, 25.0, "25", " 25", "25 ", True)}
+    assert len(keys) == 6
+    assert input_hash({"age": 25, "bmi": 22.5}) == input_hash({"bmi": 22.5, "age": 25})
+
+def test_cache_serves_identical_valid_input(registry):
+    data = {"hypertension": 1, "gender": "Female"}
+    
+    first = registry.predict("strict", dict(data))
+    second = registry.predict("strict", dict(data), {"patient_id": 7})
+    
+    assert "cached" not in first
+    assert second["cached"] is True
+    assert registry.strict_model.predictions == 1
+    assert len(registry.strict_model.stored) == 1
+
+@pytest.mark.parametrize("invalid", [
+    {"hypertension": "1", "gender": "Female"},
+    {"hypertension": 1.0, "gender": "Female"},
+    {"hypertension": True, "gender": "Female"},
+    {"hypertension": 1, "gender": " Female "}
+])
+def test_input_rejected_by_validation_is_never_cached_or_stored(registry, invalid):
+    registry.predict("strict", {"hypertension": 1, "gender": "Female"})
+    
+    for _ in range(2):
+        result = registry.predict("strict", dict(invalid), {"patient_id": 7})
+        assert "error" in result
+        assert "cached" not in result
+        
+    assert registry.strict_model.predictions == 1
+    assert registry.strict_model.stored == []
@@ -0,0 +1,101 @@
+import itertools
+import numpy as np
+import pytest
+
+from ml_models.diabetes.risk_rules import RiskRules
+
+@pytest.fixture(scope="module")
+def rules():
+    return RiskRules()
+
+def legacy_risk_factors(data):
+    """The hard-coded risk factors of DiabetesModel._calculate_risk_factors that risk_rules.json replaced"""
+    risk_factors = []
+    
+    age = float(data["age"])
+    if age > 45:
+        risk_factors.append({"factor": "age", "value": age, "level": "high" if age > 65 else "medium",
+                             "description": "Age above 45 increases diabetes risk"})
+    bmi = float(data["bmi"])
+    if bmi >= 25:
+        risk_factors.append({"factor": "bmi", "value": bmi, "level": "high" if bmi >= 30 else "medium",
+                             "description": "BMI of 25 or higher indicates overweight/obesity, increasing diabetes risk"})
+    glucose = float(data["blood_glucose_level"])
+    if glucose >= 140:
+        risk_factors.append({"factor": "blood_glucose_level", "value": glucose, "level": "high" if glucose >= 200 else "medium",
+                             "description": "Elevated blood glucose level indicates potential diabetes"})
+    hba1c = float(data["HbA1c_level"])
+    if hba1c >= 5.7:
+        risk_factors.append({"factor": "HbA1c_level", "value": hba1c, "level": "high" if hba1c >= 6.5 else "medium",
+                             "description": "HbA1c of 5.7 or higher indicates prediabetes or diabetes"})
+    if data["hypertension"] == 1:
+        risk_factors.append({"factor": "hypertension", "value": "Yes", "level": "medium",
+                             "description": "Hypertension is associated with increased diabetes risk"})
+    if data["heart_disease"] == 1:
+        risk_factors.append({"factor": "heart_disease", "value": "Yes", "level": "medium",
+                             "description": "Heart disease is associated with increased diabetes risk"})
+    if data["smoking_history"] in ["current", "ever"]:
+        risk_factors.append({"factor": "smoking_history", "value": data["smoking_history"], "level": "medium",
+                             "description": "Smoking is associated with increased diabetes risk"})
+                             
+    level_order = {"high": 0, "medium": 1, "low": 2}
+    risk_factors.sort(key=lambda x: level_order[x["level"]])
+    return risk_factors
+
+def around(*thresholds):
+    """Each threshold, the floats right next to it and a whole number on either side"""
+    values = []
+    for threshold in thresholds:
+        values.extend([threshold - 1, np.nextafter(threshold, -np.inf), threshold, np.nextafter(threshold, np.inf), threshold + 1])
+    return [float(value) for value in values]
+
+def boundary_records():
+    """Records with every continuous field on and around its level thresholds"""
+    continuous = {
+        "age": around(45, 65),
+        "bmi": around(25, 30),
+        "blood_glucose_level": around(140, 200),
+        "HbA1c_level": around(5.7, 6.5)
+    }
+    base = {"age": 30.0, "bmi": 22.0, "blood_glucose_level": 100.0, "HbA1c_level": 5.0,
+            "hypertension": 0, "heart_disease": 0, "smoking_history": "never"}
+            
+    records = []
+    for field, values in continuous.items():
+        records.extend(dict(base, **{field: value}) for value in values)
+    for hypertension, heart_disease, smoking in itertools.product(
+        (0, 1, 1.0, True), (0, 1), ("never", "former", "current", "not current", "ever", "unknown")
+    ):
+        records.append(dict(base, age=70.0, bmi=31.0, hypertension=hypertension, heart_disease=heart_disease, smoking_history=smoking))
+        
+    # Numbers sent as strings, and every field flagged at once
+    records.append(dict(base, age="46", bmi="25", blood_glucose_level="199.9", HbA1c_level="6.5"))
+    records.append({"age": 80, "bmi": 40, "blood_glucose_level": 250, "HbA1c_level": 9,
+                    "hypertension": 1, "heart_disease": 1, "smoking_history": "current"})
+    return records
+
+def test_evaluate_matches_legacy_rules(rules):
+    for record in boundary_records():
+        assert rules.evaluate(record) == legacy_risk_factors(record), record
+
+def test_evaluate_batch_matches_legacy_rules(rules):
+    records = boundary_records()
+    assert rules.evaluate_batch(records) == [legacy_risk_factors(record) for record in records]
+
+def test_random_records_match_legacy_rules(rules):
+    rng = np.random.default_rng(0)
+    records = [
+        {
+            "age": float(rng.uniform(0, 100)),
+            "bmi": float(rng.uniform(15, 45)),
+            "blood_glucose_level": float(rng.uniform(70, 300)),
+            "HbA1c_level": float(rng.uniform(4, 10)),
+            "hypertension": int(rng.integers(0, 2)),
+            "heart_disease": int(rng.integers(0, 2)),
+            "smoking_history": str(rng.choice(["never", "former", "current", "not current", "ever", "unknown"]))
+        }
+        for _ in range(1000)
+    ]
+    expected = [legacy_risk_factors(record) for record in records]
+    assert [rules.evaluate(record) for record in records] == expected
+    assert rules.evaluate_batch(records) == expected
@@ -0,0 +1,78 @@
+import os
+import numpy as np
+import pytest
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+from sklearn.tree import DecisionTreeClassifier
+
+from ml_models.artifacts import load_artifact
+from ml_models.tree_evaluator import ForestEvaluator, ObliviousTreeEvaluator, check_parity, compile_tree_model
+
+DIABETES_MODEL_PATH = os.path.join(os.path.dirname(__file__), os.pardir, "ml_models", "diabetes", "diabetes_model.pkl")
+
+def training_data(missing_rate=0.0, seed=0):
+    """Binary classification data with an interaction, optionally with NaN values"""
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(400, 6))
+    y = (X[:, 0] + X[:, 1] * X[:, 2] - 0.5 * X[:, 3] > 0).astype(int)
+    X[rng.random(X.shape) < missing_rate] = np.nan
+    return X, y
+
+def scoring_rows(n_features, borders=None, seed=1):
+    """Random rows, rows on and next to the split borders, and rows with NaN values"""
+    rng = np.random.default_rng(seed)
+    rows = [rng.normal(scale=2.0, size=(300, n_features))]
+    if borders is not None:
+        for offset in (-1e-6, 0.0, 1e-6):
+            rows.append(np.stack([rng.choice(feature_borders, size=100) + offset for feature_borders in borders], axis=1))
+    X = np.concatenate(rows)
+    with_missing = X.copy()
+    with_missing[rng.random(X.shape) < 0.2] = np.nan
+    return np.concatenate([X, with_missing])
+
+@pytest.mark.parametrize("estimator", [
+    DecisionTreeClassifier(max_depth=8, random_state=0),
+    RandomForestClassifier(n_estimators=25, max_depth=8, random_state=0),
+    ExtraTreesClassifier(n_estimators=25, max_depth=8, random_state=0)
+])
+@pytest.mark.parametrize("missing_rate", [0.0, 0.2])
+def test_forest_evaluator_matches_predict_proba(estimator, missing_rate):
+    model = estimator.fit(*training_data(missing_rate))
+    evaluator = compile_tree_model(model)
+    assert isinstance(evaluator, ForestEvaluator)
+    
+    trees = getattr(model, "estimators_", [model])
+    thresholds = [(tree.tree_.feature, tree.tree_.threshold) for tree in trees]
+    borders = [
+        np.concatenate([threshold[(features == feature) & np.isfinite(threshold)] for features, threshold in thresholds] + [[0.0]])
+        for feature in range(model.n_features_in_)
+    ]
+    passed, difference = check_parity(model, evaluator, scoring_rows(model.n_features_in_, borders))
+    assert passed, difference
+
+@pytest.mark.parametrize("nan_mode", ["Min", "Max"])
+def test_oblivious_tree_evaluator_matches_predict_proba(nan_mode):
+    catboost = pytest.importorskip("catboost")
+    model = catboost.CatBoostClassifier(iterations=40, depth=5, nan_mode=nan_mode, thread_count=1, random_seed=0, verbose=False, allow_writing_files=False)
+    model.fit(*training_data(missing_rate=0.1))
+    evaluator = compile_tree_model(model)
+    assert isinstance(evaluator, ObliviousTreeEvaluator)
+    
+    borders = [
+        np.append(evaluator.split_borders[(evaluator.split_features == feature) & np.isfinite(evaluator.split_borders)], 0.0)
+        for feature in range(6)
+    ]
+    passed, difference = check_parity(model, evaluator, scoring_rows(6, borders))
+    assert passed, difference
+
+def test_diabetes_model_evaluator_matches_predict_proba():
+    pytest.importorskip("catboost")
+    model, _ = load_artifact(DIABETES_MODEL_PATH)
+    evaluator = compile_tree_model(model)
+    n_features = evaluator.nan_as.size
+    
+    borders = [
+        np.append(evaluator.split_borders[(evaluator.split_features == feature) & np.isfinite(evaluator.split_borders)], 0.0)
+        for feature in range(n_features)
+    ]
+    passed, difference = check_parity(model, evaluator, scoring_rows(n_features, borders))
+    assert passed, difference
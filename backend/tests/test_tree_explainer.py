@@ -0,0 +1,125 @@
+import itertools
+import math
+import os
+import numpy as np
+import pytest
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+from sklearn.tree import DecisionTreeClassifier
+
+from ml_models.artifacts import load_artifact
+from ml_models.tree_explainer import ForestExplainer, ObliviousTreeExplainer, build_tree_explainer, check_explainer
+
+DIABETES_MODEL_PATH = os.path.join(os.path.dirname(__file__), os.pardir, "ml_models", "diabetes", "diabetes_model.pkl")
+
+N_FEATURES = 4
+
+def training_data(n_features, missing_rate=0.0, seed=0):
+    """Binary classification data with an interaction, optionally with NaN values"""
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(300, n_features))
+    y = (X[:, 0] + X[:, 1] * X[:, 2] - 0.5 * X[:, 3] > 0).astype(int)
+    X[rng.random(X.shape) < missing_rate] = np.nan
+    return X, y
+
+def explained_rows(n_features, seed=1):
+    """Random rows, a fifth of their values missing in the second half"""
+    rng = np.random.default_rng(seed)
+    X = rng.normal(scale=1.5, size=(40, n_features))
+    X[20:][rng.random((20, n_features)) < 0.2] = np.nan
+    return X
+
+def expected_output(tree, x, known):
+    """
+    Positive class probability of one sklearn tree with the features in known
+    set to their values in x, and the other features averaged over the training
+    cover of each split (the path-dependent perturbation of TreeSHAP).
+    """
+    nodes = tree.tree_
+    value = nodes.value[:, 0, :]
+    positive = value[:, 1] / value.sum(axis=1)
+    cover = nodes.weighted_n_node_samples
+    missing_left = getattr(nodes, "missing_go_to_left", None)
+    
+    def walk(node):
+        left, right = nodes.children_left[node], nodes.children_right[node]
+        if left == -1:
+            return positive[node]
+        feature = nodes.feature[node]
+        if feature in known:
+            if np.isnan(x[feature]):
+                go_left = missing_left is not None and bool(missing_left[node])
+            else:
+                go_left = x[feature] <= nodes.threshold[node]
+            return walk(left if go_left else right)
+        return (cover[left] * walk(left) + cover[right] * walk(right)) / cover[node]
+        
+    return walk(0)
+
+def brute_force_shapley(model, x):
+    """Shapley values of every feature by enumerating all coalitions of the others"""
+    trees = getattr(model, "estimators_", [model])
+    n = model.n_features_in_
+    outputs = {
+        frozenset(known): sum(expected_output(tree, x, set(known)) for tree in trees) / len(trees)
+        for size in range(n + 1)
+        for known in itertools.combinations(range(n), size)
+    }
+    
+    def game(known):
+        return outputs[frozenset(known)]
+        
+    values = np.zeros(n)
+    for feature in range(n):
+        others = [other for other in range(n) if other != feature]
+        for size in range(n):
+            weight = math.factorial(size) * math.factorial(n - size - 1) / math.factorial(n)
+            for coalition in itertools.combinations(others, size):
+                values[feature] += weight * (game(set(coalition) | {feature}) - game(set(coalition)))
+    return values, game(set())
+
+@pytest.mark.parametrize("estimator", [
+    DecisionTreeClassifier(max_depth=6, random_state=0),
+    RandomForestClassifier(n_estimators=10, max_depth=5, random_state=0),
+    ExtraTreesClassifier(n_estimators=10, max_depth=5, random_state=0)
+])
+@pytest.mark.parametrize("missing_rate", [0.0, 0.2])
+def test_forest_explainer_matches_brute_force_shapley(estimator, missing_rate):
+    model = estimator.fit(*training_data(N_FEATURES, missing_rate))
+    explainer = build_tree_explainer(model)
+    assert isinstance(explainer, ForestExplainer)
+    assert explainer.contribution_scale == "probability"
+    
+    # The explainer compares values as sklearn does, after a cast to float32
+    X = explained_rows(N_FEATURES).astype(np.float32).astype(np.float64)
+    contributions = explainer.explain(X)
+    for x, row_contributions in zip(X, contributions):
+        expected, expected_value = brute_force_shapley(model, x)
+        np.testing.assert_allclose(row_contributions, expected, rtol=0, atol=1e-12)
+        assert abs(explainer.expected_value - expected_value) <= 1e-12
+        
+    assert check_explainer(model, explainer, X)[0]
+
+@pytest.mark.parametrize("nan_mode", ["Min", "Max"])
+def test_oblivious_tree_explainer_matches_shap_values(nan_mode):
+    catboost = pytest.importorskip("catboost")
+    model = catboost.CatBoostClassifier(iterations=40, depth=5, nan_mode=nan_mode, thread_count=1, random_seed=0, verbose=False, allow_writing_files=False)
+    model.fit(*training_data(6, missing_rate=0.1))
+    explainer = build_tree_explainer(model)
+    assert isinstance(explainer, ObliviousTreeExplainer)
+    assert explainer.contribution_scale == "log_odds"
+    
+    X = explained_rows(6)
+    expected = model.get_feature_importance(catboost.Pool(X), type="ShapValues")
+    np.testing.assert_allclose(explainer.explain(X), expected[:, :-1], rtol=0, atol=1e-9)
+    np.testing.assert_allclose(explainer.expected_value, expected[:, -1], rtol=0, atol=1e-9)
+    assert check_explainer(model, explainer, X)[0]
+
+def test_diabetes_model_explainer_matches_shap_values():
+    catboost = pytest.importorskip("catboost")
+    model, _ = load_artifact(DIABETES_MODEL_PATH)
+    explainer = build_tree_explainer(model)
+    
+    X = explained_rows(explainer.n_features) * 20 + 40
+    expected = model.get_feature_importance(catboost.Pool(X), type="ShapValues")
+    np.testing.assert_allclose(explainer.explain(X), expected[:, :-1], rtol=0, atol=1e-9)
+    np.testing.assert_allclose(explainer.expected_value, expected[:, -1], rtol=0, atol=1e-9)
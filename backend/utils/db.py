@@ -14,6 +14,7 @@ def init_db(app):
         
         from models.patient import Patient
         from models.user import User
+        from models.job import PredictionJob
         
         migrate = Migrate(app, db)
         
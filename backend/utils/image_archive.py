@@ -0,0 +1,160 @@
+import csv
+import io
+import json
+import os
+import tarfile
+import zipfile
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from utils.logger import setup_logger
+
+logger = setup_logger("image_archive")
+
+IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'tif', 'tiff', 'dcm'}
+
+# Largest image read from an archive, so one member cannot exhaust memory
+MAX_IMAGE_BYTES = 64 * 1024 * 1024
+
+def is_image_name(name):
+    """Check if a file name has an accepted MRI image extension (hidden and macOS metadata files excluded)"""
+    base = os.path.basename(name)
+    if not base or base.startswith('.') or '__MACOSX' in name.split('/'):
+        return False
+    return '.' in base and base.rsplit('.', 1)[1].lower() in IMAGE_EXTENSIONS
+
+def detect_archive(filename):
+    """
+    Work out the archive type from its file name.
+    
+    Args:
+        filename (str): Name of the uploaded archive
+        
+    Returns:
+        str: "zip", "tar", or None if unsupported
+    """
+    name = (filename or '').lower()
+    if name.endswith('.zip'):
+        return "zip"
+    if name.endswith(('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tar.xz')):
+        return "tar"
+    return None
+
+def count_archive_images(path, kind):
+    """
+    Count the images in an archive from its index, without decompressing them.
+    
+    Args:
+        path (str): Path of the archive
+        kind (str): "zip" or "tar"
+        
+    Returns:
+        int: Number of images, or None for tar archives (they have no index)
+    """
+    if kind != "zip":
+        return None
+    with zipfile.ZipFile(path) as archive:
+        return sum(1 for info in archive.infolist() if not info.is_dir() and is_image_name(info.filename))
+
+def iter_archive_images(path, kind):
+    """
+    Read the images of an archive one at a time, without extracting it.
+    
+    Tar archives are read as a stream, so compressed tars are decompressed
+    in a single pass.
+    
+    Args:
+        path (str): Path of the archive
+        kind (str): "zip" or "tar"
+        
+    Yields:
+        tuple: (member name, image bytes or None, error message or None)
+    """
+    if kind == "zip":
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or not is_image_name(info.filename):
+                    continue
+                if info.file_size > MAX_IMAGE_BYTES:
+                    yield info.filename, None, "Image too large"
+                    continue
+                try:
+                    with archive.open(info) as member:
+                        yield info.filename, member.read(), None
+                except (zipfile.BadZipFile, RuntimeError, OSError) as e:
+                    yield info.filename, None, f"Could not read image from archive: {str(e)}"
+        return
+        
+    with tarfile.open(path, mode="r|*") as archive:
+        for info in archive:
+            if not info.isfile() or not is_image_name(info.name):
+                continue
+            if info.size > MAX_IMAGE_BYTES:
+                yield info.name, None, "Image too large"
+                continue
+            member = archive.extractfile(info)
+            yield info.name, member.read(), None
+
+def load_manifest(data, filename=None):
+    """
+    Parse a manifest mapping image files to patients.
+    
+    Accepted formats are a JSON object {"file": "patient_id"}, a JSON list
+    of {"file": ..., "patient_id": ...} objects, or a CSV with file and
+    patient_id columns.
+    
+    Args:
+        data (bytes or str): Manifest content
+        filename (str, optional): Name of the manifest file
+        
+    Returns:
+        dict: Image path within the upload mapped to patient ID
+        
+    Raises:
+        ValueError: If the manifest cannot be parsed
+    """
+    text = data.decode('utf-8-sig') if isinstance(data, bytes) else data
+    if not text.strip():
+        return {}
+        
+    if (filename or '').lower().endswith('.csv') or text.lstrip()[0] not in '[{':
+        reader = csv.DictReader(io.StringIO(text))
+        if not reader.fieldnames or not {'file', 'patient_id'} <= set(reader.fieldnames):
+            raise ValueError("CSV manifest needs file and patient_id columns")
+        entries = [(row['file'], row['patient_id']) for row in reader]
+    else:
+        try:
+            parsed = json.loads(text)
+        except ValueError:
+            raise ValueError("Manifest is not valid JSON")
+            
+        if isinstance(parsed, dict):
+            entries = list(parsed.items())
+        elif isinstance(parsed, list) and all(isinstance(entry, dict) for entry in parsed):
+            entries = [(entry.get('file'), entry.get('patient_id')) for entry in parsed]
+        else:
+            raise ValueError("Manifest must map files to patient IDs")
+            
+    manifest = {}
+    for file_name, patient_id in entries:
+        if not file_name or not patient_id:
+            raise ValueError("Every manifest entry needs a file and a patient_id")
+        manifest[str(file_name).strip().lstrip('./')] = str(patient_id).strip()
+    return manifest
+
+def manifest_patient(manifest, name, default=None):
+    """
+    Find the patient of an image, matching its full path in the upload first
+    and then its file name.
+    
+    Args:
+        manifest (dict): Parsed manifest
+        name (str): Image path within the upload
+        default (str, optional): Patient of images not in the manifest
+        
+    Returns:
+        str: Patient ID, or default
+    """
+    name = name.lstrip('./')
+    return manifest.get(name) or manifest.get(os.path.basename(name)) or default
@@ -0,0 +1,180 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from utils.logger import setup_logger
+from utils.db import db
+from models.job import PredictionJob, JobStatus
+
+logger = setup_logger("job_queue")
+
+class JobQueue:
+    """
+    Runs prediction jobs on a background thread pool so the request that
+    submitted them can return immediately.
+    
+    Job state lives in the prediction_jobs table, so any web worker can
+    report on a job, whichever worker runs it. With executor.mode "process"
+    the model itself runs in the registry's inference pools and the job
+    thread only waits for it.
+    """
+    
+    def __init__(self):
+        """Initialize the queue (the thread pool starts on first use)"""
+        self.app = None
+        self.workers = 2
+        self.max_pending = 64
+        self._pending = 0
+        self._executor = None
+        self._lock = threading.Lock()
+        
+        # Wakes up event streams in this process as soon as a job changes
+        self._changed = threading.Condition()
+        
+    def init_app(self, app):
+        """
+        Bind the queue to the Flask application whose database jobs use.
+        
+        Args:
+            app (Flask): The application
+        """
+        self.app = app
+        self.workers = max(1, int(app.config.get('JOB_WORKERS', 2)))
+        self.max_pending = max(1, int(app.config.get('JOB_MAX_PENDING', 64)))
+        
+    def _get_executor(self):
+        """Get the thread pool, creating it on first use (after any fork)"""
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="prediction-job")
+                    logger.info(f"Started prediction job pool with {self.workers} workers")
+        return self._executor
+        
+    def is_full(self):
+        """Check if this process already has max_pending jobs queued or running"""
+        with self._lock:
+            return self._pending >= self.max_pending
+            
+    def retry_after(self):
+        """
+        Estimate how many seconds to wait before submitting again when the queue is full.
+        
+        Returns:
+            int: Seconds, assuming about one second per job and worker
+        """
+        with self._lock:
+            return max(1, min(120, self._pending // self.workers))
+            
+    def get_stats(self):
+        """Get the number of jobs queued or running in this process and the limits"""
+        with self._lock:
+            return {"pending": self._pending, "max_pending": self.max_pending, "workers": self.workers}
+            
+    def submit(self, model_name, patient_id, doctor_id, task):
+        """
+        Record a queued job and schedule it.
+        
+        Args:
+            model_name (str): Name of the model the job runs
+            patient_id (str): ID of the patient
+            doctor_id (str): ID of the doctor who may read the job
+            task (callable): Runs the prediction and returns (result dict, error message);
+                one of the two is None
+                
+        Returns:
+            PredictionJob: The queued job
+        """
+        if self.app is None:
+            raise RuntimeError("JobQueue is not bound to an application")
+            
+        job = PredictionJob(model_name=model_name, patient_id=patient_id, doctor_id=doctor_id)
+        db.session.add(job)
+        db.session.commit()
+        
+        with self._lock:
+            self._pending += 1
+        self._get_executor().submit(self._run, job.id, task)
+        logger.info(f"Queued {model_name} prediction job {job.id}")
+        return job
+        
+    def _run(self, job_id, task):
+        """Run a job's task and record its outcome"""
+        with self.app.app_context():
+            try:
+                self._update(job_id, status=JobStatus.RUNNING, started_at=datetime.utcnow())
+                
+                try:
+                    result, error = task()
+                except Exception as e:
+                    logger.error(f"Prediction job {job_id} raised: {str(e)}", exc_info=True)
+                    db.session.rollback()
+                    result, error = None, "An error occurred during prediction"
+                    
+                if error is None:
+                    self._update(job_id, status=JobStatus.COMPLETED, result=result, finished_at=datetime.utcnow())
+                    logger.info(f"Prediction job {job_id} completed")
+                else:
+                    self._update(job_id, status=JobStatus.FAILED, error=error, finished_at=datetime.utcnow())
+                    logger.warning(f"Prediction job {job_id} failed: {error}")
+            except Exception as e:
+                logger.error(f"Error updating prediction job {job_id}: {str(e)}", exc_info=True)
+                db.session.rollback()
+            finally:
+                db.session.remove()
+                with self._lock:
+                    self._pending -= 1
+                
+    def _update(self, job_id, **fields):
+        """Set fields of a job, commit and wake up its event streams"""
+        job = PredictionJob.query.get(job_id)
+        for name, value in fields.items():
+            setattr(job, name, value)
+        db.session.commit()
+        
+        with self._changed:
+            self._changed.notify_all()
+            
+    def get_job(self, job_id, doctor_id):
+        """
+        Get a job if it belongs to the doctor.
+        
+        Args:
+            job_id (str): ID of the job
+            doctor_id (str): ID of the requesting doctor
+            
+        Returns:
+            PredictionJob: The job, or None if not found
+        """
+        return PredictionJob.query.filter_by(id=job_id, doctor_id=doctor_id).first()
+        
+    def wait_for_change(self, timeout):
+        """
+        Block until a job run by this process changes or the timeout passes.
+        
+        Jobs run by other worker processes are only seen when the caller
+        polls again, so keep the timeout short.
+        
+        Args:
+            timeout (float): Seconds to wait at most
+        """
+        with self._changed:
+            self._changed.wait(timeout)
+            
+    def shutdown(self, wait=True):
+        """
+        Stop the thread pool.
+        
+        Args:
+            wait (bool): Block until running jobs have finished
+        """
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
+
+# Create a singleton instance of the job queue
+job_queue = JobQueue()
@@ -0,0 +1,132 @@
+import csv
+import json
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from utils.logger import setup_logger
+
+logger = setup_logger("record_stream")
+
+# Longest line accepted from an upload, so one bad line cannot exhaust memory
+MAX_LINE_BYTES = 1 << 20
+
+CSV_TYPES = {"text/csv", "application/csv", "text/plain"}
+NDJSON_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl", "application/json-lines"}
+
+def detect_format(mimetype, filename=None):
+    """
+    Work out the format of an uploaded record file.
+    
+    Args:
+        mimetype (str): Content type of the body or file part
+        filename (str, optional): Name of the uploaded file
+        
+    Returns:
+        str: "csv", "ndjson", or None if unsupported
+    """
+    if filename and '.' in filename:
+        extension = filename.rsplit('.', 1)[1].lower()
+        if extension == "csv":
+            return "csv"
+        if extension in ("ndjson", "jsonl"):
+            return "ndjson"
+            
+    if mimetype in CSV_TYPES:
+        return "csv"
+    if mimetype in NDJSON_TYPES:
+        return "ndjson"
+    return None
+
+def _iter_lines(stream):
+    """Read decoded lines from a binary stream one at a time"""
+    while True:
+        line = stream.readline(MAX_LINE_BYTES + 1)
+        if not line:
+            return
+        if len(line) > MAX_LINE_BYTES:
+            raise ValueError(f"Line longer than {MAX_LINE_BYTES} bytes")
+        yield line.decode("utf-8-sig") if isinstance(line, bytes) else line
+
+def _parse_csv_value(value):
+    """Convert a CSV cell to int or float where it is numeric"""
+    value = value.strip()
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+def iter_records(stream, data_format, text_fields=("patient_id",)):
+    """
+    Parse records from an uploaded CSV or NDJSON stream without reading it whole.
+    
+    CSV cells are converted to numbers where possible (except text_fields)
+    and empty cells are left out, so the record looks like a JSON request.
+    
+    Args:
+        stream (file-like): Binary stream of the upload
+        data_format (str): "csv" or "ndjson"
+        text_fields (tuple): CSV columns always kept as strings
+        
+    Yields:
+        tuple: (row number, record dict or None, error message or None)
+        
+    Raises:
+        ValueError: If a line is too long or the CSV has no header
+    """
+    lines = _iter_lines(stream)
+    
+    if data_format == "csv":
+        reader = csv.DictReader(lines)
+        if not reader.fieldnames:
+            raise ValueError("CSV upload has no header row")
+            
+        for row_number, row in enumerate(reader, start=1):
+            if None in row:
+                yield row_number, None, "Row has more fields than the header"
+                continue
+            yield row_number, {
+                name: value.strip() if name in text_fields else _parse_csv_value(value)
+                for name, value in row.items()
+                if value is not None and value.strip() != ""
+            }, None
+        return
+        
+    row_number = 0
+    for line in lines:
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield row_number, None, "Invalid JSON"
+            continue
+        if not isinstance(record, dict):
+            yield row_number, None, "Record must be an object"
+            continue
+        yield row_number, record, None
+
+def chunked(iterable, size):
+    """
+    Group an iterable into lists of at most size items.
+    
+    Args:
+        iterable (iterable): Items to group
+        size (int): Largest chunk
+        
+    Yields:
+        list: The next chunk
+    """
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
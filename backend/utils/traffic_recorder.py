@@ -0,0 +1,215 @@
+import os
+import json
+import time
+import random
+import threading
+from pathlib import Path
+import sys
+
+from flask import request, g
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from utils.logger import setup_logger
+
+logger = setup_logger("traffic_recorder")
+
+# Limits on how much of a payload's structure is described
+MAX_SCHEMA_DEPTH = 6
+MAX_SCHEMA_FIELDS = 200
+
+def describe_value(value, depth=0):
+    """
+    Describe the structure of a JSON value without any of its content.
+    
+    Objects keep their field names, arrays their length and the shape of
+    their first item, strings only their length.
+    
+    Args:
+        value (object): Decoded JSON value
+        depth (int): Current nesting depth
+        
+    Returns:
+        dict: Schema of the value
+    """
+    if isinstance(value, bool):
+        return {"type": "boolean"}
+    if isinstance(value, int):
+        return {"type": "integer"}
+    if isinstance(value, float):
+        return {"type": "number"}
+    if isinstance(value, str):
+        return {"type": "string", "length": len(value)}
+    if value is None:
+        return {"type": "null"}
+    if depth >= MAX_SCHEMA_DEPTH:
+        return {"type": "truncated"}
+        
+    if isinstance(value, dict):
+        return {
+            "type": "object",
+            "fields": {
+                str(name): describe_value(item, depth + 1)
+                for name, item in list(value.items())[:MAX_SCHEMA_FIELDS]
+            }
+        }
+    if isinstance(value, list):
+        return {
+            "type": "array",
+            "length": len(value),
+            "items": describe_value(value[0], depth + 1) if value else None
+        }
+    return {"type": "unknown"}
+
+def describe_file(field, storage):
+    """
+    Describe an uploaded file: size, type and, for images, dimensions.
+    
+    The file name is not kept, only its extension. The stream is rewound so
+    the request handler reads the file as usual.
+    
+    Args:
+        field (str): Form field of the file
+        storage (FileStorage): The uploaded file
+        
+    Returns:
+        dict: Description of the file
+    """
+    filename = storage.filename or ''
+    stream = storage.stream
+    description = {
+        "field": field,
+        "content_type": storage.mimetype,
+        "extension": filename.rsplit('.', 1)[1].lower() if '.' in filename else None,
+        "size": None,
+        "image": None
+    }
+    
+    try:
+        position = stream.tell()
+        stream.seek(0, os.SEEK_END)
+        description["size"] = stream.tell()
+        stream.seek(position)
+    except (OSError, ValueError):
+        pass
+        
+    try:
+        from PIL import Image
+        with Image.open(stream) as img:
+            # Only the header is read to get the dimensions
+            description["image"] = {
+                "width": img.width,
+                "height": img.height,
+                "mode": img.mode,
+                "format": img.format
+            }
+    except Exception:
+        pass
+    finally:
+        try:
+            stream.seek(0)
+        except (OSError, ValueError):
+            pass
+            
+    return description
+
+class TrafficRecorder:
+    """
+    Opt-in Flask middleware that appends a sanitized description of every
+    API request to an NDJSON file, for replay with utils/traffic_replay.py.
+    
+    Only the shape of traffic is kept: route templates rather than paths,
+    query parameter names, payload schemas (field names, types, sizes),
+    upload sizes and image dimensions, timing, status and latency. Header
+    values, path parameters, query values and payload contents are never
+    written.
+    """
+    
+    def __init__(self):
+        """Initialize the recorder (disabled until init_app enables it)"""
+        self.enabled = False
+        self.path = None
+        self.sample_rate = 1.0
+        self._lock = threading.Lock()
+        
+    def init_app(self, app):
+        """
+        Register the recording hooks if TRAFFIC_RECORDING is enabled.
+        
+        Args:
+            app (Flask): The application
+        """
+        self.enabled = bool(app.config.get('TRAFFIC_RECORDING', False))
+        if not self.enabled:
+            return
+            
+        self.path = app.config.get('TRAFFIC_RECORD_PATH', os.path.join('recordings', 'traffic.ndjson'))
+        self.sample_rate = float(app.config.get('TRAFFIC_SAMPLE_RATE', 1.0))
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        logger.info(f"Recording traffic to {self.path} (sample rate {self.sample_rate})")
+        
+    def _before_request(self):
+        """Describe the incoming request before the handler consumes its body"""
+        if request.method == 'OPTIONS' or not request.path.startswith('/api/'):
+            return
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+            
+        try:
+            g.traffic_record = self._describe_request()
+        except Exception as e:
+            logger.error(f"Error describing request for traffic recording: {str(e)}")
+            
+    def _describe_request(self):
+        """Build the sanitized description of the current request"""
+        record = {
+            "ts": round(time.time(), 3),
+            "method": request.method,
+            "route": request.url_rule.rule if request.url_rule is not None else None,
+            "endpoint": request.endpoint,
+            "query": sorted(request.args.keys()),
+            "content_type": request.mimetype or None,
+            "content_length": request.content_length,
+            "body": None,
+            "form": None,
+            "files": None,
+            "started": time.perf_counter()
+        }
+        
+        if request.mimetype == 'application/json':
+            # Cached, so the handler still gets the parsed body
+            body = request.get_json(silent=True, cache=True)
+            if body is not None:
+                record["body"] = describe_value(body)
+        elif request.mimetype == 'multipart/form-data':
+            record["form"] = {name: describe_value(value) for name, value in request.form.items()}
+            record["files"] = [describe_file(field, storage) for field, storage in request.files.items(multi=True)]
+            
+        return record
+        
+    def _after_request(self, response):
+        """Complete the description with the outcome and append it to the recording"""
+        record = g.pop('traffic_record', None)
+        if record is None:
+            return response
+            
+        try:
+            # For streamed responses this is the time to the first byte
+            record["latency_ms"] = round((time.perf_counter() - record.pop("started")) * 1000, 3)
+            record["status"] = response.status_code
+            record["response_length"] = response.calculate_content_length()
+            record["streamed"] = response.is_streamed
+            
+            line = json.dumps(record) + "\n"
+            with self._lock:
+                with open(self.path, 'a') as f:
+                    f.write(line)
+        except Exception as e:
+            logger.error(f"Error writing traffic recording: {str(e)}")
+            
+        return response
+
+# Create a singleton instance of the traffic recorder
+traffic_recorder = TrafficRecorder()
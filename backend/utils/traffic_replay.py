@@ -0,0 +1,455 @@
+"""
+Replay traffic captured by the traffic recorder against a local instance
+and report latency percentiles per route.
+
+    TRAFFIC_RECORDING=true python app.py        # on the instance to capture
+    python -m utils.traffic_replay recordings/traffic.ndjson --speed 4 \\
+        --base-url http://localhost:8000 --username admin --password password123
+
+Requests are sent at their recorded inter-arrival times divided by
+--speed, without waiting for earlier responses. Payloads are synthesized
+from the recorded schemas with a seeded generator, so every replay sends
+the same payloads. Fields the tabular models validate get values from
+their valid ranges, and uploaded images get the recorded dimensions. Path
+parameters point to a synthetic patient, and to predictions and jobs
+created earlier in the replay. Requests whose body was neither JSON nor a
+multipart form (e.g. raw CSV batch uploads) are skipped.
+"""
+import io
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+import urllib.request
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from utils.logger import setup_logger
+
+logger = setup_logger("traffic_replay")
+
+ROUTE_PARAM = re.compile(r"<(?:[^:<>]+:)?([^<>]+)>")
+
+def load_recording(path):
+    """
+    Read a traffic recording, ordered by arrival time.
+    
+    Args:
+        path (str): NDJSON file written by the traffic recorder
+        
+    Returns:
+        list: Request descriptions
+    """
+    records = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                records.append(json.loads(line))
+    return sorted(records, key=lambda record: record["ts"])
+
+def load_field_hints():
+    """
+    Collect the valid values of the tabular models' input fields, so
+    synthesized payloads pass validation and reach the models.
+    
+    Returns:
+        dict: Field name mapped to {"choices": [...]} or {"min": ..., "max": ...}
+    """
+    import importlib
+    
+    config_path = os.path.join(Path(__file__).resolve().parents[1], 'ml_models', 'model_config.json')
+    with open(config_path, 'r') as f:
+        model_config = json.load(f)
+        
+    hints = {}
+    for model_name, model_info in model_config.get("models", {}).items():
+        if model_info.get("type") != "tabular":
+            continue
+        try:
+            module = importlib.import_module(model_info["connector"])
+            features_info = getattr(module, model_info["class"])().features_info
+        except Exception as e:
+            logger.warning(f"Could not read input fields of model {model_name}: {str(e)}")
+            continue
+            
+        for group in ("categorical", "binary"):
+            for field, choices in features_info.get(group, {}).items():
+                hints[field] = {"choices": list(choices)}
+        for field, limits in features_info.get("continuous", {}).items():
+            hints[field] = {"min": limits["min"], "max": limits["max"]}
+    return hints
+
+class PayloadSynthesizer:
+    """Builds deterministic payloads with the structure of recorded ones"""
+    
+    def __init__(self, seed=0, field_hints=None):
+        """
+        Args:
+            seed (int): Seed of the value generator
+            field_hints (dict, optional): Valid values per field name (see load_field_hints)
+        """
+        self.random = random.Random(seed)
+        self.numpy_random = np.random.default_rng(seed)
+        self.field_hints = field_hints or {}
+        self._images = {}
+        
+    def value(self, schema, field=None):
+        """Synthesize a value matching a recorded schema"""
+        if schema is None:
+            return None
+            
+        hint = self.field_hints.get(field)
+        kind = schema.get("type")
+        if hint and kind in ("integer", "number", "string", "boolean"):
+            if "choices" in hint:
+                return self.random.choice(hint["choices"])
+            value = self.random.uniform(hint["min"], hint["max"])
+            return int(round(value)) if kind == "integer" else round(value, 3)
+            
+        if kind == "object":
+            return {name: self.value(item, name) for name, item in schema.get("fields", {}).items()}
+        if kind == "array":
+            return [self.value(schema.get("items")) for _ in range(schema.get("length", 0))]
+        if kind == "string":
+            return ''.join(self.random.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(schema.get("length", 0)))
+        if kind == "integer":
+            return self.random.randint(0, 100)
+        if kind == "number":
+            return round(self.random.uniform(0, 100), 3)
+        if kind == "boolean":
+            return self.random.random() < 0.5
+        return None
+        
+    def image(self, description):
+        """
+        Synthesize a noise image with the recorded dimensions, mode and format.
+        
+        One image is built per distinct shape and reused.
+        
+        Returns:
+            bytes: Encoded image
+        """
+        from PIL import Image
+        
+        key = (description["width"], description["height"], description["mode"], description["format"])
+        if key not in self._images:
+            width, height, mode, image_format = key
+            channels = {"L": 1, "RGB": 3, "RGBA": 4}.get(mode)
+            if channels is None:
+                mode, channels = "RGB", 3
+            shape = (height, width) if channels == 1 else (height, width, channels)
+            pixels = self.numpy_random.integers(0, 256, size=shape, dtype=np.uint8)
+            
+            buffer = io.BytesIO()
+            Image.fromarray(pixels, mode=mode).save(buffer, format=image_format or "PNG")
+            self._images[key] = buffer.getvalue()
+        return self._images[key]
+        
+    def file(self, description):
+        """
+        Synthesize an uploaded file.
+        
+        Returns:
+            tuple: (file name, content type, bytes)
+        """
+        extension = description.get("extension") or "bin"
+        if description.get("image"):
+            content = self.image(description["image"])
+        else:
+            content = self.numpy_random.integers(0, 256, size=description.get("size") or 0, dtype=np.uint8).tobytes()
+        return f"replay.{extension}", description.get("content_type") or "application/octet-stream", content
+
+def encode_multipart(fields, files):
+    """
+    Encode form fields and files as multipart/form-data.
+    
+    Args:
+        fields (dict): Form field values
+        files (list): (field, file name, content type, bytes) tuples
+        
+    Returns:
+        tuple: (body bytes, content type header)
+    """
+    boundary = uuid.uuid4().hex
+    body = io.BytesIO()
+    for name, value in fields.items():
+        body.write(f"--{boundary}\r\nContent-Disposition: form-data; name=\"{name}\"\r\n\r\n{value}\r\n".encode())
+    for field, filename, content_type, content in files:
+        body.write(f"--{boundary}\r\nContent-Disposition: form-data; name=\"{field}\"; filename=\"{filename}\"\r\n"
+                   f"Content-Type: {content_type}\r\n\r\n".encode())
+        body.write(content)
+        body.write(b"\r\n")
+    body.write(f"--{boundary}--\r\n".encode())
+    return body.getvalue(), f"multipart/form-data; boundary={boundary}"
+
+class ReplayClient:
+    """Sends synthesized requests to the instance under test"""
+    
+    def __init__(self, base_url, token=None, timeout=120):
+        self.base_url = base_url.rstrip('/')
+        self.token = token
+        self.timeout = timeout
+        
+    def send(self, method, path, body=None, content_type=None):
+        """
+        Send one request.
+        
+        Returns:
+            tuple: (status code, response bytes)
+        """
+        request = urllib.request.Request(self.base_url + path, data=body, method=method)
+        if content_type:
+            request.add_header('Content-Type', content_type)
+        if self.token:
+            request.add_header('Authorization', f'Bearer {self.token}')
+            
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+            
+    def send_json(self, method, path, payload):
+        """Send a JSON request and decode the JSON response"""
+        status, content = self.send(method, path, json.dumps(payload).encode(), 'application/json')
+        try:
+            return status, json.loads(content or b'null')
+        except ValueError:
+            return status, None
+
+class Replayer:
+    """Drives recorded traffic against an instance and collects latencies per route"""
+    
+    def __init__(self, client, synthesizer, speed=1.0, concurrency=32, exclude=()):
+        """
+        Args:
+            client (ReplayClient): Authenticated client
+            synthesizer (PayloadSynthesizer): Payload generator
+            speed (float): Replay speed multiplier (2 sends twice as fast)
+            concurrency (int): Most requests in flight at once
+            exclude (tuple): Route prefixes that are not replayed
+        """
+        self.client = client
+        self.synthesizer = synthesizer
+        self.speed = max(float(speed), 1e-6)
+        self.concurrency = concurrency
+        self.exclude = tuple(exclude)
+        self.patient_id = None
+        self._ids = {}
+        self._lock = threading.Lock()
+        self._results = []
+        
+    def create_patient(self):
+        """Create the synthetic patient that patient_id path parameters point to"""
+        status, response = self.client.send_json('POST', '/api/patients', {
+            "first_name": "Replay",
+            "last_name": "Patient",
+            "date_of_birth": "1960-01-01",
+            "gender": "female"
+        })
+        if status != 201:
+            raise RuntimeError(f"Could not create the replay patient (status {status})")
+        self.patient_id = response["patient"]["id"]
+        
+    def _path(self, route):
+        """Fill the parameters of a route template"""
+        def parameter(match):
+            name = match.group(1)
+            if name == "patient_id":
+                return self.patient_id
+            with self._lock:
+                ids = self._ids.get(name)
+                if ids:
+                    return self.synthesizer.random.choice(ids)
+            # Nothing created yet: exercise the not-found path
+            return str(uuid.UUID(int=self.synthesizer.random.getrandbits(128)))
+        return ROUTE_PARAM.sub(parameter, route)
+        
+    def _remember_ids(self, content):
+        """Keep prediction and job ids from responses for later requests"""
+        try:
+            response = json.loads(content)
+        except ValueError:
+            return
+        if not isinstance(response, dict):
+            return
+            
+        with self._lock:
+            prediction = response.get("prediction")
+            if isinstance(prediction, dict) and prediction.get("id"):
+                self._ids.setdefault("prediction_id", []).append(prediction["id"])
+            if response.get("job_id"):
+                self._ids.setdefault("job_id", []).append(response["job_id"])
+                
+    def _build(self, record):
+        """Synthesize the path, body and content type of a recorded request"""
+        path = self._path(record["route"])
+        if record.get("query"):
+            path += "?" + "&".join(f"{name}=1" for name in record["query"])
+            
+        if record.get("body") is not None:
+            return path, json.dumps(self.synthesizer.value(record["body"])).encode(), 'application/json'
+        if record.get("files") is not None or record.get("form") is not None:
+            fields = {name: self.synthesizer.value(schema, name) for name, schema in (record.get("form") or {}).items()}
+            if "patient_id" in fields:
+                fields["patient_id"] = self.patient_id
+            files = [(description["field"],) + self.synthesizer.file(description) for description in record.get("files") or []]
+            body, content_type = encode_multipart(fields, files)
+            return path, body, content_type
+        if record.get("content_length"):
+            return None
+        return path, None, None
+        
+    def _send(self, record, due, built):
+        """Send one request and record its outcome"""
+        path, body, content_type = built
+        started = time.perf_counter()
+        lag_ms = (started - due) * 1000
+        try:
+            status, content = self.client.send(record["method"], path, body, content_type)
+            error = None
+        except Exception as e:
+            status, content, error = None, b'', str(e)
+        latency_ms = (time.perf_counter() - started) * 1000
+        
+        if status is not None and status < 300:
+            self._remember_ids(content)
+            
+        with self._lock:
+            self._results.append({
+                "route": f"{record['method']} {record['route']}",
+                "status": status,
+                "latency_ms": latency_ms,
+                "lag_ms": lag_ms,
+                "error": error
+            })
+            
+    def run(self, records):
+        """
+        Replay the records at their recorded pace divided by the speed.
+        
+        Returns:
+            dict: The report (see report)
+        """
+        records = [
+            record for record in records
+            if record.get("route") and not record["route"].startswith(self.exclude)
+        ]
+        skipped = []
+        if not records:
+            return self.report(0.0, 0.0, skipped)
+            
+        first_ts = records[0]["ts"]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="replay") as executor:
+            for record in records:
+                # Payloads are built in recorded order, so the replay is deterministic
+                built = self._build(record)
+                if built is None:
+                    skipped.append(f"{record['method']} {record['route']}")
+                    continue
+                    
+                due = started + (record["ts"] - first_ts) / self.speed
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(self._send, record, due, built)
+                
+        return self.report(records[-1]["ts"] - first_ts, time.perf_counter() - started, skipped)
+        
+    def report(self, recorded_seconds, elapsed_seconds, skipped):
+        """
+        Summarize the replay.
+        
+        Returns:
+            dict: Overall figures and, per route, request count, status codes
+                and latency percentiles
+        """
+        routes = {}
+        for result in self._results:
+            routes.setdefault(result["route"], []).append(result)
+            
+        per_route = {}
+        for route, results in sorted(routes.items()):
+            latencies = np.array([result["latency_ms"] for result in results])
+            statuses = {}
+            for result in results:
+                key = str(result["status"]) if result["status"] is not None else "error"
+                statuses[key] = statuses.get(key, 0) + 1
+            per_route[route] = {
+                "requests": len(results),
+                "statuses": statuses,
+                "latency_ms": {
+                    "p50": round(float(np.percentile(latencies, 50)), 3),
+                    "p90": round(float(np.percentile(latencies, 90)), 3),
+                    "p99": round(float(np.percentile(latencies, 99)), 3),
+                    "max": round(float(latencies.max()), 3),
+                    "mean": round(float(latencies.mean()), 3)
+                }
+            }
+            
+        lags = [result["lag_ms"] for result in self._results]
+        return {
+            "requests": len(self._results),
+            "skipped": len(skipped),
+            "skipped_routes": sorted(set(skipped)),
+            "speed": self.speed,
+            "recorded_seconds": round(recorded_seconds, 3),
+            "elapsed_seconds": round(elapsed_seconds, 3),
+            "max_schedule_lag_ms": round(max(lags), 3) if lags else None,
+            "routes": per_route
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded traffic against a local instance")
+    parser.add_argument("recording", help="NDJSON traffic recording")
+    parser.add_argument("--base-url", default="http://localhost:8000", help="Instance under test")
+    parser.add_argument("--username", default="admin", help="User to log in as")
+    parser.add_argument("--password", default="password123", help="Password of the user")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed multiplier, e.g. 4 for 4x")
+    parser.add_argument("--concurrency", type=int, default=32, help="Most requests in flight at once")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthesized payloads")
+    parser.add_argument("--exclude", action="append", default=None, help="Route prefix not to replay (default: /api/auth)")
+    parser.add_argument("--no-hints", action="store_true", help="Do not load the models to find valid field values")
+    parser.add_argument("--report", help="Also write the report to this JSON file")
+    args = parser.parse_args()
+    
+    records = load_recording(args.recording)
+    field_hints = {} if args.no_hints else load_field_hints()
+    
+    client = ReplayClient(args.base_url)
+    status, response = client.send_json('POST', '/api/auth/login', {"username": args.username, "password": args.password})
+    if status != 200:
+        logger.error(f"Login failed with status {status}")
+        sys.exit(1)
+    client.token = response["token"]
+    
+    replayer = Replayer(
+        client,
+        PayloadSynthesizer(seed=args.seed, field_hints=field_hints),
+        speed=args.speed,
+        concurrency=args.concurrency,
+        exclude=args.exclude if args.exclude is not None else ["/api/auth"]
+    )
+    replayer.create_patient()
+    
+    logger.info(f"Replaying {len(records)} requests at {args.speed}x against {args.base_url}")
+    report = replayer.run(records)
+    
+    report_json = json.dumps(report, indent=4)
+    print(report_json)
+    if args.report:
+        with open(args.report, 'w') as f:
+            f.write(report_json)
+
+if __name__ == "__main__":
+    main()